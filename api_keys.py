@@ -0,0 +1,141 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+from requests.auth import AuthBase
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode()).digest()
+
+
+def bearer_token(auth_header):
+    """The token of an 'Authorization: Bearer <token>' header, or None"""
+    if auth_header and auth_header[:7].lower() == 'bearer ' and len(auth_header) > 7:
+        return auth_header[7:].strip()
+    return None
+
+
+class KeyRing:
+    """Active bearer tokens, held as SHA-256 digests.
+
+    Tokens come from the keys file at `path`, one per line ('#' starts a
+    comment). Every token listed is accepted; the first is the current key,
+    the one this service presents on its own calls. The file is re-read
+    when its modification time changes, checked at most every
+    `check_interval` seconds, so keys rotate without restarting workers:
+    append the new key, move it to the top once every service has picked
+    it up, then remove the old one. A missing or unreadable file accepts
+    nothing.
+
+    `fallback` is a bootstrap key for deployments without a keys file; it
+    is the ring's only key when `path` is unset and is ignored otherwise.
+    """
+
+    def __init__(self, path=None, fallback=None, check_interval=2.0):
+        self.path = path
+        self.fallback = fallback
+        self.check_interval = check_interval
+        self._keys = (None, None, frozenset(), frozenset())
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Rebuild the digest sets from the keys file, or from the fallback"""
+        tokens = []
+        mtime = None
+        if self.path:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                with open(self.path) as f:
+                    for line in f:
+                        token = line.split('#', 1)[0].strip()
+                        if token:
+                            tokens.append(token)
+            except OSError:
+                mtime = None
+        elif self.fallback:
+            tokens.append(self.fallback)
+        # Swapped in one assignment; readers never see a half-built ring.
+        # The whole 'Bearer <token>' headers let verify_header accept the
+        # usual form without parsing it.
+        self._keys = (
+            tokens[0] if tokens else None,
+            f'Bearer {tokens[0]}' if tokens else None,
+            frozenset(token_digest(token) for token in tokens),
+            frozenset(token_digest(f'Bearer {token}') for token in tokens)
+        )
+        self._mtime = mtime
+        self._checked_at = time.monotonic()
+
+    def _maybe_reload(self):
+        if not self.path or time.monotonic() - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                self.reload()
+            else:
+                self._checked_at = time.monotonic()
+
+    def current(self):
+        """The key to present on outgoing calls, or None if the ring is empty"""
+        self._maybe_reload()
+        return self._keys[0]
+
+    def verify(self, token):
+        """True if `token` is an active key.
+
+        Only digests are compared, so lookup timing reveals nothing about
+        the stored tokens.
+        """
+        if not token:
+            return False
+        self._maybe_reload()
+        return token_digest(token) in self._keys[2]
+
+    def verify_header(self, auth_header):
+        """True if `auth_header` is exactly 'Bearer <active key>'.
+
+        The current key, which nearly every caller presents, is matched
+        with one constant-time comparison; other active keys by digest.
+        A False here is not a rejection: other spellings of the scheme and
+        stray whitespace are left to bearer_token() and verify().
+        """
+        if not auth_header:
+            return False
+        self._maybe_reload()
+        _, current_header, _, header_digests = self._keys
+        if current_header is None:
+            return False
+        try:
+            if hmac.compare_digest(auth_header, current_header):
+                return True
+        except TypeError:  # non-ASCII; no key looks like that
+            return False
+        return token_digest(auth_header) in header_digests
+
+    def __len__(self):
+        return len(self._keys[2])
+
+
+class KeyRingAuth(AuthBase):
+    """requests auth presenting a key ring's current key on every request"""
+
+    def __init__(self, keys):
+        self.keys = keys
+
+    def __call__(self, r):
+        token = self.keys.current()
+        if token:
+            r.headers['Authorization'] = f'Bearer {token}'
+        return r
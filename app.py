@@ -1,37 +1,69 @@
-from flask import Flask
+import click
+from flask import Flask, current_app, jsonify
+from flask.cli import with_appcontext
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from datetime import timedelta
+from sqlalchemy import inspect
 from config import Config
 from models import db
+from storage import init_storage, upgrade_schema
+from instrumentation import instrument_app, metrics_response
+from serialization import init_serialization
+from schedule import FacilitatorConflict
 
-# Create Flask app
-app = Flask(__name__)
+jwt = JWTManager()
 
-# Enable CORS for frontend
-CORS(app)
 
-# Load configuration
-app.config['JWT_SECRET_KEY'] = Config.JWT_SECRET_KEY
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=Config.JWT_ACCESS_TOKEN_EXPIRES)
-app.config['SQLALCHEMY_DATABASE_URI'] = Config.SQLALCHEMY_DATABASE_URI
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = Config.SQLALCHEMY_TRACK_MODIFICATIONS
+def create_app(config_overrides=None):
+    """Build the booking API.
 
-# Initialize extensions
-db.init_app(app)
-jwt = JWTManager(app)
+    Creating the app does no database work, so WSGI workers can import it
+    cheaply. Schema creation and seeding live in the init-db command.
+    """
+    app = Flask(__name__)
 
-# Import and register blueprints
-from auth import auth_bp
-from events import events_bp
-from bookings import bookings_bp
+    # Enable CORS for frontend
+    CORS(app)
 
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(events_bp, url_prefix='/api/events')
-app.register_blueprint(bookings_bp, url_prefix='/api/bookings')
+    # Load configuration
+    app.config['JWT_SECRET_KEY'] = Config.JWT_SECRET_KEY
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=Config.JWT_ACCESS_TOKEN_EXPIRES)
+    app.config['SQLALCHEMY_DATABASE_URI'] = Config.SQLALCHEMY_DATABASE_URI
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = Config.SQLALCHEMY_TRACK_MODIFICATIONS
+    if config_overrides:
+        app.config.update(config_overrides)
+
+    # Initialize extensions
+    init_storage(app, db, Config)
+    jwt.init_app(app)
+    instrument_app(app, db, Config)
+    init_serialization(app, Config)
+
+    # Import and register blueprints
+    from auth import auth_bp
+    from events import events_bp
+    from bookings import bookings_bp
+    from catalogue_sync import sync_bp
+
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(events_bp, url_prefix='/api/events')
+    app.register_blueprint(bookings_bp, url_prefix='/api/bookings')
+    app.register_blueprint(sync_bp, url_prefix='/api/sync')
+
+    app.add_url_rule('/', view_func=index)
+    app.add_url_rule('/metrics', view_func=get_metrics)
+    app.register_error_handler(FacilitatorConflict, facilitator_conflict)
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(rebuild_seat_counts_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(rebuild_schedule_index_command)
+    app.cli.add_command(dispatch_outbox_command)
+
+    return app
 
 
-@app.route('/')
 def index():
     return {
         'name': 'Booking System API',
@@ -39,15 +71,50 @@ def index():
         'endpoints': {
             'auth': '/api/auth',
             'events': '/api/events',
-            'bookings': '/api/bookings'
+            'bookings': '/api/bookings',
+            'sync': '/api/sync',
+            'metrics': '/metrics'
         }
     }
 
 
-# Create tables and seed data on startup
-with app.app_context():
-    db.create_all()
-    
+def get_metrics():
+    """Request latency, SQL cost and operational counters such as CRM outbox depth"""
+    return metrics_response()
+
+
+def facilitator_conflict(error):
+    """409 for any write that would double-book a facilitator (see schedule.py)"""
+    db.session.rollback()
+    return jsonify({
+        'error': str(error),
+        'event_id': error.event_id,
+        'conflicting_event_id': error.other_event_id
+    }), 409
+
+
+def init_db():
+    """Create or upgrade the schema, and seed sample data if the database is empty.
+
+    Columns added to an existing database are backfilled: seat counters,
+    interval tree nodes and the search index are rebuilt as needed.
+    """
+    added = upgrade_schema(db)
+    if 'events.current_participants' in added:
+        from reservations import rebuild_seat_counts
+        rebuild_seat_counts()
+    if 'events.change_seq' in added:
+        from catalogue_sync import backfill_change_seq
+        backfill_change_seq()
+    if 'events.schedule_node' in added or 'bookings.schedule_node' in added:
+        from schedule import rebuild_schedule_index
+        rebuild_schedule_index()
+
+    from search import create_search_index, rebuild_search_index
+    if 'events' not in added and 'events_fts' not in inspect(db.engine).get_table_names():
+        rebuild_search_index()
+    create_search_index()
+
     # Seed if empty
     from models import Facilitator
     if Facilitator.query.count() == 0:
@@ -55,5 +122,59 @@ with app.app_context():
         seed_database()
 
 
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create or upgrade the schema and seed sample data (run on every deployment)"""
+    init_db()
+
+
+@click.command('rebuild-seat-counts')
+@with_appcontext
+def rebuild_seat_counts_command():
+    """Rebuild the per-event confirmed-seat counters from the bookings table"""
+    from reservations import rebuild_seat_counts
+    rebuild_seat_counts()
+
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Rebuild the event full-text search index from the events table"""
+    from search import rebuild_search_index
+    print(f'Search index rebuilt for {rebuild_search_index()} events')
+
+
+@click.command('rebuild-schedule-index')
+@with_appcontext
+def rebuild_schedule_index_command():
+    """Recompute the interval tree nodes of every event and booking"""
+    from schedule import rebuild_schedule_index
+    rebuild_schedule_index()
+
+
+@click.command('dispatch-outbox')
+@with_appcontext
+def dispatch_outbox_command():
+    """Deliver queued CRM notifications until interrupted"""
+    from crm_outbox import OutboxDispatcher
+    dispatcher = OutboxDispatcher(current_app._get_current_object())
+    try:
+        dispatcher.run_forever()
+    except KeyboardInterrupt:
+        dispatcher.stop()
+
+
 if __name__ == '__main__':
+    import os
+    app = create_app()
+
+    # Development convenience: prepare the database before serving
+    with app.app_context():
+        init_db()
+
+    # With the reloader, only the serving child process dispatches
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from crm_outbox import OutboxDispatcher
+        OutboxDispatcher(app).start()
     app.run(debug=True, port=5000)
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token
 from models import db, User
+from identity import identity_claims
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -61,8 +62,14 @@ def login():
     if not user or not user.check_password(password):
         return jsonify({'error': 'Invalid username or password'}), 401
     
-    # Create JWT token (identity must be a string)
-    access_token = create_access_token(identity=str(user.id))
+    # Upgrade hashes made with outdated parameters while we have the password
+    if user.password_needs_rehash():
+        user.set_password(password)
+        db.session.commit()
+    
+    # Create JWT token (identity must be a string). The embedded claims let
+    # protected routes describe the user without reading the users table.
+    access_token = create_access_token(identity=str(user.id), additional_claims=identity_claims(user))
     
     return jsonify({
         'message': 'Login successful',
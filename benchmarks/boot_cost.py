@@ -0,0 +1,92 @@
+"""Per-worker boot cost of both services, before and after the app factory.
+
+"after" is what a WSGI worker now does: import the module and call
+create_app(). "before" replays the old import-time work on top of that:
+db.create_all() plus the seeding check. Each sample runs in a fresh
+interpreter against an already initialised database, like a worker restart.
+
+Usage:
+    python -m benchmarks.boot_cost --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+WORKER = r'''
+import json, sys, time
+from sqlalchemy import event as sa_event
+started = time.perf_counter()
+service, mode, uri = sys.argv[1:4]
+if service == 'booking':
+    from app import create_app, db
+else:
+    from crm_app import create_app, db
+imported = time.perf_counter()
+app = create_app({'SQLALCHEMY_DATABASE_URI': uri})
+created = time.perf_counter()
+statements = 0
+if mode == 'before':
+    with app.app_context():
+        def count(*args):
+            global statements
+            statements += 1
+        sa_event.listen(db.engine, 'before_cursor_execute', count)
+        db.create_all()
+        if service == 'booking':
+            from models import Facilitator
+            Facilitator.query.count()
+        else:
+            # The CRM used to run its full seeding pass on every import
+            from crm_app import seed_facilitators
+            seed_facilitators()
+finished = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_ms': (created - imported) * 1000,
+    'db_ms': (finished - created) * 1000,
+    'ms': (finished - started) * 1000,
+    'statements': statements
+}))
+'''
+
+
+def sample(service, mode, uri, cwd):
+    output = subprocess.run(
+        [sys.executable, '-c', WORKER, service, mode, uri],
+        cwd=cwd, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmp:
+        uris = {
+            'booking': f"sqlite:///{os.path.join(tmp, 'booking.db')}",
+            'crm': f"sqlite:///{os.path.join(tmp, 'crm.db')}",
+        }
+        # Initialise both databases once so every sample sees an existing schema
+        for service in ('booking', 'crm'):
+            sample(service, 'before', uris[service], root)
+
+        print(f"{'service':8} {'mode':7} {'import':>8} {'create':>8} {'db':>8} {'total':>8} {'SQL':>4}  (median ms)")
+        for service in ('booking', 'crm'):
+            for mode in ('before', 'after'):
+                runs = [sample(service, mode, uris[service], root) for _ in range(args.runs)]
+                median = {key: statistics.median(r[key] for r in runs)
+                          for key in ('import_ms', 'create_ms', 'db_ms', 'ms')}
+                print(f"{service:8} {mode:7} {median['import_ms']:8.1f} {median['create_ms']:8.1f} "
+                      f"{median['db_ms']:8.1f} {median['ms']:8.1f} {runs[0]['statements']:4d}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
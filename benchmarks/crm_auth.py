@@ -0,0 +1,130 @@
+"""Per-request cost of CRM bearer-token auth, and key rotation without a restart.
+
+Times the original single-token check (split the header, compare with !=)
+against require_bearer_token over key rings of increasing size, inside a
+request context as /notify sees it. Then serves POST /notify through the
+test client to show the auth share of a whole request, and rotates a key
+through the keys file while the app keeps running: the new key is accepted
+once appended, and becomes the one sent on outgoing calls once moved to
+the top.
+
+Usage:
+    python -m benchmarks.crm_auth --checks 200000 --requests 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+from flask import request, jsonify
+
+import crm_app
+import requests
+
+from api_keys import KeyRing, KeyRingAuth
+from config import CRMConfig
+from benchmarks.crm_ingest import make_payload
+
+
+def legacy_check():
+    """require_bearer_token before the key ring, minus the wrapped view"""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({'error': 'Authorization header missing'}), 401
+    parts = auth_header.split()
+    if len(parts) != 2 or parts[0].lower() != 'bearer':
+        return jsonify({'error': 'Invalid authorization header format'}), 401
+    if parts[1] != CRMConfig.BEARER_TOKEN:
+        return jsonify({'error': 'Invalid token'}), 403
+    return None
+
+
+def write_keys(path, tokens):
+    with open(path, 'w') as f:
+        f.write('# active CRM keys, current first\n')
+        f.writelines(f'{token}\n' for token in tokens)
+
+
+def outgoing_key(keys):
+    """The Authorization header KeyRingAuth puts on an outgoing request"""
+    prepared = requests.Request('POST', 'http://crm.invalid/notify/batch', auth=KeyRingAuth(keys)).prepare()
+    return prepared.headers.get('Authorization')
+
+
+def ns_per_call(fn, checks):
+    return timeit.timeit(fn, number=checks) / checks * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--checks', type=int, default=200000)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = crm_app.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'crm.db')}"})
+        app.logger.disabled = True
+        with app.app_context():
+            crm_app.init_db()
+        headers = {'Authorization': f'Bearer {CRMConfig.BEARER_TOKEN}'}
+        guarded = crm_app.require_bearer_token(lambda: None)
+
+        print('Auth check per request (ns):')
+        with app.test_request_context('/notify', method='POST', headers=headers):
+            print(f'  single token, split + !=     {ns_per_call(legacy_check, args.checks):8.0f}')
+            original = crm_app.crm_keys
+            try:
+                for size in (1, 100, 10000):
+                    keys_file = os.path.join(tmp, f'crm_keys_{size}')
+                    write_keys(keys_file, [CRMConfig.BEARER_TOKEN] + [f'rotated-key-{i:05d}' for i in range(size - 1)])
+                    crm_app.crm_keys = KeyRing(keys_file)
+                    auth_ns = ns_per_call(guarded, args.checks)
+                    print(f'  key ring, {size:>5} active keys  {auth_ns:8.0f}')
+            finally:
+                crm_app.crm_keys = original
+            auth_ns = ns_per_call(guarded, args.checks)
+
+        client = app.test_client()
+        started = time.perf_counter()
+        for booking_id in range(1, args.requests + 1):
+            response = client.post('/notify', json=make_payload(booking_id), headers=headers)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        request_ns = (time.perf_counter() - started) / args.requests * 1e9
+        print(f'POST /notify: {request_ns / 1000:.0f} us per request, '
+              f'auth {auth_ns / request_ns:.2%} of it '
+              f'(ceiling {1e9 / auth_ns:,.0f} auth checks/s per core)')
+
+        # Rotation: the new key works once appended and is sent once moved to
+        # the top, with no restart; the bootstrap token stops working for good
+        keys_file = os.path.join(tmp, 'crm_keys')
+        write_keys(keys_file, ['old-key'])
+        crm_app.crm_keys = KeyRing(keys_file, CRMConfig.BEARER_TOKEN, check_interval=0.1)
+
+        def answers(token):
+            return client.get('/api/facilitator/1/events', headers={'Authorization': f'Bearer {token}'}).status_code
+
+        steps = [('file with old-key', answers('new-key'), outgoing_key(crm_app.crm_keys))]
+        for tokens, label in ((['old-key', 'new-key'], 'new-key appended'),
+                              (['new-key', 'old-key'], 'new-key moved to the top'),
+                              (['new-key'], 'old-key removed')):
+            time.sleep(0.2)  # past check_interval, and a new mtime
+            write_keys(keys_file, tokens)
+            time.sleep(0.2)
+            steps.append((label, answers('new-key'), outgoing_key(crm_app.crm_keys)))
+        bootstrap = answers(CRMConfig.BEARER_TOKEN)
+        old = answers('old-key')
+        crm_app.crm_keys = original
+
+        print('Rotation:')
+        for label, status, header in steps:
+            print(f'  {label:<26} new-key answered {status}, outgoing {header}')
+        print(f'  old-key now answers {old}, the bootstrap token {bootstrap}')
+        expected = [(403, 'Bearer old-key'), (200, 'Bearer old-key'), (200, 'Bearer new-key'), (200, 'Bearer new-key')]
+        ok = [(status, header) for _, status, header in steps] == expected and (old, bootstrap) == (403, 403)
+        return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
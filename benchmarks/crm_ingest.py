@@ -0,0 +1,79 @@
+"""CRM notification ingestion throughput: POST /notify versus POST /notify/batch.
+
+Both modes write to the same kind of SQLite file, so the difference is the
+per-request commit (and fsync) that batching amortises.
+
+Usage:
+    python -m benchmarks.crm_ingest --notifications 2000 --batch-size 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import config
+from crm_app import create_app, init_db
+from crm_models import db, Notification
+
+
+def make_payload(booking_id):
+    start = datetime(2026, 1, 1) + timedelta(hours=booking_id % 500)
+    return {
+        'booking_id': booking_id,
+        'user': {'id': booking_id % 997, 'username': f'user{booking_id % 997}',
+                 'email': f'user{booking_id % 997}@example.com'},
+        'event': {'id': booking_id % 50, 'title': f'Event {booking_id % 50}',
+                  'event_type': 'session', 'start_time': start.isoformat(),
+                  'end_time': (start + timedelta(hours=1)).isoformat()},
+        'facilitator_id': booking_id % 3 + 1,
+        'booked_at': datetime(2025, 12, 1).isoformat()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notifications', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'crm.db')}"})
+        app.logger.disabled = True
+        with app.app_context():
+            init_db()
+
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {config.CRMConfig.BEARER_TOKEN}'}
+        n = args.notifications
+
+        started = time.perf_counter()
+        for booking_id in range(1, n + 1):
+            response = client.post('/notify', json=make_payload(booking_id), headers=headers)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        single = n / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for first in range(n + 1, 2 * n + 1, args.batch_size):
+            batch = [make_payload(i) for i in range(first, min(first + args.batch_size, 2 * n + 1))]
+            response = client.post('/notify/batch', json=batch, headers=headers)
+            assert response.status_code == 200 and response.json['created'] == len(batch)
+        batched = n / (time.perf_counter() - started)
+
+        # Replaying a batch must not create rows
+        replay = client.post('/notify/batch', json=[make_payload(n + 1)], headers=headers)
+        assert replay.json['duplicate'] == 1
+
+        with app.app_context():
+            stored = Notification.query.count()
+            db.engine.dispose()
+
+    print(f'POST /notify        {single:10.0f} notifications/s')
+    print(f'POST /notify/batch  {batched:10.0f} notifications/s (batch size {args.batch_size})')
+    print(f'speed-up            {batched / single:10.1f}x, {stored} rows stored')
+    return 0 if stored == 2 * n else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Concurrent bookings and event listings against SQLite, default versus tuned.
+
+Runs the same mix of POST /api/bookings and GET /api/events from many
+threads twice, each time on a fresh database file: once with SQLite's
+defaults (rollback journal, synchronous=FULL, no pool settings) and once
+with the settings from config.py (WAL, busy_timeout, synchronous=NORMAL,
+mmap_size and the DATABASE_POOL_* pool). Reports throughput, p50/p99
+latency per request type and failed requests.
+
+Usage:
+    python -m benchmarks.db_concurrency --threads 16 --requests 4000 --bookings 0.25
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from identity import identity_claims
+from models import db, User, Facilitator, Event
+
+SETUPS = {
+    'default': {'SQLALCHEMY_ENGINE_OPTIONS': {}, 'SQLITE_PRAGMAS': {}},
+    'tuned': {}
+}
+
+
+def setup_data(app, users, events):
+    with app.app_context():
+        db.create_all()
+        facilitator = Facilitator(name='Concurrency', email='concurrency@test.local')
+        db.session.add(facilitator)
+        db.session.flush()
+
+        start = datetime.utcnow() + timedelta(days=1)
+        db.session.add_all([
+            Event(title=f'Concurrency {i}', event_type='session', start_time=start + timedelta(hours=i),
+                  end_time=start + timedelta(hours=i + 1), max_participants=100_000,
+                  facilitator_id=facilitator.id)
+            for i in range(events)
+        ])
+        db.session.add_all([
+            User(username=f'conc{i}', email=f'conc{i}@test.local', password_hash='-')
+            for i in range(users)
+        ])
+        db.session.commit()
+
+        event_ids = [e.id for e in Event.query.order_by(Event.id)]
+        tokens = [create_access_token(identity=str(u.id), additional_claims=identity_claims(u))
+                  for u in User.query.order_by(User.id)]
+        return event_ids, tokens
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(setup, overrides, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(dict(overrides, SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'booking.db')}"))
+        bookings = int(args.requests * args.bookings)
+        event_ids, tokens = setup_data(app, bookings, args.events)
+
+        rng = random.Random(args.seed)
+        plan = [('booking', i) for i in range(bookings)] + [('listing', i) for i in range(args.requests - bookings)]
+        rng.shuffle(plan)
+
+        local = threading.local()
+        latencies = {'booking': [], 'listing': []}
+        failures = {'booking': 0, 'listing': 0}
+        lock = threading.Lock()
+
+        def request(op):
+            kind, n = op
+            if not hasattr(local, 'client'):
+                local.client = app.test_client()
+            client = local.client
+            headers = {'Authorization': f'Bearer {tokens[n % len(tokens)]}'}
+            started = time.perf_counter()
+            if kind == 'booking':
+                response = client.post('/api/bookings', json={'event_id': event_ids[n % len(event_ids)]},
+                                       headers=headers)
+                ok = response.status_code == 201
+            else:
+                response = client.get(f'/api/events?limit={20 + n % 5}', headers=headers)
+                ok = response.status_code == 200
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[kind].append(elapsed)
+                failures[kind] += not ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(request, plan))
+        wall = time.perf_counter() - started
+
+        with app.app_context():
+            db.engine.dispose()
+
+    print(f'{setup}: {args.requests / wall:,.0f} requests/s over {wall:.1f}s')
+    for kind, samples in latencies.items():
+        print(f'  {kind:<8} p50 {percentile(samples, 0.50) * 1000:7.1f} ms  '
+              f'p99 {percentile(samples, 0.99) * 1000:7.1f} ms  failed {failures[kind]}')
+    return args.requests / wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--bookings', type=float, default=0.25, help='share of requests that book')
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    throughput = {setup: run(setup, overrides, args) for setup, overrides in SETUPS.items()}
+    print(f'tuned/default throughput: {throughput["tuned"] / throughput["default"]:.2f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
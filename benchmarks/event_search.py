@@ -0,0 +1,97 @@
+"""Latency of GET /api/events/search over a large synthetic catalogue.
+
+Generates the events with synthetic_data, then times text searches, facet
+and filter combinations through the test client, and checks that an event
+edited by the CRM (modify_event, pushed through POST /api/sync/events) is
+found by its new title straight away.
+
+Usage:
+    python -m benchmarks.event_search --events 100000 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from flask_jwt_extended import create_access_token
+
+import synthetic_data
+from app import create_app
+from config import Config
+from crm_app import create_app as create_crm_app
+from events import catalogue_cache
+from models import db, Event
+
+QUERIES = {
+    'text': {'q': 'meditation'},
+    'prefix': {'q': 'medit rishi'},
+    'text + type': {'q': 'yoga', 'event_type': 'retreat'},
+    'text + price': {'q': 'sound', 'min_price': 500, 'max_price': 1500},
+    'text + dates': {'q': 'pranayama', 'from': '2026-01-01T00:00:00', 'to': '2026-07-01T00:00:00'},
+    'filters only': {'event_type': 'session', 'max_price': 1000},
+    'specialization': {'q': 'ayurveda'},
+    'deep page': {'q': 'yoga', 'offset': 5000}
+}
+
+
+def time_query(client, headers, params, repeat):
+    """Median and worst latency in ms; the response cache is bumped before each call"""
+    samples = []
+    for _ in range(repeat):
+        catalogue_cache.bump()
+        started = time.perf_counter()
+        response = client.get('/api/events/search', query_string=params, headers=headers)
+        samples.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'{params}: {response.status_code} {response.get_json()}')
+    return statistics.median(samples), max(samples), response.get_json()['total']
+
+
+def check_incremental(app, client, headers):
+    """Retitle an event through the CRM sync feed and look for it by the new title"""
+    with app.app_context():
+        event = db.session.query(Event).filter_by(is_active=True).order_by(Event.id).first()
+        change = {'event_id': event.id, 'base_seq': event.change_seq,
+                  'fields': {'title': 'Kirtan Under The Stars'}}
+
+    response = client.post('/api/sync/events', json={'changes': [change]},
+                           headers={'Authorization': f'Bearer {Config.CRM_BEARER_TOKEN}'})
+    if response.get_json()['results'][0]['status'] != 'applied':
+        raise RuntimeError(f'POST /api/sync/events: {response.get_json()}')
+    found = client.get('/api/events/search', query_string={'q': 'kirtan stars'}, headers=headers).get_json()
+    return [event['id'] for event in found['events']] == [change['event_id']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'booking.db')}"})
+        crm = create_crm_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'crm.db')}"})
+        print(f'Generating {args.events:,} events...')
+        synthetic_data.generate(app, crm, seed=args.seed, users=100, facilitators=50, events=args.events,
+                                bookings=0, epoch=datetime(2026, 1, 1), chunk_rows=100_000)
+
+        with app.app_context():
+            headers = {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+        client = app.test_client()
+
+        print(f"{'query':<16}{'matches':>10}{'median ms':>12}{'max ms':>10}")
+        for name, params in QUERIES.items():
+            median, worst, total = time_query(client, headers, params, args.repeat)
+            print(f'{name:<16}{total:>10,}{median:>12.1f}{worst:>10.1f}')
+
+        ok = check_incremental(app, client, headers)
+        print(f"Incremental index update: {'PASS' if ok else 'FAIL'}")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
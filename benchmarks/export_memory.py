@@ -0,0 +1,128 @@
+"""Memory ceiling of the streamed facilitator bookings export.
+
+Loads --rows synthetic notifications for one facilitator into a scratch CRM
+database, then downloads GET /api/facilitator/1/bookings/export as NDJSON
+and as CSV while sampling the process's anonymous resident memory. Fails if
+memory grows by more than --ceiling-mib during either export, or if a row is
+missing.
+
+Usage:
+    python -m benchmarks.export_memory --rows 1000000 --ceiling-mib 64
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from config import CRMConfig
+from crm_app import create_app, init_db
+from crm_models import db, Notification
+
+
+def rss_mib():
+    """Anonymous resident memory; the SQLite file mapped by SQLITE_MMAP_SIZE doesn't count"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class PeakSampler(threading.Thread):
+    """Samples resident memory every few milliseconds and keeps the peak"""
+
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = rss_mib()
+        self.running = True
+
+    def run(self):
+        while self.running:
+            self.peak = max(self.peak, rss_mib())
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        self.join()
+        return max(self.peak, rss_mib())
+
+
+def load_notifications(rows, chunk=20000):
+    booked = datetime(2025, 1, 1)
+    for first in range(1, rows + 1, chunk):
+        db.session.execute(insert(Notification), [{
+            'booking_id': i,
+            'user_id': i % 5000,
+            'user_username': f'user{i % 5000}',
+            'user_email': f'user{i % 5000}@example.com',
+            'event_id': i % 400,
+            'event_title': f'Session {i % 400}',
+            'event_type': 'session',
+            'event_start_time': (booked + timedelta(days=i % 365)).isoformat(),
+            'event_end_time': (booked + timedelta(days=i % 365, hours=1)).isoformat(),
+            'facilitator_id': 1,
+            'booked_at': (booked + timedelta(seconds=i * 30)).isoformat(),
+            'received_at': booked + timedelta(seconds=i * 30 + 1)
+        } for i in range(first, min(first + chunk, rows + 1))])
+        db.session.commit()
+
+
+def export(client, export_format, headers):
+    gc.collect()
+    baseline = rss_mib()
+    sampler = PeakSampler()
+    sampler.start()
+    started = time.perf_counter()
+
+    response = client.get(f'/api/facilitator/1/bookings/export?format={export_format}',
+                          headers=headers, buffered=False)
+    assert response.status_code == 200, response.status_code
+    size = lines = 0
+    for chunk in response.response:
+        size += len(chunk)
+        lines += chunk.count(b'\n')
+    response.close()
+
+    elapsed = time.perf_counter() - started
+    peak = sampler.stop()
+    return {'lines': lines, 'mib': size / 2**20, 'seconds': elapsed, 'growth_mib': peak - baseline}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--ceiling-mib', type=float, default=64)
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'crm.db')}"})
+        app.logger.disabled = True
+        with app.app_context():
+            init_db()
+            started = time.perf_counter()
+            load_notifications(args.rows)
+            print(f'Loaded {args.rows:,} notifications in {time.perf_counter() - started:.1f}s')
+
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {CRMConfig.BEARER_TOKEN}'}
+        for export_format, expected_lines in (('ndjson', args.rows), ('csv', args.rows + 1)):
+            result = export(client, export_format, headers)
+            ok = result['lines'] == expected_lines and result['growth_mib'] <= args.ceiling_mib
+            failed |= not ok
+            print(f"{export_format:>6}: {result['lines']:,} lines, {result['mib']:.0f} MiB in "
+                  f"{result['seconds']:.1f}s ({args.rows / result['seconds']:,.0f} rows/s), "
+                  f"memory +{result['growth_mib']:.1f} MiB "
+                  f"(ceiling {args.ceiling_mib:.0f} MiB) {'PASS' if ok else 'FAIL'}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
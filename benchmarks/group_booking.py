@@ -0,0 +1,130 @@
+"""Group booking: POST /api/bookings/batch versus looping POST /api/bookings.
+
+Each round books one seat at each of --events events for a fresh user,
+either with one request per event or with a single batch request, and
+counts SQL statements and commits. A final check books a group whose last
+event is short of seats and verifies that nothing was booked.
+
+Usage:
+    python -m benchmarks.group_booking --events 30 --rounds 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event as sa_event
+
+from benchmarks.seat_reservation import build_app
+from identity import identity_claims
+from models import db, User, Facilitator, Event, Booking, OutboxMessage
+
+
+def setup_data(app, events, users):
+    with app.app_context():
+        db.create_all()
+        facilitator = Facilitator(name='Group Test', email='group@test.local')
+        db.session.add(facilitator)
+        db.session.flush()
+
+        start = datetime.utcnow() + timedelta(days=1)
+        db.session.add_all([
+            Event(title=f'Group {i}', event_type='session', start_time=start + timedelta(hours=i),
+                  end_time=start + timedelta(hours=i + 1), max_participants=1000,
+                  facilitator_id=facilitator.id)
+            for i in range(events)
+        ])
+        db.session.add_all([
+            User(username=f'group{i}', email=f'group{i}@test.local', password_hash='-')
+            for i in range(users)
+        ])
+        db.session.commit()
+
+        event_ids = [e.id for e in Event.query.order_by(Event.id)]
+        tokens = [create_access_token(identity=str(u.id), additional_claims=identity_claims(u))
+                  for u in User.query.order_by(User.id)]
+        return event_ids, tokens
+
+
+class Counters:
+    def __init__(self, engine):
+        self.statements = 0
+        self.commits = 0
+        sa_event.listen(engine, 'before_cursor_execute', self.on_statement)
+        sa_event.listen(engine, 'commit', self.on_commit)
+
+    def on_statement(self, *args):
+        self.statements += 1
+
+    def on_commit(self, *args):
+        self.commits += 1
+
+
+def run_rounds(client, counters, tokens, book):
+    statements, commits = counters.statements, counters.commits
+    started = time.perf_counter()
+    for token in tokens:
+        book(client, {'Authorization': f'Bearer {token}'})
+    elapsed = time.perf_counter() - started
+    return elapsed, counters.statements - statements, counters.commits - commits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=30)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(f"sqlite:///{os.path.join(tmp, 'booking.db')}")
+        event_ids, tokens = setup_data(app, args.events, 2 * args.rounds + 1)
+        client = app.test_client()
+        with app.app_context():
+            counters = Counters(db.engine)
+
+        def loop(client, headers):
+            for event_id in event_ids:
+                response = client.post('/api/bookings', json={'event_id': event_id}, headers=headers)
+                assert response.status_code == 201, response.get_json()
+
+        def batch(client, headers):
+            body = {'bookings': [{'event_id': event_id, 'seats': 1} for event_id in event_ids]}
+            response = client.post('/api/bookings/batch', json=body, headers=headers)
+            assert response.status_code == 201, response.get_json()
+
+        results = {
+            'loop': run_rounds(client, counters, tokens[:args.rounds], loop),
+            'batch': run_rounds(client, counters, tokens[args.rounds:2 * args.rounds], batch)
+        }
+        print(f'{args.rounds} rounds of {args.events} bookings each')
+        for name, (elapsed, statements, commits) in results.items():
+            print(f'  {name:<6} {elapsed / args.rounds * 1000:8.1f} ms/round  '
+                  f'{statements / args.rounds:6.0f} statements/round  {commits / args.rounds:4.0f} commits/round')
+        print(f'  speed-up {results["loop"][0] / results["batch"][0]:.1f}x')
+
+        # All or nothing: the last event cannot take the requested seats
+        with app.app_context():
+            before = db.session.query(db.func.sum(Event.current_participants)).scalar()
+            bookings_before = Booking.query.count()
+            outbox_before = OutboxMessage.query.count()
+        body = {'bookings': [{'event_id': event_id, 'seats': 2} for event_id in event_ids[:-1]]
+                + [{'event_id': event_ids[-1], 'seats': 5000}]}
+        response = client.post('/api/bookings/batch', json=body,
+                               headers={'Authorization': f'Bearer {tokens[-1]}'})
+        with app.app_context():
+            unchanged = (
+                db.session.query(db.func.sum(Event.current_participants)).scalar() == before
+                and Booking.query.count() == bookings_before
+                and OutboxMessage.query.count() == outbox_before
+            )
+        ok = response.status_code == 400 and response.get_json()['event_id'] == event_ids[-1] and unchanged
+        print(f'Over-capacity group rejected with {response.status_code} and nothing booked: '
+              f'{"PASS" if ok else "FAIL"}')
+        return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
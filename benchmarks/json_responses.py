@@ -0,0 +1,184 @@
+"""Serialization CPU time and bytes on the wire of the events and bookings listings.
+
+Times building and encoding a full page of GET /api/events and a user's
+GET /api/bookings, first as before serialization.py (to_dict methods
+calling isoformat(), then Flask's stdlib encoder with sorted keys) and
+then through the model serializers and the app's JSON provider. Then
+fetches both listings with each Accept-Encoding and reports the body
+sizes. Fails if the two encodings parse to different documents or a
+compressed body does not decompress to the plain one.
+
+Usage:
+    python -m benchmarks.json_responses --events 200 --bookings 500 --repeat 200
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask.json.provider import DefaultJSONProvider
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+from sqlalchemy.orm import contains_eager, joinedload
+
+from benchmarks.seat_reservation import build_app
+from models import db, User, Facilitator, Event, Booking, booking_serializer, event_serializer
+from serialization import brotli, orjson
+
+EPOCH = datetime(2030, 1, 1)
+DESCRIPTION = ('A slow-paced session of breath work, gentle movement and guided meditation. '
+               'Mats and blankets are provided; bring water and wear loose clothing.')
+
+
+def legacy_facilitator(facilitator):
+    return {
+        'id': facilitator.id,
+        'name': facilitator.name,
+        'email': facilitator.email,
+        'specialization': facilitator.specialization
+    }
+
+
+def legacy_event(event):
+    return {
+        'id': event.id,
+        'title': event.title,
+        'description': event.description,
+        'event_type': event.event_type,
+        'start_time': event.start_time.isoformat(),
+        'end_time': event.end_time.isoformat(),
+        'max_participants': event.max_participants,
+        'current_participants': event.current_participants,
+        'price': event.price,
+        'facilitator': legacy_facilitator(event.facilitator) if event.facilitator else None,
+        'is_active': event.is_active
+    }
+
+
+def legacy_booking(booking):
+    return {
+        'id': booking.id,
+        'event': legacy_event(booking.event) if booking.event else None,
+        'booked_at': booking.booked_at.isoformat(),
+        'status': booking.status,
+        'seats': booking.seats
+    }
+
+
+def legacy_dumps(obj):
+    """What jsonify produced before: the stdlib encoder, sorted keys, compact"""
+    provider = DefaultJSONProvider
+    return json.dumps(obj, default=provider.default, ensure_ascii=provider.ensure_ascii,
+                      sort_keys=provider.sort_keys, separators=(',', ':')).encode()
+
+
+def setup_data(app, events, bookings):
+    """Facilitators, --events future events and one user booked into --bookings of them"""
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Facilitator(name=f'Facilitator {i}', email=f'facilitator{i}@test.local',
+                        specialization='Hatha yoga, pranayama and sound healing')
+            for i in range(20)
+        ])
+        user = User(username='reader', email='reader@test.local', password_hash='-')
+        db.session.add(user)
+        db.session.flush()
+
+        db.session.execute(insert(Event), [{
+            'title': f'Morning Flow {i}', 'description': DESCRIPTION, 'event_type': 'session',
+            'start_time': EPOCH + timedelta(hours=2 * i), 'end_time': EPOCH + timedelta(hours=2 * i + 1),
+            'max_participants': 20, 'price': 450.0 + i % 7 * 50, 'facilitator_id': i % 20 + 1
+        } for i in range(max(events, bookings))])
+        db.session.execute(insert(Booking), [
+            {'user_id': user.id, 'event_id': i + 1, 'status': 'confirmed'} for i in range(bookings)
+        ])
+        db.session.commit()
+        return create_access_token(identity=str(user.id))
+
+
+def cpu_ms(fn, repeat):
+    """Median process CPU time of fn() in ms"""
+    samples = []
+    for _ in range(repeat):
+        started = time.process_time()
+        fn()
+        samples.append((time.process_time() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=200, help='events on the listing page')
+    parser.add_argument('--bookings', type=int, default=500, help="bookings in the user's listing")
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(f"sqlite:///{os.path.join(tmp, 'booking.db')}")
+        token = setup_data(app, args.events, args.bookings)
+
+        with app.app_context():
+            events = (Event.query.options(joinedload(Event.facilitator))
+                      .order_by(Event.start_time, Event.id).limit(args.events).all())
+            bookings = (db.session.query(Booking).join(Booking.event).join(Event.facilitator)
+                        .options(contains_eager(Booking.event).contains_eager(Event.facilitator))
+                        .order_by(Event.start_time, Booking.id).all())
+            listings = {
+                'events': (lambda: {'events': [legacy_event(e) for e in events], 'count': len(events)},
+                           lambda: {'events': [event_serializer(e) for e in events], 'count': len(events)}),
+                'bookings': (lambda: {'upcoming': [legacy_booking(b) for b in bookings], 'total': len(bookings)},
+                             lambda: {'upcoming': [booking_serializer(b) for b in bookings],
+                                      'total': len(bookings)})
+            }
+
+            print(f"JSON encoder: {'orjson' if orjson is not None else 'stdlib'}")
+            print(f"{'CPU ms per response':<22}{'build':>9}{'encode':>9}{'total':>9}")
+            for name, (legacy, fast) in listings.items():
+                legacy_data, fast_data = legacy(), fast()
+                legacy_body, fast_body = legacy_dumps(legacy_data), app.json.dumps(fast_data).encode()
+                same = json.loads(legacy_body) == json.loads(fast_body)
+                failed |= not same
+                for label, build, encode, data in (
+                        ('before', legacy, legacy_dumps, legacy_data),
+                        ('after', fast, app.json.dumps, fast_data)):
+                    build_ms = cpu_ms(build, args.repeat)
+                    encode_ms = cpu_ms(lambda: encode(data), args.repeat)
+                    print(f'{name + " " + label:<22}{build_ms:>9.2f}{encode_ms:>9.2f}{build_ms + encode_ms:>9.2f}')
+                print(f"{name + ' same document':<22}{'PASS' if same else 'FAIL':>27}")
+
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+        encodings = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+        print(f"\n{'bytes on the wire':<22}" + ''.join(f'{encoding:>10}' for encoding in encodings))
+        for name, url in (('events', f'/api/events?limit={args.events}'), ('bookings', '/api/bookings')):
+            sizes = []
+            plain = None
+            for encoding in encodings:
+                response = client.get(url, headers={**headers, 'Accept-Encoding': encoding})
+                body = response.get_data()
+                sizes.append(len(body))
+                received = response.headers.get('Content-Encoding', 'identity')
+                if encoding == 'identity':
+                    plain = body
+                elif encoding == 'gzip':
+                    failed |= received != 'gzip' or gzip.decompress(body) != plain
+                else:
+                    failed |= received != 'br' or brotli.decompress(body) != plain
+            print(f'{name:<22}' + ''.join(f'{size:>10,}' for size in sizes))
+
+        with app.app_context():
+            db.engine.dispose()
+
+    print(f"Documents match, encodings round-trip: {'FAIL' if failed else 'PASS'}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Memory per subscriber and broadcast latency of the live seat stream.
+
+Starts live_seats.py in a subprocess, opens --clients SSE connections from
+one asyncio loop, and reads the hub's resident memory before and after.
+Then publishes --broadcasts seat deltas over UDP, each stamped with its send
+time, and records how long every subscriber took to receive it. Each
+connection presents its own stream ticket; one reused ticket must be refused.
+
+Raise the open-files limit first for large runs (ulimit -n 20000).
+
+Usage:
+    python -m benchmarks.live_seats --clients 5000 --broadcasts 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from config import Config
+from stream_tickets import issue_ticket
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port(kind=socket.SOCK_STREAM):
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def rss_kib(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def subscribe(port, ticket):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET /stream?ticket={ticket} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    await writer.drain()
+    status = await reader.readline()
+    if b' 200 ' not in status:
+        raise RuntimeError(f'Subscription refused: {status!r}')
+    await reader.readuntil(b'\r\n\r\n')
+    return reader, writer
+
+
+async def receive(reader, expected, latencies):
+    """Record one latency per broadcast delivered to this subscriber"""
+    while expected:
+        line = await reader.readline()
+        if not line:
+            return
+        if line.startswith(b'data: '):
+            sent = json.loads(line[6:])['sent']
+            latencies.append(time.time() - sent)
+            expected -= 1
+
+
+async def run(clients, broadcasts, interval, concurrency):
+    port, publish_port = free_port(), free_port(socket.SOCK_DGRAM)
+    hub = subprocess.Popen(
+        [sys.executable, 'live_seats.py', '--host', '127.0.0.1', '--port', str(port),
+         '--publish-port', str(publish_port)],
+        cwd=ROOT, stdout=subprocess.PIPE
+    )
+    try:
+        hub.stdout.readline()  # ready banner
+        idle_rss = rss_kib(hub.pid)
+
+        tickets = [issue_ticket(Config.LIVE_STREAM_SECRET, 300) for _ in range(clients)]
+        gate = asyncio.Semaphore(concurrency)
+
+        async def connect(ticket):
+            async with gate:
+                return await subscribe(port, ticket)
+
+        started = time.perf_counter()
+        connections = await asyncio.gather(*(connect(ticket) for ticket in tickets))
+        connect_seconds = time.perf_counter() - started
+        try:
+            await subscribe(port, tickets[0])
+            reuse_refused = False
+        except RuntimeError:
+            reuse_refused = True
+        await asyncio.sleep(0.5)
+        subscribed_rss = rss_kib(hub.pid)
+
+        latencies = []
+        receivers = [asyncio.create_task(receive(reader, broadcasts, latencies))
+                     for reader, _ in connections]
+        publisher = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for n in range(broadcasts):
+            delta = {'type': 'seats', 'event_id': n, 'current_participants': n,
+                     'max_participants': broadcasts, 'sent': time.time()}
+            publisher.sendto(json.dumps(delta).encode(), ('127.0.0.1', publish_port))
+            await asyncio.sleep(interval)
+        await asyncio.wait_for(asyncio.gather(*receivers), timeout=60)
+        publisher.close()
+
+        for _, writer in connections:
+            writer.close()
+    finally:
+        hub.terminate()
+        hub.wait()
+
+    expected = clients * broadcasts
+    return {
+        'clients': clients,
+        'reused_ticket_refused': reuse_refused,
+        'connect_seconds': round(connect_seconds, 2),
+        'hub_rss_idle_mib': round(idle_rss / 1024, 1),
+        'hub_rss_subscribed_mib': round(subscribed_rss / 1024, 1),
+        'kib_per_subscriber': round((subscribed_rss - idle_rss) / clients, 2),
+        'broadcasts': broadcasts,
+        'deliveries': len(latencies),
+        'delivered_ratio': round(len(latencies) / expected, 4),
+        'latency_ms': {
+            'p50': round(statistics.median(latencies) * 1000, 2),
+            'p99': round(percentile(latencies, 99) * 1000, 2),
+            'max': round(max(latencies) * 1000, 2)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=5000)
+    parser.add_argument('--broadcasts', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.1, help='seconds between deltas')
+    parser.add_argument('--concurrency', type=int, default=200, help='connections opened at once')
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.clients, args.broadcasts, args.interval, args.concurrency))
+    print(json.dumps(result, indent=2))
+    return 0 if result['delivered_ratio'] == 1 and result['reused_ticket_refused'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
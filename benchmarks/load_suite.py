@@ -0,0 +1,324 @@
+"""End-to-end load test of the booking API and its CRM, with regression gating.
+
+Serves app.py over HTTP on a synthetic_data dataset, with the outbox
+dispatcher delivering to a CRM: by default a local stand-in that answers
+POST /notify/batch after --crm-latency-ms, or with --crm app the real
+crm_app.py. Worker threads then drive a register/login/list/book/cancel mix
+through real HTTP connections.
+
+Reports, per operation, throughput, p50/p95/p99 latency, failures and SQL
+statements per request (from the app's own instrumentation), plus how long
+bookings took to reach the CRM. Results are written as JSON with --output.
+With --baseline, the run fails when a tracked metric is worse than the
+baseline by more than --threshold.
+
+Usage:
+    python -m benchmarks.load_suite --requests 5000 --concurrency 8 --output baseline.json
+    python -m benchmarks.load_suite --baseline baseline.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from werkzeug.serving import make_server
+
+import config
+import metrics
+import synthetic_data
+
+# Relative weights of each operation in the request mix
+MIX = {'register': 2, 'login': 8, 'list': 50, 'book': 25, 'cancel': 15}
+
+# Tracked metrics and which direction is worse
+TRACKED = {'throughput_rps': 'lower', 'p95_ms': 'higher', 'p99_ms': 'higher', 'sql_per_request': 'higher'}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+class CRMStandIn(ThreadingHTTPServer):
+    """Accepts POST /notify/batch like the CRM and records when each booking arrived"""
+    daemon_threads = True
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.arrivals = []
+        self.lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), CRMStandInHandler)
+
+
+class CRMStandInHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.server.latency)
+        now = datetime.utcnow()
+        with self.server.lock:
+            self.server.arrivals.extend((now, item.get('booked_at')) for item in body)
+        response = json.dumps({'results': [{'booking_id': item['booking_id'], 'status': 'created'}
+                                           for item in body]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(app):
+    """Serve `app` on a free local port from a daemon thread; returns (server, base url)"""
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+class Worker:
+    """One simulated client: a connection, a logged-in user and their bookings"""
+
+    def __init__(self, base_url, rng, users, event_ids, record):
+        self.base_url = base_url
+        self.rng = rng
+        self.users = users
+        self.event_ids = event_ids
+        self.record = record
+        self.session = requests.Session()
+        self.bookings = []
+        self.login()
+
+    def call(self, op, method, path, expected, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=60, **kwargs)
+            ok = response.status_code in expected
+        except requests.RequestException:
+            response, ok = None, False
+        self.record(op, time.perf_counter() - started, ok)
+        return response if ok else None
+
+    def login(self, op=None):
+        username = f'user{self.rng.randint(1, self.users)}'
+        response = self.call(op or 'login', 'POST', '/api/auth/login', (200,),
+                             json={'username': username, 'password': synthetic_data.PASSWORD})
+        if response is not None:
+            self.session.headers['Authorization'] = f"Bearer {response.json()['access_token']}"
+            self.bookings = []
+
+    def register(self):
+        name = f'load{threading.get_ident()}x{self.rng.getrandbits(48)}'
+        self.call('register', 'POST', '/api/auth/register', (201,),
+                  json={'username': name, 'email': f'{name}@example.com', 'password': 'load-test-password'})
+
+    def list(self):
+        self.call('list', 'GET', f'/api/events?limit={self.rng.choice((10, 20, 50))}', (200,))
+
+    def book(self):
+        # Full, past-duplicate, already-booked and clashing events answer 400/409 by design
+        response = self.call('book', 'POST', '/api/bookings', (201, 400, 409),
+                             json={'event_id': self.rng.choice(self.event_ids)})
+        if response is not None and response.status_code == 201:
+            self.bookings.append(response.json()['booking']['id'])
+
+    def cancel(self):
+        if not self.bookings:
+            return self.book()
+        booking_id = self.bookings.pop(self.rng.randrange(len(self.bookings)))
+        self.call('cancel', 'DELETE', f'/api/bookings/{booking_id}', (200,))
+
+    def run(self, operations):
+        for op in operations:
+            getattr(self, op)()
+        self.session.close()
+
+
+def sql_per_request(app, paths):
+    """Mean SQL statements per request for each operation, from the app's instrumentation"""
+    adapter = app.url_map.bind('localhost')
+    by_route = {(labels['method'], labels['route']): (count, total)
+                for labels, count, total in metrics.histogram_totals('http_request_sql_statements')}
+    result = {}
+    for op, (method, path) in paths.items():
+        rule, _ = adapter.match(path, method=method, return_rule=True)
+        count, total = by_route.get((method, rule.rule), (0, 0))
+        result[op] = round(total / count, 2) if count else None
+    return result
+
+
+def run(args):
+    import app as booking_service
+    import crm_app as crm_service
+    from crm_outbox import OutboxDispatcher
+    from models import db, Event
+
+    with tempfile.TemporaryDirectory() as tmp:
+        booking_app = booking_service.create_app(
+            {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'booking.db')}"})
+        crm = crm_service.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'crm.db')}"})
+        crm.logger.disabled = True
+        booking_app.logger.disabled = True
+
+        print('Generating dataset...')
+        synthetic_data.generate(booking_app, crm, seed=args.seed, users=args.users, facilitators=50,
+                                events=args.events, bookings=args.bookings, epoch=datetime.utcnow(),
+                                chunk_rows=100_000)
+        with booking_app.app_context():
+            event_ids = [event_id for event_id, in db.session.query(Event.id).filter(
+                Event.is_active.is_(True), Event.start_time > datetime.utcnow())]
+
+        if args.crm == 'app':
+            crm_server, crm_url = serve(crm)
+            stand_in = None
+        else:
+            stand_in = CRMStandIn(args.crm_latency_ms / 1000)
+            threading.Thread(target=stand_in.serve_forever, daemon=True).start()
+            crm_server, crm_url = stand_in, f'http://127.0.0.1:{stand_in.server_port}'
+        config.Config.CRM_URL = crm_url
+        dispatcher = OutboxDispatcher(booking_app, poll_interval=0.05).start()
+        api_server, api_url = serve(booking_app)
+
+        rng = random.Random(args.seed)
+        ops, weights = zip(*MIX.items())
+        plans = [rng.choices(ops, weights=weights, k=args.requests // args.concurrency)
+                 for _ in range(args.concurrency)]
+        samples = {op: [] for op in MIX}
+        failures = {op: 0 for op in MIX}
+        lock = threading.Lock()
+
+        def record(op, elapsed, ok):
+            with lock:
+                samples[op].append(elapsed)
+                failures[op] += not ok
+
+        workers = [Worker(api_url, random.Random(args.seed * 1000 + i), args.users, event_ids, record)
+                   for i in range(args.concurrency)]
+        for op in samples:
+            samples[op].clear()
+            failures[op] = 0
+        threads = [threading.Thread(target=worker.run, args=(plan,)) for worker, plan in zip(workers, plans)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        # Let the outbox drain so every booking's trip to the CRM is measured
+        with booking_app.app_context():
+            from crm_outbox import outbox_depth
+            deadline = time.monotonic() + 60
+            while outbox_depth() and time.monotonic() < deadline:
+                time.sleep(0.1)
+            undelivered = outbox_depth()
+        dispatcher.stop()
+        api_server.shutdown()
+        crm_server.shutdown()
+
+        sql = sql_per_request(booking_app, {
+            'register': ('POST', '/api/auth/register'), 'login': ('POST', '/api/auth/login'),
+            'list': ('GET', '/api/events'), 'book': ('POST', '/api/bookings'),
+            'cancel': ('DELETE', '/api/bookings/1')
+        })
+        with booking_app.app_context():
+            db.engine.dispose()
+        with crm.app_context():
+            crm_service.db.engine.dispose()
+
+    endpoints = {}
+    for op, values in samples.items():
+        endpoints[op] = {
+            'requests': len(values),
+            'failures': failures[op],
+            'throughput_rps': round(len(values) / wall, 1),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'sql_per_request': sql[op]
+        }
+    total = sum(len(values) for values in samples.values())
+    result = {
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'wall_seconds': round(wall, 2),
+        'throughput_rps': round(total / wall, 1),
+        'failures': sum(failures.values()),
+        'endpoints': endpoints,
+        'crm': {'undelivered': undelivered}
+    }
+    if stand_in is not None:
+        lags = [(arrived - datetime.fromisoformat(booked_at)).total_seconds()
+                for arrived, booked_at in stand_in.arrivals if booked_at]
+        result['crm'].update({
+            'notifications': len(stand_in.arrivals),
+            'delivery_lag_p50_ms': round(percentile(lags, 50) * 1000, 1),
+            'delivery_lag_p99_ms': round(percentile(lags, 99) * 1000, 1)
+        })
+    return result
+
+
+def regressions(result, baseline, threshold, min_delta_ms):
+    """Tracked metrics worse than `baseline` by more than `threshold` (a fraction)"""
+    found = []
+    for op, current in result['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(op)
+        if not before:
+            continue
+        for metric, worse in TRACKED.items():
+            old, new = before.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if worse == 'lower':
+                change = -change
+            small = metric.endswith('_ms') and abs(new - old) < min_delta_ms
+            if change > threshold and not small:
+                found.append(f'{op} {metric}: {old} -> {new} ({change:+.0%} worse)')
+    if baseline.get('failures', 0) == 0 and result['failures']:
+        found.append(f"failures: 0 -> {result['failures']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--crm', choices=('stand-in', 'app'), default='stand-in',
+                        help='deliver notifications to a stub or to crm_app.py')
+    parser.add_argument('--crm-latency-ms', type=float, default=20, help='stand-in response time')
+    parser.add_argument('--output', help='write the results JSON here')
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative regression')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                        help='latency changes smaller than this never count as regressions')
+    args = parser.parse_args()
+
+    result = run(args)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(result, json.load(f), args.threshold, args.min_delta_ms)
+        for line in found:
+            print(f'REGRESSION {line}')
+        print(f'{len(found)} regressions against {args.baseline}')
+        return 1 if found else 0
+    return 1 if result['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Login throughput per core for each password hashing cost setting.
+
+Each setting registers a user whose hash uses that method, then performs
+sequential POST /api/auth/login calls on one thread, so the rate is logins
+per second per core. It also checks that a login rehashes a password stored
+under different parameters.
+
+Usage:
+    python -m benchmarks.password_hashing --seconds 3
+    python -m benchmarks.password_hashing --method pbkdf2:sha256:600000 --method scrypt:16384:8:1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from app import create_app, db
+from models import User, password_hasher
+
+DEFAULT_METHODS = [
+    'scrypt:32768:8:1',
+    'scrypt:16384:8:1',
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:260000',
+    'pbkdf2:sha256:100000',
+]
+
+
+def logins_per_second(client, username, seconds):
+    payload = {'username': username, 'password': 'correct horse'}
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        response = client.post('/api/auth/login', json=payload)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--method', action='append', help='Werkzeug hash method (repeatable)')
+    parser.add_argument('--seconds', type=float, default=3.0, help='measurement time per method')
+    args = parser.parse_args()
+    methods = args.method or DEFAULT_METHODS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'auth.db')}"})
+        client = app.test_client()
+        with app.app_context():
+            db.create_all()
+
+        print(f"{'method':24} {'logins/s/core':>14} {'ms/login':>9}")
+        for index, method in enumerate(methods):
+            password_hasher.method = method
+            username = f'bench{index}'
+            client.post('/api/auth/register', json={
+                'username': username, 'email': f'{username}@bench.local', 'password': 'correct horse'
+            })
+            rate = logins_per_second(client, username, args.seconds)
+            print(f'{method:24} {rate:14.1f} {1000 / rate:9.1f}')
+
+        # A login under new parameters transparently upgrades the stored hash
+        password_hasher.method = methods[-1]
+        client.post('/api/auth/login', json={'username': 'bench0', 'password': 'correct horse'})
+        with app.app_context():
+            upgraded = not User.query.filter_by(username='bench0').first().password_needs_rehash()
+            db.engine.dispose()
+
+    print(f"rehash on login: {'ok' if upgraded or len(methods) == 1 else 'FAILED'}")
+    return 0 if upgraded or len(methods) == 1 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""Query-plan regression check for the booking API and the CRM.
+
+Seeds scratch databases, drives every blueprint route (plus the CRM outbox
+dispatcher), records each SQL statement issued, and runs EXPLAIN QUERY PLAN
+on it. Exits non-zero if any statement falls back to a full table or
+index scan.
+
+With --bookings N the databases are filled by synthetic_data instead, with
+N bookings and proportionate users and events, so plans are checked at
+realistic volumes.
+
+Usage:
+    python -m benchmarks.query_plans [--verbose] [--bookings 1000000]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event as sa_event
+
+import app as booking_service
+import config
+import crm_app as crm_service
+
+# Index seeks show as "SEARCH". Every "SCAN" row reads a whole table or a
+# whole index ("SCAN <table> USING [COVERING] INDEX <name>" walks every
+# entry), except a virtual table scanned under a constraint, as FTS5
+# reports a MATCH ("VIRTUAL TABLE INDEX 0:M3"), and a FROM-less SELECT.
+CONSTRAINED_SCAN = re.compile(r'^SCAN (\w+ VIRTUAL TABLE INDEX \d+:\S+|CONSTANT ROW)$')
+
+
+def is_full_scan(line):
+    return line.startswith('SCAN ') and not CONSTRAINED_SCAN.match(line)
+
+
+@contextmanager
+def recording(engine, statements, label):
+    """Collect (label, statement, params) for everything run on `engine`"""
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # insertmanyvalues reports one row's flat parameters as executemany
+        if executemany and parameters and isinstance(parameters[0], (tuple, list, dict)):
+            parameters = parameters[0]
+        statements.append((label, statement, parameters))
+
+    sa_event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield
+    finally:
+        sa_event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def explain(engine, statements):
+    """EXPLAIN QUERY PLAN each distinct statement; returns [(label, sql, plan lines)]"""
+    plans = []
+    seen = set()
+    with engine.connect() as conn:
+        for label, statement, parameters in statements:
+            key = (label, statement)
+            if key in seen or not statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'INSERT')):
+                continue
+            seen.add(key)
+            rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+            plans.append((label, statement, [row[-1] for row in rows]))
+    return plans
+
+
+def seed_booking_db(db, users=200, events=100):
+    from models import User, Facilitator, Event, Booking
+    from reservations import rebuild_seat_counts
+
+    # Facilitators of their own: the seeded ones run retreats these would overlap
+    facilitators = [Facilitator(name=f'Plan check {i}', email=f'plan{i}@facilitator.test.local') for i in range(3)]
+    db.session.add_all(facilitators)
+    db.session.flush()
+    start = datetime.utcnow() - timedelta(days=30)
+    db.session.add_all([
+        Event(title=f'Plan check {i}', event_type='session',
+              start_time=start + timedelta(days=i), end_time=start + timedelta(days=i, hours=1),
+              max_participants=50, facilitator_id=facilitators[i % len(facilitators)].id)
+        for i in range(events)
+    ])
+    db.session.add_all([
+        User(username=f'plan{i}', email=f'plan{i}@test.local', password_hash='-')
+        for i in range(users)
+    ])
+    db.session.commit()
+
+    event_ids = [e.id for e in Event.query.all()]
+    user_ids = [u.id for u in User.query.all()]
+    db.session.add_all([
+        Booking(user_id=user_ids[i % len(user_ids)], event_id=event_ids[(i * 7) % len(event_ids)],
+                status='confirmed' if i % 5 else 'cancelled')
+        for i in range(users * 3)
+        if (i * 7) % len(event_ids) != 0  # leave the first event free for the route checks
+    ])
+    db.session.commit()
+    rebuild_seat_counts()
+
+
+def seed_crm_db(db, rows=500):
+    from crm_models import Notification, CRMEvent
+
+    start = datetime.utcnow()
+    db.session.add_all([
+        CRMEvent(original_event_id=i, title=f'Plan check {i}', facilitator_id=i % 3 + 1,
+                 start_time=start + timedelta(days=i), end_time=start + timedelta(days=i, hours=1))
+        for i in range(1, 101)
+    ])
+    db.session.add_all([
+        Notification(booking_id=i, user_id=i % 50, event_id=i % 100, event_title='x',
+                     facilitator_id=i % 3 + 1)
+        for i in range(1, rows + 1)
+    ])
+    db.session.commit()
+
+
+def drive_booking_api(app, db, username):
+    from flask_jwt_extended import create_access_token
+    from crm_outbox import OutboxDispatcher, outbox_depth, outbox_lag_seconds
+    from models import Event, User, Booking
+
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        token = create_access_token(identity=str(user.id))
+        booked_by_user = db.session.query(Booking.event_id).filter_by(user_id=user.id)
+        bookable = Event.query.filter(
+            Event.is_active.is_(True), Event.current_participants + 2 <= Event.max_participants,
+            Event.id.not_in(booked_by_user)
+        )
+        free_event_id, *group_events = [e.id for e in bookable.order_by(Event.id).limit(4)]
+        holder = Booking.query.filter(
+            Booking.status == 'confirmed', Booking.event_id.not_in(booked_by_user),
+            Booking.event_id.not_in([free_event_id, *group_events])
+        ).order_by(Booking.id).first()
+        full_event = db.session.get(Event, holder.event_id)
+        full_event.max_participants = full_event.current_participants
+        holder_token = create_access_token(identity=str(holder.user_id))
+        full_event_id, held_booking_id = full_event.id, holder.id
+        db.session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+    client = app.test_client()
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    with recording(engine, statements, 'POST /api/auth/register'):
+        account = {'username': 'plan-check', 'email': 'plan-check@test.local', 'password': 'plan-check-password'}
+        client.post('/api/auth/register', json=account)
+        client.post('/api/auth/register', json=account)
+    with recording(engine, statements, 'POST /api/auth/login'):
+        client.post('/api/auth/login', json={'username': 'plan-check', 'password': 'plan-check-password'})
+        client.post('/api/auth/login', json={'username': 'plan-check', 'password': 'wrong'})
+
+    with recording(engine, statements, 'GET /api/events'):
+        page = client.get('/api/events?limit=10', headers=headers).json
+        client.get(f"/api/events?limit=10&cursor={page['next_cursor']}", headers=headers)
+        client.get('/api/events?limit=10&fields=id,title', headers=headers)
+        client.get('/api/events/search?q=yoga&limit=10', headers=headers)
+        client.get('/api/events/search?event_type=session&min_price=500&from=2020-01-01T00:00:00', headers=headers)
+    with recording(engine, statements, 'GET /api/events/<id>'):
+        client.get(f'/api/events/{free_event_id}', headers=headers)
+    with recording(engine, statements, 'POST /api/bookings'):
+        created = client.post('/api/bookings', json={'event_id': free_event_id}, headers=headers)
+        client.post('/api/bookings', json={'event_id': free_event_id}, headers=headers)
+    with recording(engine, statements, 'POST /api/bookings/batch'):
+        group = {'bookings': [{'event_id': event_id, 'seats': 2} for event_id in group_events]}
+        client.post('/api/bookings/batch', json=group, headers=headers)
+        client.post('/api/bookings/batch', json=group, headers=headers)
+    with recording(engine, statements, 'GET /api/bookings'):
+        client.get('/api/bookings', headers=headers)
+        client.get('/api/bookings?from=2020-01-01T00:00:00&to=2030-01-01T00:00:00', headers=headers)
+    window = f"from={datetime.utcnow() - timedelta(days=30):%Y-%m-%dT%H:%M:%S}&to={datetime.utcnow() + timedelta(days=60):%Y-%m-%dT%H:%M:%S}"
+    with recording(engine, statements, 'GET /api/bookings/freebusy'):
+        client.get(f'/api/bookings/freebusy?{window}', headers=headers)
+    with recording(engine, statements, 'GET /api/events/facilitators/<id>/freebusy'):
+        client.get(f'/api/events/facilitators/1/freebusy?{window}', headers=headers)
+    with recording(engine, statements, 'DELETE /api/bookings/<id>'):
+        client.delete(f"/api/bookings/{created.json['booking']['id']}", headers=headers)
+
+    with recording(engine, statements, 'POST /api/bookings/waitlist'):
+        joined = client.post('/api/bookings/waitlist', json={'event_id': full_event_id}, headers=headers)
+        client.post('/api/bookings/waitlist', json={'event_id': full_event_id}, headers=headers)
+    with recording(engine, statements, 'GET /api/bookings/waitlist'):
+        client.get('/api/bookings/waitlist', headers=headers)
+    with recording(engine, statements, 'DELETE /api/bookings/<id> (waitlist promotion)'):
+        client.delete(f'/api/bookings/{held_booking_id}', headers={'Authorization': f'Bearer {holder_token}'})
+    with recording(engine, statements, 'DELETE /api/bookings/waitlist/<id>'):
+        client.delete(f"/api/bookings/waitlist/{joined.json['entry']['id']}", headers=headers)
+
+    crm_headers = {'Authorization': f'Bearer {config.Config.CRM_BEARER_TOKEN}'}
+    with recording(engine, statements, 'GET /api/sync/events'):
+        client.get('/api/sync/events?since=50&limit=10', headers=crm_headers)
+    with recording(engine, statements, 'POST /api/sync/events'):
+        feed = client.get('/api/sync/events?since=0&limit=1', headers=crm_headers).json
+        client.post('/api/sync/events', headers=crm_headers, json={'changes': [{
+            'event_id': feed['events'][0]['id'], 'base_seq': feed['events'][0]['change_seq'],
+            'fields': {'price': 1.0}
+        }]})
+
+    with app.app_context():
+        with recording(engine, statements, 'outbox metrics'):
+            outbox_depth()
+            outbox_lag_seconds()
+        with recording(engine, statements, 'outbox dispatcher'):
+            dispatcher = OutboxDispatcher(app)
+            dispatcher.deliver = lambda batch: {m.id: 'skipped' for m in batch}
+            dispatcher.run_once()
+        return explain(engine, statements)
+
+
+def drive_crm_api(app):
+    from crm_models import db
+
+    headers = {'Authorization': f'Bearer {config.CRMConfig.BEARER_TOKEN}'}
+    client = app.test_client()
+    payload = {
+        'booking_id': 10_000, 'user': {'id': 1, 'username': 'u', 'email': 'u@x'},
+        'event': {'id': 1, 'title': 'x'}, 'facilitator_id': 1
+    }
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    with recording(engine, statements, 'POST /notify'):
+        client.post('/notify', json=payload, headers=headers)
+        client.post('/notify', json=payload, headers=headers)
+    with recording(engine, statements, 'POST /notify/batch'):
+        client.post('/notify/batch', json=[dict(payload, booking_id=10_001), payload], headers=headers)
+    with recording(engine, statements, 'GET /api/facilitator/<id>/bookings'):
+        page = client.get('/api/facilitator/1/bookings?limit=10', headers=headers).json
+        client.get(f"/api/facilitator/1/bookings?limit=10&cursor={page['next_cursor']}", headers=headers)
+    with recording(engine, statements, 'GET /api/facilitator/<id>/bookings/export'):
+        client.get('/api/facilitator/1/bookings/export?from=2020-01-01T00:00:00&to=2030-01-01', headers=headers)
+        client.get('/api/facilitator/1/bookings/export?format=csv&event_id=1', headers=headers)
+    with recording(engine, statements, 'POST /notify (cancellation)'):
+        client.post('/notify', json=dict(payload, status='cancelled'), headers=headers)
+    with recording(engine, statements, 'GET /api/facilitator/<id>/analytics/daily'):
+        client.get('/api/facilitator/1/analytics/daily?from=2020-01-01&to=2030-01-01&event_id=1', headers=headers)
+    with recording(engine, statements, 'GET /api/facilitator/<id>/analytics/totals'):
+        client.get('/api/facilitator/1/analytics/totals', headers=headers)
+    with recording(engine, statements, 'GET /api/analytics/facilitators'):
+        client.get('/api/analytics/facilitators?from=2020-01-01', headers=headers)
+    with recording(engine, statements, 'GET /api/facilitator/<id>/events'):
+        page = client.get('/api/facilitator/1/events?limit=10', headers=headers).json
+        client.get(f"/api/facilitator/1/events?limit=10&cursor={page['next_cursor']}", headers=headers)
+    with recording(engine, statements, 'PUT /api/facilitator/<id>/events/<id>'):
+        client.put('/api/facilitator/2/events/1', json={'title': 'Renamed'}, headers=headers)
+    with recording(engine, statements, 'DELETE /api/facilitator/<id>/events/<id>'):
+        client.delete('/api/facilitator/2/events/1', headers=headers)
+    with recording(engine, statements, 'POST /api/facilitator/login'):
+        client.post('/api/facilitator/login', json={'username': 'priya', 'password': 'priya123'})
+
+    with app.app_context():
+        return explain(engine, statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--verbose', action='store_true', help='print every plan')
+    parser.add_argument('--bookings', type=int, default=0, help='seed with synthetic_data at this size')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        booking_app = booking_service.create_app(
+            {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'booking.db')}"})
+        crm = crm_service.create_app(
+            {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'crm.db')}"})
+        crm.logger.disabled = True
+
+        if args.bookings:
+            import synthetic_data
+            synthetic_data.generate(
+                booking_app, crm, seed=1, users=max(args.bookings // 100, 1000), facilitators=100,
+                events=max(args.bookings // 200, 500), bookings=args.bookings,
+                epoch=datetime.utcnow(), chunk_rows=100_000)
+            username = 'user1'
+        else:
+            with booking_app.app_context():
+                booking_service.init_db()
+                seed_booking_db(booking_service.db)
+            with crm.app_context():
+                crm_service.init_db()
+                seed_crm_db(crm_service.db)
+            username = 'plan1'
+
+        plans = drive_booking_api(booking_app, booking_service.db, username) + drive_crm_api(crm)
+
+        with booking_app.app_context():
+            booking_service.db.engine.dispose()
+        with crm.app_context():
+            crm_service.db.engine.dispose()
+
+    failures = 0
+    for label, statement, lines in plans:
+        scans = [line for line in lines if is_full_scan(line)]
+        if scans:
+            failures += 1
+        if scans or args.verbose:
+            print(f"{'FULL SCAN' if scans else 'ok'}  [{label}]")
+            print(f'    {" ".join(statement.split())}')
+            for line in lines:
+                print(f'      {line}')
+
+    print(f'{len(plans)} statements checked, {failures} with full scans')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""Schedule-conflict checks against large schedules, indexed versus naive.
+
+Builds one facilitator with --events back-to-back events and one user
+booked into --bookings of them, then times the overlap tests of
+schedule.py against the plain "start_time < end AND end_time > start"
+query over the same rows, for random probe windows. Also times the
+booking and free/busy routes, and checks that both methods agree.
+
+Usage:
+    python -m benchmarks.schedule_conflicts --events 50000 --bookings 10000 --probes 500
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert, select
+
+from benchmarks.seat_reservation import build_app
+from models import db, User, Facilitator, Event, Booking
+from schedule import facilitator_events, fork_node, user_events
+
+EPOCH = datetime(2030, 1, 1)
+
+
+def setup_data(app, events, bookings, seed, chunk=20000):
+    """A facilitator's disjoint events and a user booked into every nth one; returns their ids"""
+    rng = random.Random(seed)
+    with app.app_context():
+        db.create_all()
+        facilitator = Facilitator(name='Busy', email='busy@test.local')
+        user = User(username='busy', email='busy@test.local', password_hash='-')
+        db.session.add_all([facilitator, user])
+        db.session.flush()
+
+        rows = []
+        for i in range(events):
+            start = EPOCH + timedelta(hours=2 * i, minutes=rng.randrange(0, 30))
+            end = start + timedelta(minutes=rng.randrange(30, 90))
+            rows.append({'id': i + 1, 'title': f'Slot {i}', 'event_type': 'session', 'start_time': start,
+                         'end_time': end, 'max_participants': 10, 'facilitator_id': facilitator.id,
+                         'schedule_node': fork_node(start, end)})
+        for offset in range(0, events, chunk):
+            db.session.execute(insert(Event), rows[offset:offset + chunk])
+
+        step = max(events // bookings, 1)
+        booked = [rows[i] for i in range(0, events, step)][:bookings]
+        for offset in range(0, len(booked), chunk):
+            db.session.execute(insert(Booking), [
+                {'user_id': user.id, 'event_id': row['id'], 'status': 'confirmed',
+                 'schedule_node': row['schedule_node']}
+                for row in booked[offset:offset + chunk]
+            ])
+        db.session.execute(
+            Event.__table__.update()
+            .where(Event.id.in_([row['id'] for row in booked]))
+            .values(current_participants=1)
+        )
+        db.session.commit()
+        return facilitator.id, user.id, [row['id'] for row in booked], 2 * events
+
+
+def naive_facilitator_events(facilitator_id, start, end):
+    return [tuple(row) for row in db.session.execute(
+        select(Event.id, Event.start_time, Event.end_time)
+        .where(Event.facilitator_id == facilitator_id, Event.is_active.is_(True),
+               Event.start_time < end, Event.end_time > start)
+        .order_by(Event.start_time)
+    )]
+
+
+def naive_user_events(user_id, start, end):
+    return [tuple(row) for row in db.session.execute(
+        select(Event.id, Event.start_time, Event.end_time)
+        .join(Booking, Booking.event_id == Event.id)
+        .where(Booking.user_id == user_id, Booking.status == 'confirmed',
+               Event.start_time < end, Event.end_time > start)
+        .order_by(Event.start_time)
+    )]
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--bookings', type=int, default=10000)
+    parser.add_argument('--probes', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(f"sqlite:///{os.path.join(tmp, 'booking.db')}")
+        facilitator_id, user_id, booked, span_hours = setup_data(app, args.events, args.bookings, args.seed)
+        print(f'Facilitator with {args.events:,} events, user with {len(booked):,} bookings')
+
+        rng = random.Random(args.seed)
+        probes = []
+        for _ in range(args.probes):
+            start = EPOCH + timedelta(minutes=rng.randrange(0, span_hours * 60))
+            probes.append((start, start + timedelta(minutes=rng.choice((15, 60, 240, 1440, 4320)))))
+
+        samples = {name: [] for name in ('facilitator indexed', 'facilitator naive', 'user indexed', 'user naive')}
+        mismatches = 0
+        with app.app_context():
+            for start, end in probes:
+                ms, indexed = timed(facilitator_events, facilitator_id, start, end)
+                samples['facilitator indexed'].append(ms)
+                ms, naive = timed(naive_facilitator_events, facilitator_id, start, end)
+                samples['facilitator naive'].append(ms)
+                mismatches += indexed != naive
+
+                ms, indexed = timed(user_events, user_id, start, end)
+                samples['user indexed'].append(ms)
+                ms, naive = timed(naive_user_events, user_id, start, end)
+                samples['user naive'].append(ms)
+                mismatches += indexed != naive
+            token = create_access_token(identity=str(user_id))
+
+        # Through the API: free slots of the same facilitator book, overlapping ones are refused
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+        booked_set = set(booked)
+        free_ids = [event_id for event_id in range(1, args.events + 1) if event_id not in booked_set]
+        for event_id in rng.sample(free_ids, min(50, len(free_ids))):
+            ms, response = timed(client.post, '/api/bookings', json={'event_id': event_id}, headers=headers)
+            samples.setdefault('POST /api/bookings (201)', []).append(ms)
+            mismatches += response.status_code != 201
+
+        with app.app_context():
+            other = Facilitator(name='Other', email='other@test.local')
+            db.session.add(other)
+            db.session.flush()
+            clash_rows = []
+            for event_id in rng.sample(booked, min(50, len(booked))):
+                event = db.session.get(Event, event_id)
+                clash_rows.append(Event(title=f'Clash {event_id}', event_type='session', max_participants=10,
+                                        start_time=event.start_time + timedelta(minutes=10),
+                                        end_time=event.end_time + timedelta(minutes=10),
+                                        facilitator_id=other.id))
+            db.session.add_all(clash_rows)
+            db.session.commit()
+            clash_ids = [row.id for row in clash_rows]
+        for event_id in clash_ids:
+            ms, response = timed(client.post, '/api/bookings', json={'event_id': event_id}, headers=headers)
+            samples.setdefault('POST /api/bookings (409)', []).append(ms)
+            mismatches += response.status_code != 409
+
+        for start, _ in probes[:50]:
+            window = f'from={start:%Y-%m-%dT%H:%M:%S}&to={start + timedelta(days=7):%Y-%m-%dT%H:%M:%S}'
+            ms, response = timed(client.get, f'/api/bookings/freebusy?{window}', headers=headers)
+            samples.setdefault('GET /api/bookings/freebusy (7 days)', []).append(ms)
+            ms, response = timed(client.get, f'/api/events/facilitators/{facilitator_id}/freebusy?{window}',
+                                 headers=headers)
+            samples.setdefault('GET facilitator freebusy (7 days)', []).append(ms)
+            mismatches += response.status_code != 200
+
+        print(f"{'':<38}{'median ms':>10}{'p95 ms':>10}")
+        for name, values in samples.items():
+            values.sort()
+            print(f'{name:<38}{statistics.median(values):>10.2f}{values[int(len(values) * 0.95)]:>10.2f}')
+        print(f"Indexed and naive answers agree, API statuses as expected: {'PASS' if not mismatches else 'FAIL'}")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""Load test for the seat reservation engine.
+
+Fires a burst of parallel POST /api/bookings requests at a small event and
+checks that exactly max_participants of them succeed, then fires repeated
+bookings by one user and checks that only one is confirmed, then parallel
+cancellations of one booking and checks that its seat is released (and the
+CRM notified) only once.
+
+Usage:
+    python -m benchmarks.seat_reservation --requests 300 --seats 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from models import db, User, Facilitator, Event, Booking, OutboxMessage
+
+
+def build_app(database_uri):
+    """Booking API wired to a scratch database"""
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        # Writers queue on SQLite's lock instead of failing fast
+        'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'timeout': 60}}
+    })
+
+
+def setup_data(app, users, seats):
+    """Create one facilitator, two events and `users` users; return ids and tokens"""
+    with app.app_context():
+        db.create_all()
+
+        facilitator = Facilitator(name='Load Test', email='load@test.local')
+        db.session.add(facilitator)
+        db.session.flush()
+
+        start = datetime.utcnow() + timedelta(days=1)
+        crowded = Event(title='Crowded', event_type='session', start_time=start,
+                        end_time=start + timedelta(hours=1), max_participants=seats,
+                        facilitator_id=facilitator.id)
+        # Later, so a user holding a Crowded seat can still book it
+        repeated = Event(title='Repeated', event_type='session', start_time=start + timedelta(hours=2),
+                         end_time=start + timedelta(hours=3), max_participants=seats,
+                         facilitator_id=facilitator.id)
+        db.session.add_all([crowded, repeated])
+
+        # Password hashing is irrelevant here; skip the slow KDF
+        db.session.add_all([
+            User(username=f'load{i}', email=f'load{i}@test.local', password_hash='-')
+            for i in range(users)
+        ])
+        db.session.commit()
+
+        tokens = [create_access_token(identity=str(u.id)) for u in User.query.order_by(User.id)]
+        return crowded.id, repeated.id, tokens
+
+
+def fire(app, event_id, tokens, concurrency):
+    """POST one booking per token in parallel; return a Counter of status codes"""
+    barrier = threading.Barrier(min(concurrency, len(tokens)))
+
+    def book(token):
+        client = app.test_client()
+        try:
+            barrier.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        response = client.post('/api/bookings', json={'event_id': event_id},
+                               headers={'Authorization': f'Bearer {token}'})
+        return response.status_code
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return Counter(pool.map(book, tokens))
+
+
+def fire_cancels(app, booking_id, token, requests, concurrency):
+    """DELETE one booking from `requests` parallel clients; return a Counter of status codes"""
+    barrier = threading.Barrier(min(concurrency, requests))
+
+    def cancel(_):
+        client = app.test_client()
+        try:
+            barrier.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        response = client.delete(f'/api/bookings/{booking_id}', headers={'Authorization': f'Bearer {token}'})
+        return response.status_code
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return Counter(pool.map(cancel, range(requests)))
+
+
+def confirmed_state(app, event_id):
+    with app.app_context():
+        event = db.session.get(Event, event_id)
+        confirmed = Booking.query.filter_by(event_id=event_id, status='confirmed').count()
+        return event.current_participants, confirmed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300, help='parallel bookings to fire')
+    parser.add_argument('--seats', type=int, default=10, help='capacity of the target event')
+    parser.add_argument('--concurrency', type=int, default=64, help='client threads')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(f"sqlite:///{os.path.join(tmp, 'load.db')}")
+        crowded_id, repeated_id, tokens = setup_data(app, args.requests, args.seats)
+
+        started = time.perf_counter()
+        statuses = fire(app, crowded_id, tokens, args.concurrency)
+        elapsed = time.perf_counter() - started
+        counter, confirmed = confirmed_state(app, crowded_id)
+
+        print(f'{args.requests} parallel bookings for {args.seats} seats in {elapsed:.2f}s')
+        print(f'  status codes: {dict(sorted(statuses.items()))}')
+        print(f'  seat counter: {counter}, confirmed bookings: {confirmed}')
+
+        same_user = [tokens[0]] * min(args.requests, 50)
+        repeat_statuses = fire(app, repeated_id, same_user, args.concurrency)
+        _, repeat_confirmed = confirmed_state(app, repeated_id)
+        print(f'{len(same_user)} parallel bookings by one user: {dict(sorted(repeat_statuses.items()))}')
+
+        with app.app_context():
+            booking = Booking.query.filter_by(event_id=crowded_id, status='confirmed').order_by(Booking.id).first()
+            booking_id = booking.id
+            owner_token = create_access_token(identity=str(booking.user_id))
+        cancel_statuses = fire_cancels(app, booking_id, owner_token, 20, args.concurrency)
+        cancel_counter, cancel_confirmed = confirmed_state(app, crowded_id)
+        with app.app_context():
+            # One message for the booking, one for its cancellation
+            notifications = OutboxMessage.query.filter_by(booking_id=booking_id).count()
+        print(f'20 parallel cancellations of one booking: {dict(sorted(cancel_statuses.items()))}')
+        print(f'  seat counter: {cancel_counter}, confirmed bookings: {cancel_confirmed}, '
+              f'CRM notifications: {notifications}')
+
+        with app.app_context():
+            db.engine.dispose()
+
+    ok = (
+        statuses[201] == args.seats == counter == confirmed
+        and statuses[400] == args.requests - args.seats
+        and repeat_statuses[201] == 1 == repeat_confirmed
+        and cancel_statuses[200] == 1 and cancel_statuses[400] == 19
+        and cancel_counter == cancel_confirmed == args.seats - 1
+        and notifications == 2
+    )
+    print('PASS' if ok else 'FAIL')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Waitlist promotion cost versus waitlist length.
+
+For each length, fills a one-seat event's waitlist, then repeatedly has
+the seat holder cancel through DELETE /api/bookings/<id>; every
+cancellation promotes the head of the line. Reports time and SQL
+statements per cancellation, which should not grow with the length, and
+checks that seats went out in FIFO order.
+
+Usage:
+    python -m benchmarks.waitlist --lengths 10,10000,200000 --cancellations 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event as sa_event, insert
+
+from benchmarks.seat_reservation import build_app
+from identity import identity_claims
+from models import db, User, Facilitator, Event, Booking, WaitlistEntry
+
+
+def setup_event(app, length, chunk=20000):
+    """A full one-seat event with `length` users waiting; returns (event id, holder id).
+
+    Waiting users take the ids straight after the holder, in line order.
+    """
+    with app.app_context():
+        db.create_all()
+        facilitator = Facilitator(name='Waitlist', email=f'waitlist{length}@test.local')
+        db.session.add(facilitator)
+        db.session.flush()
+        start = datetime.utcnow() + timedelta(days=1)
+        event = Event(title=f'Waitlist {length}', event_type='retreat', start_time=start,
+                      end_time=start + timedelta(days=2), max_participants=1,
+                      current_participants=1, waitlist_tail=length, facilitator_id=facilitator.id)
+        db.session.add(event)
+        db.session.flush()
+
+        first_user = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+        for offset in range(0, length + 1, chunk):
+            ids = range(first_user + offset, first_user + min(offset + chunk, length + 1))
+            db.session.execute(insert(User), [
+                {'id': i, 'username': f'w{i}', 'email': f'w{i}@test.local', 'password_hash': '-'}
+                for i in ids
+            ])
+            db.session.execute(insert(WaitlistEntry), [
+                {'event_id': event.id, 'user_id': i, 'position': i - first_user}
+                for i in ids if i != first_user
+            ])
+        db.session.add(Booking(user_id=first_user, event_id=event.id, status='confirmed'))
+        db.session.commit()
+        return event.id, first_user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lengths', default='10,10000,200000')
+    parser.add_argument('--cancellations', type=int, default=20)
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(f"sqlite:///{os.path.join(tmp, 'booking.db')}")
+        client = app.test_client()
+        statements = []
+        with app.app_context():
+            sa_event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.append(1))
+
+        print(f'{"waitlist":>10} {"ms/cancel":>10} {"statements":>11}  FIFO')
+        for length in (int(n) for n in args.lengths.split(',')):
+            event_id, holder = setup_event(app, length)
+            rounds = min(args.cancellations, length)
+            with app.app_context():
+                tokens = {
+                    u.id: create_access_token(identity=str(u.id), additional_claims=identity_claims(u))
+                    for u in User.query.filter(User.id.between(holder, holder + rounds))
+                }
+
+            elapsed = 0.0
+            issued = 0
+            fifo = True
+            for n in range(rounds):
+                headers = {'Authorization': f'Bearer {tokens[holder + n]}'}
+                with app.app_context():
+                    booking_id = db.session.query(Booking.id).filter_by(
+                        user_id=holder + n, event_id=event_id, status='confirmed').scalar()
+                before = len(statements)
+                started = time.perf_counter()
+                response = client.delete(f'/api/bookings/{booking_id}', headers=headers)
+                elapsed += time.perf_counter() - started
+                issued += len(statements) - before
+                fifo &= response.status_code == 200 and response.get_json()['waitlist_promotions'] == 1
+                with app.app_context():
+                    fifo &= db.session.query(Booking.id).filter_by(
+                        user_id=holder + n + 1, event_id=event_id, status='confirmed').scalar() is not None
+
+            failed |= not fifo
+            print(f'{length:>10,} {elapsed / rounds * 1000:>10.2f} {issued / rounds:>11.1f}  '
+                  f'{"PASS" if fifo else "FAIL"}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,50 +1,53 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
-import requests
-from models import db, Booking, Event, User
+from sqlalchemy.orm import aliased, contains_eager
+from models import db, Booking, Event, WaitlistEntry
+from crm_outbox import enqueue
+from events import catalogue_cache
+from reservations import (
+    reserve_seat, reserve_group, cancel_reservation, join_waitlist, promote_waitlist, ReservationError
+)
 from config import Config
+from live_updates import parse_address, publish, seat_delta
+from identity import current_identity, identities
+from pagination import parse_datetime_arg
+from schedule import free_busy, schedule_window, user_events
+
+LIVE_UPDATES = parse_address(Config.LIVE_UPDATES_ADDRESS)
 
 bookings_bp = Blueprint('bookings', __name__)
 
 
 def notify_crm(booking, user, event):
-    """Send notification to CRM/Facilitator system"""
-    try:
-        payload = {
-            'booking_id': booking.id,
-            'user': {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email
-            },
-            'event': {
-                'id': event.id,
-                'title': event.title,
-                'event_type': event.event_type,
-                'start_time': event.start_time.isoformat(),
-                'end_time': event.end_time.isoformat()
-            },
-            'facilitator_id': event.facilitator_id,
-            'booked_at': booking.booked_at.isoformat()
-        }
-        
-        headers = {
-            'Authorization': f'Bearer {Config.CRM_BEARER_TOKEN}',
-            'Content-Type': 'application/json'
-        }
-        
-        response = requests.post(
-            f'{Config.CRM_URL}/notify',
-            json=payload,
-            headers=headers,
-            timeout=5
-        )
-        
-        return response.status_code == 200
-    except Exception as e:
-        print(f'CRM notification failed: {e}')
-        return False
+    """Queue a notification for the CRM/Facilitator system.
+
+    The message is written to the outbox in the caller's transaction and
+    delivered later by crm_outbox.OutboxDispatcher. `user` is the serialized
+    user from identity.current_identity(). Cancelled bookings are sent again
+    with status 'cancelled'.
+    """
+    payload = {
+        'booking_id': booking.id,
+        'user': {
+            'id': user['id'],
+            'username': user['username'],
+            'email': user['email']
+        },
+        'event': {
+            'id': event.id,
+            'title': event.title,
+            'event_type': event.event_type,
+            'start_time': event.start_time.isoformat(),
+            'end_time': event.end_time.isoformat(),
+            'price': event.price
+        },
+        'facilitator_id': event.facilitator_id,
+        'booked_at': booking.booked_at.isoformat(),
+        'status': booking.status,
+        'seats': booking.seats
+    }
+    return enqueue(booking.id, payload)
 
 
 @bookings_bp.route('', methods=['POST'])
@@ -59,71 +62,163 @@ def create_booking():
     
     event_id = data.get('event_id')
     
-    # Get event
-    event = Event.query.get(event_id)
-    if not event:
-        return jsonify({'error': 'Event not found'}), 404
+    user = current_identity()
+    if user is None:
+        return jsonify({'error': 'User not found'}), 404
     
-    if not event.is_active:
-        return jsonify({'error': 'Event is no longer available'}), 400
+    # Insert the booking and claim its seat atomically
+    try:
+        booking = reserve_seat(user_id, event_id)
+    except ReservationError as e:
+        return jsonify({'error': e.message}), e.status_code
     
-    # Check if already booked
-    existing_booking = Booking.query.filter_by(
-        user_id=user_id,
-        event_id=event_id,
-        status='confirmed'
-    ).first()
+    # Queue the CRM notification in the booking's transaction
+    notify_crm(booking, user, booking.event)
+    db.session.commit()
+    catalogue_cache.bump()
+    
+    # to_dict() reloads the event after the commit, so the delta is current
+    booking_data = booking.to_dict(user=user)
+    publish(seat_delta(booking.event), LIVE_UPDATES)
+    
+    return jsonify({
+        'message': 'Booking created successfully',
+        'booking': booking_data,
+        'crm_notification': 'queued'
+    }), 201
+
+
+def parse_group_request(data):
+    """{'bookings': [{'event_id', 'seats'}]} -> {event_id: seats}; raises ValueError"""
+    items = data.get('bookings') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError('bookings must be a non-empty list of {event_id, seats}')
+    if len(items) > Config.MAX_GROUP_BOOKING_EVENTS:
+        raise ValueError(f'At most {Config.MAX_GROUP_BOOKING_EVENTS} events per group booking')
+    
+    seats_by_event = {}
+    for item in items:
+        event_id = item.get('event_id') if isinstance(item, dict) else None
+        seats = item.get('seats', 1) if isinstance(item, dict) else None
+        if type(event_id) is not int or type(seats) is not int or seats < 1:
+            raise ValueError('Each booking needs an integer event_id and a positive integer seats')
+        if event_id in seats_by_event:
+            raise ValueError(f'Event {event_id} is listed more than once')
+        seats_by_event[event_id] = seats
+    return seats_by_event
+
+
+@bookings_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def create_group_booking():
+    """Book seats at several events in one transaction, all or nothing"""
+    user_id = int(get_jwt_identity())
     
-    if existing_booking:
-        return jsonify({'error': 'You have already booked this event'}), 409
+    try:
+        seats_by_event = parse_group_request(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Check capacity
-    confirmed_bookings = Booking.query.filter_by(
-        event_id=event_id,
-        status='confirmed'
-    ).count()
+    user = current_identity()
+    if user is None:
+        return jsonify({'error': 'User not found'}), 404
     
-    if confirmed_bookings >= event.max_participants:
-        return jsonify({'error': 'Event is fully booked'}), 400
+    try:
+        bookings = reserve_group(user_id, seats_by_event)
+    except ReservationError as e:
+        return jsonify({'error': e.message, 'event_id': e.event_id}), e.status_code
     
-    # Create booking
-    booking = Booking(user_id=user_id, event_id=event_id)
-    db.session.add(booking)
+    # One query for the events, one bulk INSERT for the outbox rows; the
+    # dispatcher delivers them together in a single /notify/batch request
+    events = {e.id: e for e in Event.query.filter(Event.id.in_(list(seats_by_event)))}
+    for booking in bookings:
+        notify_crm(booking, user, events[booking.event_id])
+    booking_ids = [b.id for b in bookings]
     db.session.commit()
+    catalogue_cache.bump()
     
-    # Notify CRM
-    user = User.query.get(user_id)
-    crm_notified = notify_crm(booking, user, event)
+    # Reload the committed bookings, events and facilitators in one query
+    bookings = (
+        Booking.query
+        .join(Booking.event)
+        .join(Event.facilitator)
+        .options(contains_eager(Booking.event).contains_eager(Event.facilitator))
+        .filter(Booking.id.in_(booking_ids))
+        .order_by(Booking.id)
+        .all()
+    )
+    for booking in bookings:
+        publish(seat_delta(booking.event), LIVE_UPDATES)
     
     return jsonify({
-        'message': 'Booking created successfully',
-        'booking': booking.to_dict(),
-        'crm_notified': crm_notified
+        'message': 'Bookings created successfully',
+        'bookings': [b.to_dict(user=user) for b in bookings],
+        'seats': sum(b.seats for b in bookings),
+        'crm_notification': 'queued'
     }), 201
 
 
 @bookings_bp.route('', methods=['GET'])
 @jwt_required()
 def get_user_bookings():
-    """Get all bookings for the current user"""
+    """Get all bookings for the current user, optionally within a start_time window"""
     user_id = int(get_jwt_identity())
     
-    bookings = Booking.query.filter_by(user_id=user_id).all()
+    try:
+        window_start = parse_datetime_arg('from')
+        window_end = parse_datetime_arg('to')
+    except ValueError:
+        return jsonify({'error': 'from and to must be ISO-8601 datetimes'}), 400
     
+    # One query: bookings with their event and facilitator, classified in SQL
     now = datetime.utcnow()
+    is_upcoming = (Event.start_time > now).label('is_upcoming')
+    query = (
+        db.session.query(Booking, is_upcoming)
+        .join(Booking.event)
+        .join(Event.facilitator)
+        .options(contains_eager(Booking.event).contains_eager(Event.facilitator))
+        .filter(Booking.user_id == user_id)
+        .order_by(Event.start_time, Booking.id)
+    )
+    if window_start:
+        query = query.filter(Event.start_time >= window_start)
+    if window_end:
+        query = query.filter(Event.start_time < window_end)
+    rows = query.all()
+    
     upcoming = []
     past = []
     
-    for booking in bookings:
-        if booking.event.start_time > now:
-            upcoming.append(booking.to_dict())
+    for booking, booking_is_upcoming in rows:
+        if booking_is_upcoming:
+            upcoming.append(booking.to_dict(include_user=False))
         else:
-            past.append(booking.to_dict())
+            past.append(booking.to_dict(include_user=False))
     
     return jsonify({
+        'user': current_identity(),
         'upcoming': upcoming,
         'past': past,
-        'total': len(bookings)
+        'total': len(rows)
+    }), 200
+
+
+@bookings_bp.route('/freebusy', methods=['GET'])
+@jwt_required()
+def get_free_busy():
+    """The current user's booked and free time between ?from= and ?to="""
+    user_id = int(get_jwt_identity())
+    
+    try:
+        start, end = schedule_window()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        **free_busy(user_events(user_id, start, end), start, end)
     }), 200
 
 
@@ -141,10 +236,89 @@ def cancel_booking(booking_id):
     if booking.status == 'cancelled':
         return jsonify({'error': 'Booking is already cancelled'}), 400
     
-    booking.status = 'cancelled'
+    user = current_identity()
+    if user is None:
+        return jsonify({'error': 'User not found'}), 404
+    
+    # Only the request that flips the status releases seats and notifies the CRM
+    try:
+        cancel_reservation(booking)
+    except ReservationError as e:
+        return jsonify({'error': e.message}), e.status_code
+    notify_crm(booking, user, booking.event)
+    
+    # Freed seats go to the head of the waitlist in the same transaction
+    promoted = promote_waitlist(booking.event_id, booking.seats)
+    promoted_users = identities(promotion.user_id for promotion in promoted)
+    for promotion in promoted:
+        notify_crm(promotion, promoted_users[promotion.user_id], booking.event)
     db.session.commit()
+    catalogue_cache.bump()
+    
+    booking_data = booking.to_dict(user=user)
+    publish(seat_delta(booking.event), LIVE_UPDATES)
     
     return jsonify({
         'message': 'Booking cancelled successfully',
-        'booking': booking.to_dict()
+        'booking': booking_data,
+        'waitlist_promotions': len(promoted),
+        'crm_notification': 'queued'
     }), 200
+
+
+@bookings_bp.route('/waitlist', methods=['POST'])
+@jwt_required()
+def join_event_waitlist():
+    """Join the waitlist of a fully booked event"""
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True)
+    
+    if not data or 'event_id' not in data:
+        return jsonify({'error': 'event_id is required'}), 400
+    
+    try:
+        entry = join_waitlist(user_id, data['event_id'])
+    except ReservationError as e:
+        return jsonify({'error': e.message}), e.status_code
+    
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Added to the waitlist; you will be booked automatically when a seat frees up',
+        'entry': entry.to_dict()
+    }), 201
+
+
+@bookings_bp.route('/waitlist', methods=['GET'])
+@jwt_required()
+def get_waitlist_entries():
+    """The current user's waitlist entries and how many people are ahead of each"""
+    user_id = int(get_jwt_identity())
+    
+    # Each entry with a count of the earlier positions in its event's line,
+    # all in one query; the counts are seeks on uq_waitlist_event_position
+    ahead_of = aliased(WaitlistEntry)
+    entries = db.session.query(WaitlistEntry, db.func.count(ahead_of.id)).outerjoin(
+        ahead_of, db.and_(ahead_of.event_id == WaitlistEntry.event_id,
+                          ahead_of.position < WaitlistEntry.position)
+    ).filter(WaitlistEntry.user_id == user_id).group_by(WaitlistEntry.id).order_by(WaitlistEntry.created_at)
+    waitlist = [{**entry.to_dict(), 'ahead': ahead} for entry, ahead in entries]
+    
+    return jsonify({'waitlist': waitlist, 'total': len(waitlist)}), 200
+
+
+@bookings_bp.route('/waitlist/<int:entry_id>', methods=['DELETE'])
+@jwt_required()
+def leave_waitlist(entry_id):
+    """Leave an event's waitlist"""
+    user_id = int(get_jwt_identity())
+    
+    entry = WaitlistEntry.query.filter_by(id=entry_id, user_id=user_id).first()
+    
+    if not entry:
+        return jsonify({'error': 'Waitlist entry not found'}), 404
+    
+    db.session.delete(entry)
+    db.session.commit()
+    
+    return jsonify({'message': 'Removed from the waitlist'}), 200
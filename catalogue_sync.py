@@ -0,0 +1,140 @@
+from datetime import datetime
+from functools import wraps
+from flask import Blueprint, request, jsonify
+from sqlalchemy import func, update
+from models import db, Event, SyncCounter
+from config import Config
+from sequences import next_values
+from events import catalogue_cache
+from api_keys import bearer_token
+from crm_outbox import crm_keys
+from schedule import facilitator_conflict
+
+sync_bp = Blueprint('sync', __name__)
+
+# Fields the CRM may change through the feed (the ones modify_event and cancel_event touch)
+CRM_EDITABLE_FIELDS = ('title', 'description', 'max_participants', 'price', 'is_active')
+
+
+def require_crm_token(f):
+    """Decorator allowing only the CRM, which presents a shared bearer token"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        auth_header = request.environ.get('HTTP_AUTHORIZATION')
+        if not (crm_keys.verify_header(auth_header) or crm_keys.verify(bearer_token(auth_header))):
+            return jsonify({'error': 'Invalid token'}), 403
+        return f(*args, **kwargs)
+
+    return decorated
+
+
+@sync_bp.route('/events', methods=['GET'])
+@require_crm_token
+def get_event_changes():
+    """Events changed after ?since= (a change_seq watermark), oldest first"""
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(int(request.args.get('limit', Config.SYNC_BATCH_SIZE)), Config.SYNC_BATCH_SIZE)
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    if limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
+
+    events = (
+        Event.query
+        .filter(Event.change_seq > since)
+        .order_by(Event.change_seq)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(events) > limit
+    events = events[:limit]
+
+    return jsonify({
+        'events': [e.to_sync_dict() for e in events],
+        'watermark': events[-1].change_seq if events else since,
+        'has_more': has_more
+    }), 200
+
+
+@sync_bp.route('/events', methods=['POST'])
+@require_crm_token
+def apply_event_changes():
+    """Apply CRM edits to events.
+
+    Each change names the change_seq it was based on. If the event has
+    changed since, the edit is rejected as a conflict and the current
+    version is returned so the CRM can adopt it.
+    """
+    data = request.get_json(silent=True) or {}
+    changes = data.get('changes')
+
+    if not isinstance(changes, list) or not changes:
+        return jsonify({'error': 'changes must be a non-empty list'}), 400
+
+    if len(changes) > Config.SYNC_BATCH_SIZE:
+        return jsonify({'error': f'At most {Config.SYNC_BATCH_SIZE} changes per request'}), 413
+
+    ids = [c.get('event_id') for c in changes if isinstance(c, dict)]
+    events = {e.id: e for e in Event.query.filter(Event.id.in_(ids))}
+
+    results = []
+    applied = []
+    for change in changes:
+        if not isinstance(change, dict) or not isinstance(change.get('fields'), dict):
+            results.append({'status': 'invalid', 'error': 'Expected event_id, base_seq and fields'})
+            continue
+
+        event = events.get(change.get('event_id'))
+        if event is None:
+            results.append({'event_id': change.get('event_id'), 'status': 'not_found'})
+            continue
+
+        if event.change_seq != change.get('base_seq'):
+            results.append({'event_id': event.id, 'status': 'conflict', 'event': event.to_sync_dict()})
+            continue
+
+        # Reactivating an event is refused while its facilitator is busy at that time
+        if change['fields'].get('is_active') and not event.is_active and facilitator_conflict(
+                event.facilitator_id, event.start_time, event.end_time, exclude_id=event.id) is not None:
+            results.append({'event_id': event.id, 'status': 'conflict', 'event': event.to_sync_dict()})
+            continue
+
+        for field in CRM_EDITABLE_FIELDS:
+            if field in change['fields']:
+                setattr(event, field, change['fields'][field])
+        results.append({'event_id': event.id, 'status': 'applied'})
+        applied.append((event, results[-1]))
+
+    if applied:
+        # Flushing stamps each edited event with its new change_seq
+        db.session.flush()
+        for event, result in applied:
+            result['change_seq'] = event.change_seq
+        db.session.commit()
+        catalogue_cache.bump()
+
+    return jsonify({'results': results, 'applied_at': datetime.utcnow().isoformat()}), 200
+
+
+def backfill_change_seq():
+    """Number events that predate change_seq into the 'events' sequence.
+
+    Each event gets its id offset past the counter, and the counter moves
+    past the highest one, so a feed read from since=0 returns every event
+    and later edits still sort after them.
+    """
+    top = db.session.query(func.max(Event.id)).scalar()
+    if top is None:
+        return 0
+    base = next_values(db.session, SyncCounter, 'events', top).start - 1
+    result = db.session.execute(
+        update(Event)
+        .where(Event.change_seq == 0)
+        .values(change_seq=Event.id + base)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    print(f'Change sequence backfilled for {result.rowcount} events')
+    return result.rowcount
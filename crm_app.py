@@ -1,40 +1,98 @@
-from flask import Flask, request, jsonify
+import logging
+from datetime import date, datetime
+import click
+from flask import Blueprint, Flask, request, jsonify, current_app
+from flask.cli import with_appcontext
 from flask_cors import CORS
 from functools import wraps
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from config import CRMConfig
-from crm_models import db, Notification, CRMEvent
+from crm_models import (db, Notification, CRMEvent, BookingRollup, mark_event_edited, dialect_insert,
+                        notification_serializer, crm_event_serializer)
+from crm_rollups import RollupDeltas, rebuild_rollups
+from pagination import PaginationError, keyset_page, requested_fields, parse_datetime_arg
+from exports import EXPORT_FORMATS, export_response, stream_rows
+from response_cache import ResponseCache, cached_response
+from live_updates import parse_address, publish, event_status_delta
+from api_keys import KeyRing, KeyRingAuth, bearer_token
+from stream_tickets import issue_ticket
+from storage import init_storage, upgrade_schema
+from instrumentation import instrument_app, metrics_response
+from serialization import init_serialization, loads
 
-# Create Flask app
-app = Flask(__name__)
+crm_bp = Blueprint('crm', __name__)
 
-# Enable CORS for frontend
-CORS(app)
+# Serialized facilitator event listings; bump() whenever a CRM event changes
+events_cache = ResponseCache(
+    'crm_events',
+    max_entries=CRMConfig.CATALOGUE_CACHE_SIZE,
+    max_age=CRMConfig.CATALOGUE_CACHE_MAX_AGE
+)
 
-# Load configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = CRMConfig.SQLALCHEMY_DATABASE_URI
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = CRMConfig.SQLALCHEMY_TRACK_MODIFICATIONS
+# Bearer tokens accepted by the facilitator and notification endpoints; the
+# current one also authenticates the catalogue sync's calls to the booking API
+crm_keys = KeyRing(
+    CRMConfig.BEARER_TOKENS_FILE,
+    CRMConfig.BEARER_TOKEN,
+    CRMConfig.BEARER_TOKENS_RELOAD_INTERVAL
+)
 
-# Initialize database
-db.init_app(app)
+# Event status changes are pushed to the live seat stream (live_seats.py)
+LIVE_UPDATES = parse_address(CRMConfig.LIVE_UPDATES_ADDRESS)
+
+
+def create_app(config_overrides=None):
+    """Build the CRM/Facilitator API.
+
+    Creating the app does no database work; schema creation and seeding
+    live in the init-db command.
+    """
+    app = Flask(__name__)
+    
+    app.logger.setLevel(logging.INFO)
+    
+    # Enable CORS for frontend
+    CORS(app)
+    
+    # Load configuration
+    app.config['SQLALCHEMY_DATABASE_URI'] = CRMConfig.SQLALCHEMY_DATABASE_URI
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = CRMConfig.SQLALCHEMY_TRACK_MODIFICATIONS
+    if config_overrides:
+        app.config.update(config_overrides)
+    
+    # Initialize database
+    init_storage(app, db, CRMConfig)
+    instrument_app(app, db, CRMConfig)
+    init_serialization(app, CRMConfig)
+    
+    app.register_blueprint(crm_bp)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(sync_catalogue_command)
+    app.cli.add_command(rebuild_rollups_command)
+    
+    return app
 
 
 def require_bearer_token(f):
-    """Decorator to require Bearer token authentication"""
+    """Decorator to require Bearer token authentication against crm_keys"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
+        auth_header = request.environ.get('HTTP_AUTHORIZATION')
+        
+        # The usual 'Bearer <token>' spelling is one digest lookup
+        if crm_keys.verify_header(auth_header):
+            return f(*args, **kwargs)
         
         if not auth_header:
             return jsonify({'error': 'Authorization header missing'}), 401
         
-        parts = auth_header.split()
+        token = bearer_token(auth_header)
         
-        if len(parts) != 2 or parts[0].lower() != 'bearer':
+        if token is None:
             return jsonify({'error': 'Invalid authorization header format'}), 401
         
-        token = parts[1]
-        
-        if token != CRMConfig.BEARER_TOKEN:
+        if not crm_keys.verify(token):
             return jsonify({'error': 'Invalid token'}), 403
         
         return f(*args, **kwargs)
@@ -42,22 +100,154 @@ def require_bearer_token(f):
     return decorated
 
 
-@app.route('/')
+@crm_bp.route('/')
 def index():
     return {
         'name': 'CRM/Facilitator API',
         'version': '1.0.0',
         'endpoints': {
             'notify': 'POST /notify',
+            'notify_batch': 'POST /notify/batch',
             'facilitator_bookings': 'GET /api/facilitator/<id>/bookings',
             'facilitator_events': 'GET /api/facilitator/<id>/events',
+            'facilitator_totals': 'GET /api/facilitator/<id>/analytics/totals',
             'modify_event': 'PUT /api/facilitator/<id>/events/<event_id>',
-            'cancel_event': 'DELETE /api/facilitator/<id>/events/<event_id>'
+            'cancel_event': 'DELETE /api/facilitator/<id>/events/<event_id>',
+            'metrics': 'GET /metrics'
         }
     }
 
 
-@app.route('/notify', methods=['POST'])
+@crm_bp.route('/metrics')
+def get_metrics():
+    """Request latency, SQL cost and counters such as response cache hits and misses"""
+    return metrics_response()
+
+
+REQUIRED_NOTIFICATION_FIELDS = ['booking_id', 'user', 'event', 'facilitator_id']
+
+
+def missing_notification_fields(data):
+    """Required fields absent from a notification payload"""
+    return [f for f in REQUIRED_NOTIFICATION_FIELDS if f not in data]
+
+
+def notification_id_error(data):
+    """Why a payload's booking_id or facilitator_id is unusable, or None if both are integers"""
+    bad = [f for f in ('booking_id', 'facilitator_id')
+           if not isinstance(data[f], int) or isinstance(data[f], bool)]
+    if bad:
+        return f"{' and '.join(bad)} must be {'integers' if len(bad) > 1 else 'an integer'}"
+    return None
+
+
+def notification_field_error(data):
+    """Why a payload's user, event or booking details are unusable, or None if they are"""
+    bad = [f for f in ('user', 'event') if not isinstance(data[f], dict)]
+    if bad:
+        return f"{' and '.join(bad)} must be {'objects' if len(bad) > 1 else 'an object'}"
+    price = data['event'].get('price')
+    if price is not None and (not isinstance(price, (int, float)) or isinstance(price, bool)):
+        return 'event.price must be a number'
+    seats = data.get('seats')
+    if seats is not None and (not isinstance(seats, int) or isinstance(seats, bool) or seats < 1):
+        return 'seats must be a positive integer'
+    return None
+
+
+def notification_values(data):
+    """Map a notification payload onto Notification columns"""
+    user_data = data['user']
+    event_data = data['event']
+    
+    return {
+        'booking_id': data['booking_id'],
+        'user_id': user_data.get('id'),
+        'user_username': user_data.get('username'),
+        'user_email': user_data.get('email'),
+        'event_id': event_data.get('id'),
+        'event_title': event_data.get('title'),
+        'event_type': event_data.get('event_type'),
+        'event_start_time': event_data.get('start_time'),
+        'event_end_time': event_data.get('end_time'),
+        'facilitator_id': data['facilitator_id'],
+        'booked_at': data.get('booked_at'),
+        'price': event_data.get('price') or 0.0,
+        'seats': data.get('seats') or 1,
+        'status': 'cancelled' if data.get('status') == 'cancelled' else 'confirmed',
+        'cancelled_at': datetime.utcnow() if data.get('status') == 'cancelled' else None
+    }
+
+
+def insert_ignoring_duplicates(rows):
+    """Bulk INSERT that skips rows whose booking_id is already stored; returns the rows inserted"""
+    stmt = (
+        dialect_insert(Notification)
+        .on_conflict_do_nothing(index_elements=['booking_id'])
+        .returning(Notification.booking_id)
+    )
+    inserted = set(db.session.execute(stmt, rows).scalars())
+    return [row for row in rows if row['booking_id'] in inserted]
+
+
+def store_notifications(rows, deltas):
+    """Insert new notification rows and count them in the rollups"""
+    for values in insert_ignoring_duplicates(rows):
+        deltas.booked(values)
+
+
+def apply_cancellations(cancellations, deltas):
+    """Cancel stored bookings, storing unseen ones as already cancelled.
+    
+    `cancellations` maps booking_id to notification values. Returns
+    {booking_id: 'cancelled' or 'duplicate'}.
+    """
+    stored = {
+        n.booking_id: n for n in
+        Notification.query.filter(Notification.booking_id.in_(list(cancellations)))
+    }
+    statuses = {}
+    unseen = []
+    for booking_id, values in cancellations.items():
+        notification = stored.get(booking_id)
+        if notification is None:
+            unseen.append(values)
+            statuses[booking_id] = 'cancelled'
+        elif notification.status == 'cancelled':
+            statuses[booking_id] = 'duplicate'
+        else:
+            notification.status = 'cancelled'
+            notification.cancelled_at = values['cancelled_at']
+            deltas.cancelled(notification)
+            statuses[booking_id] = 'cancelled'
+    if unseen:
+        store_notifications(unseen, deltas)
+    return statuses
+
+
+def parse_batch_body():
+    """Read a batch as a JSON array, {"notifications": [...]} or NDJSON.
+    
+    Returns a list of items; an item that could not be decoded is None.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        items = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(loads(line))
+            except ValueError:
+                items.append(None)
+        return items
+    
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('notifications')
+    return data if isinstance(data, list) else None
+
+
+@crm_bp.route('/notify', methods=['POST'])
 @require_bearer_token
 def receive_notification():
     """Receive booking notifications from the main booking system"""
@@ -67,8 +257,7 @@ def receive_notification():
         return jsonify({'error': 'No data provided'}), 400
     
     # Validate required fields
-    required_fields = ['booking_id', 'user', 'event', 'facilitator_id']
-    missing_fields = [f for f in required_fields if f not in data]
+    missing_fields = missing_notification_fields(data)
     
     if missing_fields:
         return jsonify({
@@ -76,62 +265,349 @@ def receive_notification():
             'missing': missing_fields
         }), 400
     
-    # Create notification record
-    user_data = data.get('user', {})
-    event_data = data.get('event', {})
-    
-    notification = Notification(
-        booking_id=data['booking_id'],
-        user_id=user_data.get('id'),
-        user_username=user_data.get('username'),
-        user_email=user_data.get('email'),
-        event_id=event_data.get('id'),
-        event_title=event_data.get('title'),
-        event_type=event_data.get('event_type'),
-        event_start_time=event_data.get('start_time'),
-        event_end_time=event_data.get('end_time'),
-        facilitator_id=data['facilitator_id'],
-        booked_at=data.get('booked_at')
-    )
+    field_error = notification_id_error(data) or notification_field_error(data)
+    if field_error:
+        return jsonify({'error': field_error}), 400
     
-    db.session.add(notification)
-    db.session.commit()
+    values = notification_values(data)
+    deltas = RollupDeltas()
+    
+    if values['status'] == 'cancelled':
+        status = apply_cancellations({values['booking_id']: values}, deltas)[values['booking_id']]
+        deltas.apply()
+        db.session.commit()
+        current_app.logger.info('Received booking cancellation: Booking #%s', values['booking_id'])
+        return jsonify({
+            'message': 'Cancellation received successfully',
+            'duplicate': status == 'duplicate'
+        }), 200
+    
+    # Redelivered notifications are acknowledged without a second row
+    notification = Notification.query.filter_by(booking_id=data['booking_id']).first()
+    duplicate = notification is not None
     
-    print(f'[CRM] Received booking notification: Booking #{notification.booking_id} for {notification.event_title}')
+    if not duplicate:
+        notification = Notification(**values)
+        db.session.add(notification)
+        try:
+            db.session.flush()
+            deltas.booked(values)
+            deltas.apply()
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            notification = Notification.query.filter_by(booking_id=data['booking_id']).first()
+            duplicate = True
+    
+    current_app.logger.info('Received booking notification: Booking #%s for %s',
+                    notification.booking_id, notification.event_title)
     
     return jsonify({
         'message': 'Notification received successfully',
-        'notification_id': notification.id
+        'notification_id': notification.id,
+        'duplicate': duplicate
+    }), 200
+
+
+@crm_bp.route('/notify/batch', methods=['POST'])
+@require_bearer_token
+def receive_notification_batch():
+    """Receive many booking notifications and store them in one transaction"""
+    items = parse_batch_body()
+    
+    if not items:
+        return jsonify({'error': 'Expected a non-empty JSON array or NDJSON body'}), 400
+    
+    if len(items) > CRMConfig.MAX_NOTIFICATION_BATCH:
+        return jsonify({
+            'error': f'Batch too large (max {CRMConfig.MAX_NOTIFICATION_BATCH} notifications)'
+        }), 413
+    
+    # Validate everything before touching the database
+    results = []
+    valid = {}
+    cancellations = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results.append({'index': index, 'status': 'invalid', 'error': 'Not a JSON object'})
+            continue
+        missing_fields = missing_notification_fields(item)
+        if missing_fields:
+            results.append({'index': index, 'status': 'invalid',
+                            'error': 'Missing required fields', 'missing': missing_fields})
+            continue
+        field_error = notification_id_error(item) or notification_field_error(item)
+        if field_error:
+            results.append({'index': index, 'status': 'invalid', 'error': field_error})
+            continue
+        booking_id = item['booking_id']
+        values = notification_values(item)
+        pending = cancellations if values['status'] == 'cancelled' else valid
+        if booking_id in pending:
+            results.append({'index': index, 'booking_id': booking_id, 'status': 'duplicate'})
+            continue
+        pending[booking_id] = values
+        results.append({'index': index, 'booking_id': booking_id,
+                        'status': 'created' if pending is valid else 'cancelled'})
+    
+    deltas = RollupDeltas()
+    if valid:
+        existing = {
+            row.booking_id for row in db.session.query(Notification.booking_id)
+            .filter(Notification.booking_id.in_(list(valid)))
+        }
+        for result in results:
+            if result['status'] == 'created' and result['booking_id'] in existing:
+                result['status'] = 'duplicate'
+        
+        rows = [values for booking_id, values in valid.items() if booking_id not in existing]
+        if rows:
+            store_notifications(rows, deltas)
+    
+    # After the inserts, so a booking made and cancelled in one batch is found
+    if cancellations:
+        statuses = apply_cancellations(cancellations, deltas)
+        for result in results:
+            if result['status'] == 'cancelled':
+                result['status'] = statuses[result['booking_id']]
+    
+    if valid or cancellations:
+        deltas.apply()
+        db.session.commit()
+    
+    counts = {status: sum(1 for r in results if r['status'] == status)
+              for status in ('created', 'cancelled', 'duplicate', 'invalid')}
+    current_app.logger.info('Received notification batch: %(created)d created, %(cancelled)d cancelled, '
+                    '%(duplicate)d duplicate, %(invalid)d invalid', counts)
+    
+    return jsonify({
+        'results': results,
+        **counts
     }), 200
 
 
-@app.route('/api/facilitator/<int:facilitator_id>/bookings', methods=['GET'])
+NOTIFICATION_FIELDS = (
+    'id', 'booking_id', 'user', 'event', 'facilitator_id', 'booked_at', 'received_at', 'price', 'seats',
+    'status'
+)
+
+CRM_EVENT_FIELDS = (
+    'id', 'original_event_id', 'title', 'description', 'event_type', 'start_time',
+    'end_time', 'max_participants', 'price', 'facilitator_id', 'is_active'
+)
+
+
+@crm_bp.route('/api/facilitator/<int:facilitator_id>/bookings', methods=['GET'])
 @require_bearer_token
 def get_facilitator_bookings(facilitator_id):
-    """Get all bookings (notifications) for a specific facilitator"""
-    notifications = Notification.query.filter_by(facilitator_id=facilitator_id).all()
+    """Get bookings (notifications) for a facilitator, one keyset page at a time"""
+    try:
+        fields = requested_fields(NOTIFICATION_FIELDS)
+        notifications, next_cursor = keyset_page(
+            Notification.query.filter_by(facilitator_id=facilitator_id),
+            Notification.received_at, Notification.id,
+            CRMConfig.DEFAULT_PAGE_SIZE, CRMConfig.MAX_PAGE_SIZE
+        )
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     
+    serialize = notification_serializer.only(fields)
     return jsonify({
         'facilitator_id': facilitator_id,
-        'bookings': [n.to_dict() for n in notifications],
-        'total': len(notifications)
+        'bookings': [serialize(n) for n in notifications],
+        'count': len(notifications),
+        'next_cursor': next_cursor
     }), 200
 
 
-@app.route('/api/facilitator/<int:facilitator_id>/events', methods=['GET'])
+# Flat export columns, in CSV order
+NOTIFICATION_EXPORT_COLUMNS = (
+    'id', 'booking_id', 'user_id', 'user_username', 'user_email', 'event_id', 'event_title',
+    'event_type', 'event_start_time', 'event_end_time', 'facilitator_id', 'booked_at', 'received_at',
+    'price', 'seats', 'status'
+)
+
+
+def notification_record(row):
+    """An export row shaped like Notification.to_dict()"""
+    return notification_serializer.from_mapping(row._mapping)
+
+
+@crm_bp.route('/api/facilitator/<int:facilitator_id>/bookings/export', methods=['GET'])
+@require_bearer_token
+def export_facilitator_bookings(facilitator_id):
+    """Stream a facilitator's bookings as NDJSON or CSV, in booking order.
+    
+    ?from= and ?to= bound booked_at (to is exclusive); ?event_id= narrows the
+    export to one event.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    try:
+        window_start = parse_datetime_arg('from')
+        window_end = parse_datetime_arg('to')
+    except ValueError:
+        return jsonify({'error': 'from and to must be ISO-8601 datetimes'}), 400
+    
+    event_id = request.args.get('event_id')
+    if event_id is not None and not event_id.isdigit():
+        return jsonify({'error': 'event_id must be an integer'}), 400
+    
+    columns = [getattr(Notification, name) for name in NOTIFICATION_EXPORT_COLUMNS]
+    statement = (
+        select(*columns)
+        .where(Notification.facilitator_id == facilitator_id)
+        .order_by(Notification.booked_at, Notification.id)
+    )
+    # booked_at holds ISO-8601 text, which sorts and compares chronologically
+    if window_start:
+        statement = statement.where(Notification.booked_at >= window_start.isoformat())
+    if window_end:
+        statement = statement.where(Notification.booked_at < window_end.isoformat())
+    if event_id is not None:
+        statement = statement.where(Notification.event_id == int(event_id))
+    
+    return export_response(
+        export_format,
+        stream_rows(db.session, statement),
+        NOTIFICATION_EXPORT_COLUMNS,
+        notification_record,
+        f'facilitator-{facilitator_id}-bookings'
+    )
+
+
+def parse_day_window():
+    """?from= and ?to= as dates (to is exclusive); raises ValueError if malformed"""
+    window_start = parse_datetime_arg('from')
+    window_end = parse_datetime_arg('to')
+    return (window_start.date() if window_start else None,
+            window_end.date() if window_end else None)
+
+
+def within_days(query, window_start, window_end):
+    if window_start:
+        query = query.filter(BookingRollup.day >= window_start)
+    if window_end:
+        query = query.filter(BookingRollup.day < window_end)
+    return query
+
+
+@crm_bp.route('/api/facilitator/<int:facilitator_id>/analytics/daily', methods=['GET'])
+@require_bearer_token
+def get_facilitator_daily_analytics(facilitator_id):
+    """Bookings, cancellations and revenue per event per day, read from the rollups
+    
+    ?from= and ?to= bound the booking day (to is exclusive); ?event_id= narrows
+    the result to one event.
+    """
+    try:
+        window_start, window_end = parse_day_window()
+    except ValueError:
+        return jsonify({'error': 'from and to must be ISO-8601 dates'}), 400
+    
+    event_id = request.args.get('event_id')
+    if event_id is not None and not event_id.isdigit():
+        return jsonify({'error': 'event_id must be an integer'}), 400
+    
+    query = within_days(BookingRollup.query.filter_by(facilitator_id=facilitator_id), window_start, window_end)
+    if event_id is not None:
+        query = query.filter(BookingRollup.event_id == int(event_id))
+    buckets = [rollup.to_dict() for rollup in query.order_by(BookingRollup.day, BookingRollup.event_id)]
+    
+    return jsonify({
+        'facilitator_id': facilitator_id,
+        'buckets': buckets,
+        'totals': {
+            'bookings': sum(b['bookings'] for b in buckets),
+            'cancellations': sum(b['cancellations'] for b in buckets),
+            'revenue': sum(b['revenue'] for b in buckets)
+        }
+    }), 200
+
+
+@crm_bp.route('/api/facilitator/<int:facilitator_id>/analytics/totals', methods=['GET'])
 @require_bearer_token
+def get_facilitator_analytics_totals(facilitator_id):
+    """One facilitator's bookings, cancellations and revenue between ?from= and ?to=, summed in SQL"""
+    try:
+        window_start, window_end = parse_day_window()
+    except ValueError:
+        return jsonify({'error': 'from and to must be ISO-8601 dates'}), 400
+    
+    bookings, cancellations, revenue = within_days(
+        db.session.query(
+            db.func.coalesce(db.func.sum(BookingRollup.bookings), 0),
+            db.func.coalesce(db.func.sum(BookingRollup.cancellations), 0),
+            db.func.coalesce(db.func.sum(BookingRollup.revenue), 0.0)
+        ).filter(BookingRollup.facilitator_id == facilitator_id),
+        window_start, window_end
+    ).one()
+    
+    return jsonify({
+        'facilitator_id': facilitator_id,
+        'bookings': bookings,
+        'cancellations': cancellations,
+        'revenue': revenue
+    }), 200
+
+
+@crm_bp.route('/api/analytics/facilitators', methods=['GET'])
+@require_bearer_token
+def get_facilitator_totals():
+    """Bookings, cancellations and revenue per facilitator between ?from= and ?to="""
+    try:
+        window_start, window_end = parse_day_window()
+    except ValueError:
+        return jsonify({'error': 'from and to must be ISO-8601 dates'}), 400
+    
+    # Both ends bounded, so SQLite ranges over ix_booking_rollups_day_facilitator;
+    # given one open end it walks the primary key for its facilitator order
+    query = within_days(
+        db.session.query(
+            BookingRollup.facilitator_id,
+            db.func.sum(BookingRollup.bookings),
+            db.func.sum(BookingRollup.cancellations),
+            db.func.sum(BookingRollup.revenue)
+        ),
+        window_start or date.min, window_end or date.max
+    ).group_by(BookingRollup.facilitator_id).order_by(BookingRollup.facilitator_id)
+    
+    return jsonify({
+        'facilitators': [
+            {'facilitator_id': facilitator_id, 'bookings': bookings,
+             'cancellations': cancellations, 'revenue': revenue}
+            for facilitator_id, bookings, cancellations, revenue in query
+        ]
+    }), 200
+
+
+@crm_bp.route('/api/facilitator/<int:facilitator_id>/events', methods=['GET'])
+@require_bearer_token
+@cached_response(events_cache)
 def get_facilitator_events(facilitator_id):
-    """Get all events for a specific facilitator"""
-    events = CRMEvent.query.filter_by(facilitator_id=facilitator_id).all()
+    """Get events for a facilitator, one keyset page at a time"""
+    try:
+        fields = requested_fields(CRM_EVENT_FIELDS)
+        events, next_cursor = keyset_page(
+            CRMEvent.query.filter_by(facilitator_id=facilitator_id),
+            CRMEvent.start_time, CRMEvent.id,
+            CRMConfig.DEFAULT_PAGE_SIZE, CRMConfig.MAX_PAGE_SIZE
+        )
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     
+    serialize = crm_event_serializer.only(fields)
     return jsonify({
         'facilitator_id': facilitator_id,
-        'events': [e.to_dict() for e in events],
-        'total': len(events)
+        'events': [serialize(e) for e in events],
+        'count': len(events),
+        'next_cursor': next_cursor
     }), 200
 
 
-@app.route('/api/facilitator/<int:facilitator_id>/events/<int:event_id>', methods=['PUT'])
+@crm_bp.route('/api/facilitator/<int:facilitator_id>/events/<int:event_id>', methods=['PUT'])
 @require_bearer_token
 def modify_event(facilitator_id, event_id):
     """Modify an event's details"""
@@ -152,15 +628,20 @@ def modify_event(facilitator_id, event_id):
         if field in data:
             setattr(event, field, data[field])
     
+    mark_event_edited(event)
     db.session.commit()
+    events_cache.bump()
+    
+    event_data = event.to_dict()
+    publish(event_status_delta(event), LIVE_UPDATES)
     
     return jsonify({
         'message': 'Event updated successfully',
-        'event': event.to_dict()
+        'event': event_data
     }), 200
 
 
-@app.route('/api/facilitator/<int:facilitator_id>/events/<int:event_id>', methods=['DELETE'])
+@crm_bp.route('/api/facilitator/<int:facilitator_id>/events/<int:event_id>', methods=['DELETE'])
 @require_bearer_token
 def cancel_event(facilitator_id, event_id):
     """Cancel an event"""
@@ -170,15 +651,30 @@ def cancel_event(facilitator_id, event_id):
         return jsonify({'error': 'Event not found or not authorized'}), 404
     
     event.is_active = False
+    mark_event_edited(event)
     db.session.commit()
+    events_cache.bump()
+    
+    event_data = event.to_dict()
+    publish(event_status_delta(event), LIVE_UPDATES)
     
     return jsonify({
         'message': 'Event cancelled successfully',
-        'event': event.to_dict()
+        'event': event_data
     }), 200
 
 
-@app.route('/api/facilitator/login', methods=['POST'])
+@crm_bp.route('/api/stream-ticket', methods=['POST'])
+@require_bearer_token
+def get_stream_ticket():
+    """A single-use ticket for the live seat stream, so the bearer token stays out of its URL"""
+    return jsonify({
+        'ticket': issue_ticket(CRMConfig.LIVE_STREAM_SECRET, CRMConfig.LIVE_STREAM_TICKET_TTL),
+        'expires_in': CRMConfig.LIVE_STREAM_TICKET_TTL
+    }), 200
+
+
+@crm_bp.route('/api/facilitator/login', methods=['POST'])
 def facilitator_login():
     """Facilitator login endpoint"""
     from crm_models import CRMFacilitator
@@ -199,6 +695,11 @@ def facilitator_login():
     if not facilitator or not facilitator.check_password(password):
         return jsonify({'error': 'Invalid credentials'}), 401
     
+    # Upgrade hashes made with outdated parameters while we have the password
+    if facilitator.password_needs_rehash():
+        facilitator.set_password(password)
+        db.session.commit()
+    
     return jsonify({
         'message': 'Login successful',
         'facilitator': facilitator.to_dict()
@@ -249,13 +750,57 @@ def seed_facilitators():
     print(f'[CRM] Facilitators seeded: {CRMFacilitator.query.count()} total')
 
 
-# Create tables and seed data on startup
-with app.app_context():
-    db.create_all()
+def init_db():
+    """Create or upgrade the schema and seed demo facilitators.
+
+    Rollups are rebuilt when their table is added to a database that
+    already holds notifications.
+    """
+    added = upgrade_schema(db)
+    if 'booking_rollups' in added and 'notifications' not in added:
+        rebuild_rollups()
     seed_facilitators()
 
 
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create or upgrade the schema and seed demo facilitators (run on every deployment)"""
+    init_db()
+
+
+@click.command('sync-catalogue')
+@click.option('--interval', type=float, default=0,
+              help='Keep syncing every INTERVAL seconds instead of running once')
+@with_appcontext
+def sync_catalogue_command(interval):
+    """Exchange event changes with the booking API since the last watermarks"""
+    import time
+    from crm_sync import CatalogueSync
+    
+    sync = CatalogueSync(KeyRingAuth(crm_keys))
+    while True:
+        pushed, pulled = sync.run_once()
+        print(f'[CRM] Catalogue sync: pushed {pushed}, pulled {pulled} events')
+        if not interval:
+            break
+        time.sleep(interval)
+
+
+@click.command('rebuild-rollups')
+@with_appcontext
+def rebuild_rollups_command():
+    """Recompute the booking analytics rollups from stored notifications"""
+    buckets = rebuild_rollups()
+    print(f'[CRM] Booking rollups rebuilt: {buckets} buckets')
+
+
 if __name__ == '__main__':
+    app = create_app()
+    
+    # Development convenience: prepare the database before serving
+    with app.app_context():
+        init_db()
+    
     print('Starting CRM/Facilitator API on port 5001...')
     app.run(debug=True, port=5001)
-
@@ -1,8 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from datetime import date, datetime
+from config import CRMConfig
+from passwords import PasswordHasher
+from sequences import next_values
+from serialization import Serializer, isoformat
 
 db = SQLAlchemy()
+password_hasher = PasswordHasher(CRMConfig.PASSWORD_HASH_METHOD, CRMConfig.PASSWORD_HASH_WORKERS)
 
 
 class CRMFacilitator(db.Model):
@@ -17,19 +21,16 @@ class CRMFacilitator(db.Model):
     specialization = db.Column(db.String(200))
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'username': self.username,
-            'name': self.name,
-            'email': self.email,
-            'specialization': self.specialization
-        }
+        return crm_facilitator_serializer(self)
 
 
 class Notification(db.Model):
@@ -37,7 +38,7 @@ class Notification(db.Model):
     __tablename__ = 'notifications'
     
     id = db.Column(db.Integer, primary_key=True)
-    booking_id = db.Column(db.Integer, nullable=False)
+    booking_id = db.Column(db.Integer, unique=True, nullable=False)
     user_id = db.Column(db.Integer)
     user_username = db.Column(db.String(80))
     user_email = db.Column(db.String(120))
@@ -49,27 +50,20 @@ class Notification(db.Model):
     facilitator_id = db.Column(db.Integer, nullable=False)
     booked_at = db.Column(db.String(50))
     received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    price = db.Column(db.Float, nullable=False, default=0.0)  # Event.price when booked
+    seats = db.Column(db.Integer, nullable=False, default=1)
+    status = db.Column(db.String(20), nullable=False, default='confirmed')  # 'confirmed' or 'cancelled'
+    cancelled_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        # Keyset pagination of a facilitator's bookings by (received_at, id)
+        db.Index('ix_notifications_facilitator_received', 'facilitator_id', 'received_at', 'id'),
+        # Date-range exports of a facilitator's bookings, in booking order
+        db.Index('ix_notifications_facilitator_booked', 'facilitator_id', 'booked_at', 'id'),
+    )
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'booking_id': self.booking_id,
-            'user': {
-                'id': self.user_id,
-                'username': self.user_username,
-                'email': self.user_email
-            },
-            'event': {
-                'id': self.event_id,
-                'title': self.event_title,
-                'event_type': self.event_type,
-                'start_time': self.event_start_time,
-                'end_time': self.event_end_time
-            },
-            'facilitator_id': self.facilitator_id,
-            'booked_at': self.booked_at,
-            'received_at': self.received_at.isoformat()
-        }
+        return notification_serializer(self)
 
 
 class CRMEvent(db.Model):
@@ -88,18 +82,87 @@ class CRMEvent(db.Model):
     facilitator_id = db.Column(db.Integer, nullable=False)
     is_active = db.Column(db.Boolean, default=True)
     
+    # Catalogue sync with the booking API, see crm_sync.py
+    upstream_seq = db.Column(db.Integer, nullable=False, default=0)  # Event.change_seq last applied here
+    change_seq = db.Column(db.Integer, nullable=False, default=0, index=True)  # local edits, 'crm_events' counter
+    sync_conflict = db.Column(db.Boolean, nullable=False, default=False)
+    
+    __table_args__ = (
+        # Keyset pagination of a facilitator's events by (start_time, id)
+        db.Index('ix_crm_events_facilitator_start', 'facilitator_id', 'start_time', 'id'),
+    )
+    
     def to_dict(self):
-        return {
-            'id': self.id,
-            'original_event_id': self.original_event_id,
-            'title': self.title,
-            'description': self.description,
-            'event_type': self.event_type,
-            'start_time': self.start_time.isoformat() if self.start_time else None,
-            'end_time': self.end_time.isoformat() if self.end_time else None,
-            'max_participants': self.max_participants,
-            'price': self.price,
-            'facilitator_id': self.facilitator_id,
-            'is_active': self.is_active
-        }
+        return crm_event_serializer(self)
+
+
+class BookingRollup(db.Model):
+    """Bookings per facilitator, day and event, maintained as notifications arrive.
+
+    `day` is the booking's booked_at date. `bookings` counts every booking,
+    `cancellations` those since cancelled, and `revenue` sums the price of
+    the ones still confirmed (price times seats). See crm_rollups.py.
+    """
+    __tablename__ = 'booking_rollups'
+    
+    facilitator_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    event_id = db.Column(db.Integer, primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    cancellations = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    
+    __table_args__ = (
+        # Totals over a day window for every facilitator, read from the
+        # index alone; the primary key leads with facilitator_id so it
+        # cannot serve a range on day
+        db.Index('ix_booking_rollups_day_facilitator', 'day', 'facilitator_id',
+                 'bookings', 'cancellations', 'revenue'),
+    )
+    
+    def to_dict(self):
+        return booking_rollup_serializer(self)
+
+
+class SyncCounter(db.Model):
+    """Named counters and sync watermarks"""
+    __tablename__ = 'sync_counters'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+# JSON shapes of the models above, see serialization.py
+crm_facilitator_serializer = Serializer('id', 'username', 'name', 'email', 'specialization')
+notification_serializer = Serializer(
+    'id', 'booking_id',
+    ('user', {'id': 'user_id', 'username': 'user_username', 'email': 'user_email'}),
+    ('event', {'id': 'event_id', 'title': 'event_title', 'event_type': 'event_type',
+               'start_time': 'event_start_time', 'end_time': 'event_end_time'}),
+    'facilitator_id', 'booked_at', ('received_at', isoformat), 'price', 'seats', 'status'
+)
+crm_event_serializer = Serializer(
+    'id', 'original_event_id', 'title', 'description', 'event_type',
+    ('start_time', isoformat), ('end_time', isoformat), 'max_participants', 'price',
+    'facilitator_id', 'is_active', 'sync_conflict'
+)
+booking_rollup_serializer = Serializer(
+    ('day', date.isoformat), 'event_id', 'bookings', 'cancellations', 'revenue'
+)
+
+
+def mark_event_edited(event):
+    """Queue a facilitator's edit of a CRMEvent for the next push to the booking API"""
+    event.change_seq = next_values(db.session, SyncCounter, 'crm_events')[0]
+
 
+def dialect_insert(model):
+    """INSERT supporting on_conflict_* clauses on the configured database"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise RuntimeError(f'Unsupported database for bulk ingestion: {dialect}')
+    return insert(model)
@@ -0,0 +1,184 @@
+import json
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import func, update
+
+import metrics
+from api_keys import KeyRing, KeyRingAuth
+from config import Config
+from models import db, OutboxMessage
+
+
+# Keys shared with the CRM: the current one signs outbox deliveries, and the
+# CRM may present any of them to /api/sync
+crm_keys = KeyRing(Config.CRM_BEARER_TOKENS_FILE, Config.CRM_BEARER_TOKEN)
+
+
+def enqueue(booking_id, payload):
+    """Add a CRM notification to the outbox; the caller commits it with the booking"""
+    message = OutboxMessage(booking_id=booking_id, payload=json.dumps(payload))
+    db.session.add(message)
+    return message
+
+
+def _pending():
+    return db.and_(
+        OutboxMessage.delivered_at.is_(None),
+        OutboxMessage.next_attempt_at <= datetime.utcnow()
+    )
+
+
+def outbox_depth():
+    """Number of notifications not yet delivered"""
+    return db.session.query(func.count(OutboxMessage.id)).filter(
+        OutboxMessage.delivered_at.is_(None)
+    ).scalar()
+
+
+def outbox_lag_seconds():
+    """Age of the oldest undelivered notification"""
+    oldest = db.session.query(func.min(OutboxMessage.created_at)).filter(
+        OutboxMessage.delivered_at.is_(None)
+    ).scalar()
+    if oldest is None:
+        return 0.0
+    return (datetime.utcnow() - oldest).total_seconds()
+
+
+def backoff_seconds(attempts):
+    """Exponential backoff with jitter, capped at CRM_OUTBOX_MAX_BACKOFF"""
+    delay = min(2 ** attempts, Config.CRM_OUTBOX_MAX_BACKOFF)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class OutboxDispatcher:
+    """Drains the CRM outbox through POST /notify/batch over one keep-alive session.
+
+    Each batch is claimed with a conditional UPDATE before it is sent, so
+    several dispatchers (threads or processes) never send the same message
+    concurrently. Failed messages are retried with exponential backoff.
+    """
+
+    def __init__(self, app, batch_size=None, poll_interval=None):
+        self.app = app
+        self.batch_size = batch_size or Config.CRM_OUTBOX_BATCH_SIZE
+        self.poll_interval = poll_interval or Config.CRM_OUTBOX_POLL_INTERVAL
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        # The key is read per request, so a rotation applies without a restart
+        self.session.auth = KeyRingAuth(crm_keys)
+        self.session.headers['Content-Type'] = 'application/json'
+
+    def claim_batch(self):
+        """Lease up to batch_size pending messages to this dispatcher"""
+        ids = [row.id for row in db.session.query(OutboxMessage.id)
+               .filter(_pending())
+               .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+               .limit(self.batch_size)]
+        if not ids:
+            return []
+
+        token = uuid.uuid4().hex
+        lease_until = datetime.utcnow() + timedelta(seconds=Config.CRM_OUTBOX_LEASE_SECONDS)
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids), _pending())
+            .values(claim_token=token, next_attempt_at=lease_until)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        return OutboxMessage.query.filter_by(claim_token=token).order_by(OutboxMessage.id).all()
+
+    def deliver(self, batch):
+        """POST a batch to the CRM; returns {message id: error or None}"""
+        body = '[' + ','.join(message.payload for message in batch) + ']'
+        try:
+            with metrics.timed('crm_request_duration_seconds', {'endpoint': '/notify/batch'}):
+                response = self.session.post(
+                    f'{Config.CRM_URL}/notify/batch',
+                    data=body,
+                    timeout=Config.CRM_TIMEOUT
+                )
+        except requests.RequestException as e:
+            return {message.id: str(e) for message in batch}
+        if response.status_code != 200:
+            error = f'CRM responded with HTTP {response.status_code}'
+            return {message.id: error for message in batch}
+
+        # Results come back in request order; created, cancelled and duplicate all mean stored
+        outcome = {}
+        for message, result in zip(batch, response.json().get('results', [])):
+            if result.get('status') in ('created', 'cancelled', 'duplicate'):
+                outcome[message.id] = None
+            else:
+                outcome[message.id] = f"CRM rejected notification: {result.get('error')}"
+        for message in batch[len(outcome):]:
+            outcome[message.id] = 'CRM returned no result'
+        return outcome
+
+    def run_once(self):
+        """Deliver one batch; returns the number of messages delivered"""
+        batch = self.claim_batch()
+        if not batch:
+            return 0
+
+        outcome = self.deliver(batch)
+        now = datetime.utcnow()
+        delivered = 0
+
+        for message in batch:
+            error = outcome[message.id]
+            message.claim_token = None
+            if error is None:
+                message.delivered_at = now
+                delivered += 1
+                metrics.set_value('crm_outbox_last_delivery_lag_seconds',
+                                  (now - message.created_at).total_seconds())
+            else:
+                message.attempts += 1
+                message.last_error = error[:500]
+                message.next_attempt_at = now + timedelta(seconds=backoff_seconds(message.attempts))
+
+        db.session.commit()
+        metrics.inc('crm_outbox_delivered_total', delivered)
+        metrics.inc('crm_outbox_failed_attempts_total', len(batch) - delivered)
+        return delivered
+
+    def run_forever(self):
+        """Poll the outbox until stop() is called"""
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    delivered = self.run_once()
+            except Exception as e:
+                self.app.logger.exception('CRM outbox dispatch failed: %s', e)
+                delivered = 0
+            # A full batch means there is probably more waiting
+            if delivered < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def start(self):
+        """Run the dispatcher on a daemon thread"""
+        self._thread = threading.Thread(target=self.run_forever, name='crm-outbox', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.session.close()
+
+
+metrics.register_gauge('crm_outbox_depth', outbox_depth)
+metrics.register_gauge('crm_outbox_lag_seconds', outbox_lag_seconds)
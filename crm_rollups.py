@@ -0,0 +1,91 @@
+from collections import defaultdict
+from datetime import date, datetime
+from sqlalchemy import String, case, cast, func, delete
+from crm_models import db, Notification, BookingRollup, dialect_insert
+
+
+def booking_day(booked_at, received_at=None):
+    """The rollup day of a booking: its booked_at date, else the day it was received"""
+    if booked_at:
+        try:
+            return date.fromisoformat(booked_at[:10])
+        except ValueError:
+            pass
+    return (received_at or datetime.utcnow()).date()
+
+
+class RollupDeltas:
+    """Changes to BookingRollup buckets, accumulated then applied in one upsert"""
+
+    def __init__(self):
+        self._buckets = defaultdict(lambda: [0, 0, 0.0])
+
+    def add(self, facilitator_id, day, event_id, bookings=0, cancellations=0, revenue=0.0):
+        bucket = self._buckets[(facilitator_id, day, event_id or 0)]
+        bucket[0] += bookings
+        bucket[1] += cancellations
+        bucket[2] += revenue
+
+    def booked(self, values):
+        """A notification row was stored"""
+        cancelled = values.get('status') == 'cancelled'
+        self.add(values['facilitator_id'], booking_day(values.get('booked_at'), values.get('received_at')),
+                 values.get('event_id'), bookings=1, cancellations=int(cancelled),
+                 revenue=0.0 if cancelled else (values.get('price') or 0.0) * (values.get('seats') or 1))
+
+    def cancelled(self, notification):
+        """A stored, confirmed notification was cancelled"""
+        self.add(notification.facilitator_id,
+                 booking_day(notification.booked_at, notification.received_at),
+                 notification.event_id, cancellations=1,
+                 revenue=-(notification.price or 0.0) * notification.seats)
+
+    def apply(self):
+        """Upsert the accumulated deltas in the caller's transaction"""
+        if not self._buckets:
+            return
+        stmt = dialect_insert(BookingRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['facilitator_id', 'day', 'event_id'],
+            set_={
+                'bookings': BookingRollup.bookings + stmt.excluded.bookings,
+                'cancellations': BookingRollup.cancellations + stmt.excluded.cancellations,
+                'revenue': BookingRollup.revenue + stmt.excluded.revenue
+            }
+        )
+        db.session.execute(stmt, [
+            {'facilitator_id': facilitator_id, 'day': day, 'event_id': event_id,
+             'bookings': bookings, 'cancellations': cancellations, 'revenue': revenue}
+            for (facilitator_id, day, event_id), (bookings, cancellations, revenue) in self._buckets.items()
+        ])
+        self._buckets.clear()
+
+
+def rebuild_rollups():
+    """Recompute every rollup bucket from the stored notifications; returns the bucket count"""
+    is_cancelled = Notification.status == 'cancelled'
+    day = func.coalesce(
+        func.substr(Notification.booked_at, 1, 10),
+        func.substr(cast(Notification.received_at, String), 1, 10)
+    )
+    rows = (
+        db.session.query(
+            Notification.facilitator_id,
+            day,
+            func.coalesce(Notification.event_id, 0),
+            func.count(Notification.id),
+            func.sum(case((is_cancelled, 1), else_=0)),
+            func.sum(case((is_cancelled, 0.0), else_=Notification.price * Notification.seats))
+        )
+        .group_by(Notification.facilitator_id, day, func.coalesce(Notification.event_id, 0))
+        .all()
+    )
+
+    db.session.execute(delete(BookingRollup))
+    deltas = RollupDeltas()
+    for facilitator_id, day_text, event_id, bookings, cancellations, revenue in rows:
+        deltas.add(facilitator_id, booking_day(day_text), event_id,
+                   bookings=bookings, cancellations=cancellations, revenue=revenue or 0.0)
+    deltas.apply()
+    db.session.commit()
+    return len(rows)
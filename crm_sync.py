@@ -0,0 +1,145 @@
+from datetime import datetime
+import requests
+from flask import current_app
+from config import CRMConfig
+from crm_models import db, CRMEvent, SyncCounter
+import metrics
+
+# Fields a facilitator can edit through modify_event and cancel_event
+PUSHED_FIELDS = ('title', 'description', 'max_participants', 'price', 'is_active')
+
+
+def get_watermark(name):
+    counter = db.session.get(SyncCounter, name)
+    return counter.value if counter else 0
+
+
+def set_watermark(name, value):
+    counter = db.session.get(SyncCounter, name)
+    if counter is None:
+        db.session.add(SyncCounter(name=name, value=value))
+    else:
+        counter.value = value
+
+
+def apply_upstream(event, data):
+    """Copy an upstream event version onto a CRMEvent"""
+    event.title = data['title']
+    event.description = data['description']
+    event.event_type = data['event_type']
+    event.start_time = datetime.fromisoformat(data['start_time'])
+    event.end_time = datetime.fromisoformat(data['end_time'])
+    event.max_participants = data['max_participants']
+    event.price = data['price']
+    event.facilitator_id = data['facilitator_id']
+    event.is_active = data['is_active']
+    event.upstream_seq = data['change_seq']
+
+
+class CatalogueSync:
+    """Incremental two-way sync between Event (booking API) and CRMEvent.
+
+    Pull ships only events whose change_seq is above the 'catalogue_pull'
+    watermark. Push ships only CRM edits whose local change_seq is above the
+    'catalogue_push' watermark, each tagged with the upstream change_seq it
+    was based on. When the event changed upstream in the meantime, the
+    booking API reports a conflict; the CRM then adopts the upstream version
+    and flags the row with sync_conflict.
+    """
+
+    def __init__(self, auth, base_url=None, batch_size=None, session=None):
+        self.base_url = base_url or CRMConfig.BOOKING_API_URL
+        self.batch_size = batch_size or CRMConfig.SYNC_BATCH_SIZE
+        self.session = session or requests.Session()
+        # requests auth, applied per request (api_keys.KeyRingAuth follows key rotation)
+        self.session.auth = auth
+
+    def push(self):
+        """Send local edits upstream in batches; returns counts by status"""
+        counts = {'applied': 0, 'conflict': 0, 'not_found': 0}
+        while True:
+            watermark = get_watermark('catalogue_push')
+            edited = (
+                CRMEvent.query
+                .filter(CRMEvent.change_seq > watermark)
+                .order_by(CRMEvent.change_seq)
+                .limit(self.batch_size)
+                .all()
+            )
+            if not edited:
+                return counts
+
+            changes = [{
+                'event_id': event.original_event_id,
+                'base_seq': event.upstream_seq,
+                'fields': {field: getattr(event, field) for field in PUSHED_FIELDS}
+            } for event in edited if event.original_event_id is not None]
+
+            with metrics.timed('booking_api_request_duration_seconds', {'method': 'POST', 'endpoint': '/api/sync/events'}):
+                response = self.session.post(f'{self.base_url}/api/sync/events',
+                                             json={'changes': changes}, timeout=CRMConfig.SYNC_TIMEOUT)
+            response.raise_for_status()
+
+            by_event = {e.original_event_id: e for e in edited}
+            for result in response.json()['results']:
+                event = by_event.get(result.get('event_id'))
+                status = result['status']
+                counts[status] = counts.get(status, 0) + 1
+                if event is None:
+                    continue
+                if status == 'applied':
+                    # The pull will see this change_seq again and skip it
+                    event.upstream_seq = result['change_seq']
+                    event.sync_conflict = False
+                elif status == 'conflict':
+                    apply_upstream(event, result['event'])
+                    event.sync_conflict = True
+                    current_app.logger.warning(
+                        'Catalogue sync conflict on event %s; kept the booking API version',
+                        event.original_event_id)
+
+            set_watermark('catalogue_push', edited[-1].change_seq)
+            db.session.commit()
+
+    def pull(self):
+        """Fetch upstream changes above the pull watermark; returns events applied"""
+        applied = 0
+        has_more = True
+        while has_more:
+            watermark = get_watermark('catalogue_pull')
+            with metrics.timed('booking_api_request_duration_seconds', {'method': 'GET', 'endpoint': '/api/sync/events'}):
+                response = self.session.get(f'{self.base_url}/api/sync/events',
+                                            params={'since': watermark, 'limit': self.batch_size},
+                                            timeout=CRMConfig.SYNC_TIMEOUT)
+            response.raise_for_status()
+            page = response.json()
+            has_more = page['has_more']
+
+            incoming = {e['id']: e for e in page['events']}
+            existing = {
+                e.original_event_id: e for e in
+                CRMEvent.query.filter(CRMEvent.original_event_id.in_(list(incoming)))
+            }
+            push_watermark = get_watermark('catalogue_push')
+
+            for event_id, data in incoming.items():
+                event = existing.get(event_id)
+                if event is None:
+                    event = CRMEvent(original_event_id=event_id)
+                    db.session.add(event)
+                elif event.upstream_seq >= data['change_seq']:
+                    continue  # our own pushed edit, or already applied
+                elif event.change_seq > push_watermark:
+                    continue  # unpushed local edit; the next push resolves it
+                apply_upstream(event, data)
+                applied += 1
+
+            set_watermark('catalogue_pull', page['watermark'])
+            db.session.commit()
+        return applied
+
+    def run_once(self):
+        """Push local edits, then pull upstream changes"""
+        pushed = self.push()
+        pulled = self.pull()
+        return pushed, pulled
@@ -1,23 +1,113 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required
-from models import Event
+from sqlalchemy.orm import joinedload
+from models import db, Event, Facilitator, event_serializer
+from config import Config
+from pagination import PaginationError, keyset_page, page_size, requested_fields
+from response_cache import ResponseCache, cached_response
+from schedule import facilitator_events, free_busy, schedule_window
+from search import EventSearch, SearchError, parse_search_args
+from stream_tickets import issue_ticket
 
 events_bp = Blueprint('events', __name__)
 
+# Serialized catalogue responses; bump() whenever an event or its seat count changes
+catalogue_cache = ResponseCache(
+    'catalogue',
+    max_entries=Config.CATALOGUE_CACHE_SIZE,
+    max_age=Config.CATALOGUE_CACHE_MAX_AGE
+)
+
+
+EVENT_FIELDS = (
+    'id', 'title', 'description', 'event_type', 'start_time', 'end_time',
+    'max_participants', 'current_participants', 'price', 'facilitator', 'is_active'
+)
+
 
 @events_bp.route('', methods=['GET'])
 @jwt_required()
+@cached_response(catalogue_cache)
 def get_all_events():
-    """Get all bookable events"""
-    events = Event.query.filter_by(is_active=True).all()
+    """Get bookable events, one keyset page at a time ordered by start time"""
+    try:
+        fields = requested_fields(EVENT_FIELDS)
+        query = Event.query.filter_by(is_active=True)
+        if fields is None or 'facilitator' in fields:
+            query = query.options(joinedload(Event.facilitator))
+        events, next_cursor = keyset_page(
+            query, Event.start_time, Event.id,
+            Config.DEFAULT_PAGE_SIZE, Config.MAX_PAGE_SIZE
+        )
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    serialize = event_serializer.only(fields)
+    return jsonify({
+        'events': [serialize(event) for event in events],
+        'count': len(events),
+        'next_cursor': next_cursor
+    }), 200
+
+
+@events_bp.route('/search', methods=['GET'])
+@jwt_required()
+@cached_response(catalogue_cache)
+def search_events():
+    """Full-text search over active events with event_type, price and start_time facets"""
+    try:
+        search = EventSearch(**parse_search_args())
+        fields = requested_fields(EVENT_FIELDS)
+        limit = page_size(Config.DEFAULT_PAGE_SIZE, Config.MAX_PAGE_SIZE)
+        offset = int(request.args.get('offset', 0))
+    except (PaginationError, SearchError) as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'offset must be an integer'}), 400
+    
+    if not 0 <= offset <= Config.MAX_SEARCH_OFFSET:
+        return jsonify({'error': f'offset must be between 0 and {Config.MAX_SEARCH_OFFSET}'}), 400
+    
+    facets = search.facets()
+    types = request.args.get('event_type')
+    total = sum(count for event_type, count in facets['event_type'].items()
+                if not types or event_type in types.split(','))
+    events = search.results(limit, offset)
+    serialize = event_serializer.only(fields)
+    
     return jsonify({
-        'events': [event.to_dict() for event in events],
-        'total': len(events)
+        'events': [serialize(event) for event in events],
+        'total': total,
+        'facets': facets,
+        'offset': offset,
+        'limit': limit
+    }), 200
+
+
+@events_bp.route('/facilitators/<int:facilitator_id>/freebusy', methods=['GET'])
+@jwt_required()
+@cached_response(catalogue_cache)
+def get_facilitator_free_busy(facilitator_id):
+    """A facilitator's scheduled and free time between ?from= and ?to="""
+    try:
+        start, end = schedule_window()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if db.session.get(Facilitator, facilitator_id) is None:
+        return jsonify({'error': 'Facilitator not found'}), 404
+    
+    return jsonify({
+        'facilitator_id': facilitator_id,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        **free_busy(facilitator_events(facilitator_id, start, end), start, end)
     }), 200
 
 
 @events_bp.route('/<int:event_id>', methods=['GET'])
 @jwt_required()
+@cached_response(catalogue_cache)
 def get_event(event_id):
     """Get a specific event by ID"""
     event = Event.query.get(event_id)
@@ -26,3 +116,13 @@ def get_event(event_id):
         return jsonify({'error': 'Event not found'}), 404
     
     return jsonify({'event': event.to_dict()}), 200
+
+
+@events_bp.route('/stream-ticket', methods=['POST'])
+@jwt_required()
+def get_stream_ticket():
+    """A single-use ticket for the live seat stream, so the JWT stays out of its URL"""
+    return jsonify({
+        'ticket': issue_ticket(Config.LIVE_STREAM_SECRET, Config.LIVE_STREAM_TICKET_TTL),
+        'expires_in': Config.LIVE_STREAM_TICKET_TTL
+    }), 200
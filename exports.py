@@ -0,0 +1,60 @@
+import csv
+import io
+from datetime import datetime
+from flask import Response, stream_with_context
+from serialization import dumps
+
+# Rows fetched from the cursor and written out per chunk
+EXPORT_CHUNK_ROWS = 1000
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+
+def stream_rows(session, statement, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield lists of result rows, fetched incrementally from the database cursor"""
+    result = session.execute(statement.execution_options(stream_results=True, yield_per=chunk_rows))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+def ndjson_chunks(partitions, to_record):
+    for rows in partitions:
+        yield b''.join(dumps(to_record(row)) + b'\n' for row in rows)
+
+
+def csv_chunks(partitions, header):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for rows in partitions:
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row]
+            for row in rows
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_response(export_format, partitions, header, to_record, filename):
+    """A streamed NDJSON or CSV download of `partitions`.
+
+    Only one chunk of rows is in memory at a time, so memory stays flat
+    however many rows the statement matches. CSV columns follow `header`;
+    NDJSON lines are `to_record(row)`.
+    """
+    if export_format == 'csv':
+        body = csv_chunks(partitions, header)
+    else:
+        body = ndjson_chunks(partitions, to_record)
+    response = Response(stream_with_context(body), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -1,4 +1,5 @@
 const API_URL = 'http://localhost:5000';
+const LIVE_URL = 'http://localhost:5002';
 
 // Store token in localStorage
 export const setToken = (token) => {
@@ -62,9 +63,10 @@ export const logout = () => {
   removeToken();
 };
 
-// Events API
-export const getEvents = async () => {
-  return apiRequest('/api/events');
+// Events API: one page of the catalogue; pass its next_cursor back for the next
+export const getEvents = async (cursor = null) => {
+  const query = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+  return apiRequest(`/api/events?limit=50${query}`);
 };
 
 export const getEvent = async (eventId) => {
@@ -88,3 +90,48 @@ export const cancelBooking = async (bookingId) => {
     method: 'DELETE',
   });
 };
+
+// Live seat stream (live_seats.py). Its URL carries a single-use ticket from
+// getTicket() rather than a token, so every (re)connect fetches a new one.
+// Returns a function that closes the stream.
+export const openLiveStream = (getTicket, onUpdate) => {
+  if (typeof EventSource === 'undefined') {
+    return () => {};
+  }
+  let source = null;
+  let retry = null;
+  let closed = false;
+
+  const connect = async () => {
+    let ticket;
+    try {
+      ({ ticket } = await getTicket());
+    } catch (error) {
+      retry = setTimeout(connect, 3000);
+      return;
+    }
+    if (closed) return;
+    source = new EventSource(`${LIVE_URL}/stream?ticket=${encodeURIComponent(ticket)}`);
+    source.onmessage = (message) => onUpdate(JSON.parse(message.data));
+    // The browser's own reconnect would present the spent ticket; start over instead
+    source.onerror = () => {
+      source.close();
+      if (!closed) retry = setTimeout(connect, 3000);
+    };
+  };
+  connect();
+
+  return () => {
+    closed = true;
+    clearTimeout(retry);
+    if (source) source.close();
+  };
+};
+
+// Live seat availability for the events page
+export const subscribeLiveSeats = (onUpdate) => {
+  if (!getToken()) {
+    return () => {};
+  }
+  return openLiveStream(() => apiRequest('/api/events/stream-ticket', { method: 'POST' }), onUpdate);
+};
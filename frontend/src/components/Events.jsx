@@ -1,19 +1,42 @@
 import { useState, useEffect } from 'react';
-import { getEvents, createBooking } from '../api';
+import { getEvents, createBooking, subscribeLiveSeats } from '../api';
 
 function Events() {
   const [events, setEvents] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [message, setMessage] = useState({ type: '', text: '' });
 
   useEffect(() => {
     fetchEvents();
+    return subscribeLiveSeats(applyUpdate);
   }, []);
 
-  const fetchEvents = async () => {
+  // Seat counts and cancellations pushed by the live stream
+  const applyUpdate = (update) => {
+    setEvents((current) =>
+      current
+        .filter((event) => !(update.type === 'event' && update.event_id === event.id && !update.is_active))
+        .map((event) => {
+          if (event.id !== update.event_id) return event;
+          if (update.type === 'seats') {
+            return {
+              ...event,
+              current_participants: update.current_participants,
+              max_participants: update.max_participants,
+            };
+          }
+          return { ...event, title: update.title, price: update.price, max_participants: update.max_participants };
+        })
+    );
+  };
+
+  // Without a cursor, loads the first page; with one, appends the next
+  const fetchEvents = async (cursor = null) => {
     try {
-      const data = await getEvents();
-      setEvents(data.events);
+      const data = await getEvents(cursor);
+      setEvents((current) => (cursor ? [...current, ...data.events] : data.events));
+      setNextCursor(data.next_cursor);
     } catch (error) {
       setMessage({ type: 'error', text: error.message });
     } finally {
@@ -24,9 +47,9 @@ function Events() {
   const handleBook = async (eventId) => {
     setMessage({ type: '', text: '' });
     try {
-      await createBooking(eventId);
+      const data = await createBooking(eventId);
       setMessage({ type: 'success', text: 'Booking created successfully!' });
-      fetchEvents(); // Refresh to update participant count
+      applyUpdate({ type: 'seats', ...data.booking.event, event_id: eventId });
     } catch (error) {
       setMessage({ type: 'error', text: error.message });
     }
@@ -96,6 +119,12 @@ function Events() {
           ))}
         </div>
       )}
+
+      {nextCursor && (
+        <button className="btn btn-secondary" onClick={() => fetchEvents(nextCursor)}>
+          Load more
+        </button>
+      )}
     </div>
   );
 }
@@ -1,15 +1,52 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
+import { openLiveStream } from '../api';
 
 const CRM_URL = 'http://localhost:5001';
 const CRM_TOKEN = 'crm-secret-token-12345';
+const PAGE_SIZE = 50;
+
+// GET a CRM endpoint with the bearer token
+const crmGet = async (path) => {
+  const response = await fetch(`${CRM_URL}${path}`, {
+    headers: { 'Authorization': `Bearer ${CRM_TOKEN}` },
+  });
+  const data = await response.json();
+  if (!response.ok) {
+    throw new Error(data.error || 'Request failed');
+  }
+  return data;
+};
+
+// One page of a paginated CRM listing; pass its next_cursor back for the next
+const fetchPage = (path, cursor) =>
+  crmGet(`${path}?limit=${PAGE_SIZE}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`);
+
+// A single-use ticket for the live seat stream, which keeps CRM_TOKEN out of its URL
+const fetchStreamTicket = async () => {
+  const response = await fetch(`${CRM_URL}/api/stream-ticket`, {
+    method: 'POST',
+    headers: { 'Authorization': `Bearer ${CRM_TOKEN}` },
+  });
+  const data = await response.json();
+  if (!response.ok) {
+    throw new Error(data.error || 'Request failed');
+  }
+  return data;
+};
 
 function FacilitatorDashboard({ onLogout }) {
   const [facilitator, setFacilitator] = useState(null);
   const [bookings, setBookings] = useState([]);
+  const [bookingsCursor, setBookingsCursor] = useState(null);
+  const [registered, setRegistered] = useState(0);
   const [events, setEvents] = useState([]);
+  const [eventsCursor, setEventsCursor] = useState(null);
   const [loading, setLoading] = useState(false);
   const [message, setMessage] = useState({ type: '', text: '' });
   const [editingEvent, setEditingEvent] = useState(null);
+  const eventsRef = useRef([]);
+  const bookingsRef = useRef({ bookings: [], cursor: null });
+  const bookingsRefresh = useRef(null);
   
   // Login state
   const [username, setUsername] = useState('');
@@ -24,13 +61,63 @@ function FacilitatorDashboard({ onLogout }) {
     }
   }, []);
 
+  useEffect(() => {
+    eventsRef.current = events;
+  }, [events]);
+
+  useEffect(() => {
+    bookingsRef.current = { bookings, cursor: bookingsCursor };
+  }, [bookings, bookingsCursor]);
+
   useEffect(() => {
     if (facilitator) {
       fetchBookings();
+      fetchRegistered();
       fetchEvents();
+      const close = openLiveStream(fetchStreamTicket, applyUpdate);
+      return () => {
+        close();
+        clearTimeout(bookingsRefresh.current);
+      };
     }
   }, [facilitator]);
 
+  // Deltas from the live stream: edits and cancellations of a session update it
+  // in place. A booking or cancellation on one sets its seat count, refreshes the
+  // registration total and, while every registration fits on one page, that page;
+  // longer lists keep the pages already loaded
+  const applyUpdate = (update) => {
+    if (update.type === 'event') {
+      setEvents((current) =>
+        current.map((event) =>
+          event.id === update.crm_event_id
+            ? {
+                ...event,
+                title: update.title,
+                price: update.price,
+                max_participants: update.max_participants,
+                is_active: update.is_active,
+              }
+            : event
+        )
+      );
+    } else if (update.type === 'seats' && eventsRef.current.some((event) => event.original_event_id === update.event_id)) {
+      setEvents((current) =>
+        current.map((event) =>
+          event.original_event_id === update.event_id
+            ? { ...event, current_participants: update.current_participants }
+            : event
+        )
+      );
+      clearTimeout(bookingsRefresh.current);
+      bookingsRefresh.current = setTimeout(() => {
+        fetchRegistered();
+        const loaded = bookingsRef.current;
+        if (!loaded.cursor && loaded.bookings.length < PAGE_SIZE) fetchBookings();
+      }, 500);
+    }
+  };
+
   const handleLogin = async (e) => {
     e.preventDefault();
     setLoginLoading(true);
@@ -62,33 +149,39 @@ function FacilitatorDashboard({ onLogout }) {
     setFacilitator(null);
     localStorage.removeItem('facilitator');
     setBookings([]);
+    setBookingsCursor(null);
+    setRegistered(0);
     setEvents([]);
+    setEventsCursor(null);
   };
 
-  const fetchBookings = async () => {
+  // Without a cursor, replaces the list with its first page; with one, appends the next
+  const fetchBookings = async (cursor = null) => {
     try {
-      const response = await fetch(`${CRM_URL}/api/facilitator/${facilitator.id}/bookings`, {
-        headers: { 'Authorization': `Bearer ${CRM_TOKEN}` },
-      });
-      const data = await response.json();
-      if (response.ok) {
-        setBookings(data.bookings || []);
-      }
+      const data = await fetchPage(`/api/facilitator/${facilitator.id}/bookings`, cursor);
+      setBookings((current) => (cursor ? [...current, ...data.bookings] : data.bookings));
+      setBookingsCursor(data.next_cursor);
     } catch (error) {
       console.error('Failed to fetch bookings:', error);
     }
   };
 
-  const fetchEvents = async () => {
-    setLoading(true);
+  // Confirmed registrations, counted from the CRM's rollups rather than the loaded pages
+  const fetchRegistered = async () => {
     try {
-      const response = await fetch(`${CRM_URL}/api/facilitator/${facilitator.id}/events`, {
-        headers: { 'Authorization': `Bearer ${CRM_TOKEN}` },
-      });
-      const data = await response.json();
-      if (response.ok) {
-        setEvents(data.events || []);
-      }
+      const totals = await crmGet(`/api/facilitator/${facilitator.id}/analytics/totals`);
+      setRegistered(totals.bookings - totals.cancellations);
+    } catch (error) {
+      console.error('Failed to fetch registration totals:', error);
+    }
+  };
+
+  const fetchEvents = async (cursor = null) => {
+    if (!cursor) setLoading(true);
+    try {
+      const data = await fetchPage(`/api/facilitator/${facilitator.id}/events`, cursor);
+      setEvents((current) => (cursor ? [...current, ...data.events] : data.events));
+      setEventsCursor(data.next_cursor);
     } catch (error) {
       console.error('Failed to fetch events:', error);
     } finally {
@@ -96,6 +189,11 @@ function FacilitatorDashboard({ onLogout }) {
     }
   };
 
+  // The CRM answers an edit or cancellation with the event as stored
+  const replaceEvent = (updated) => {
+    setEvents((current) => current.map((event) => (event.id === updated.id ? { ...event, ...updated } : event)));
+  };
+
   const handleUpdateEvent = async (eventId, updates) => {
     setMessage({ type: '', text: '' });
     try {
@@ -112,7 +210,7 @@ function FacilitatorDashboard({ onLogout }) {
       if (response.ok) {
         setMessage({ type: 'success', text: 'Event updated successfully!' });
         setEditingEvent(null);
-        fetchEvents();
+        replaceEvent(data.event);
       } else {
         setMessage({ type: 'error', text: data.error || 'Failed to update event' });
       }
@@ -134,7 +232,7 @@ function FacilitatorDashboard({ onLogout }) {
 
       if (response.ok) {
         setMessage({ type: 'success', text: 'Event cancelled successfully!' });
-        fetchEvents();
+        replaceEvent(data.event);
       } else {
         setMessage({ type: 'error', text: data.error || 'Failed to cancel event' });
       }
@@ -223,7 +321,7 @@ function FacilitatorDashboard({ onLogout }) {
 
       {/* Bookings Section */}
       <div className="bookings-section">
-        <h3>Registered Users ({bookings.length})</h3>
+        <h3>Registered Users ({registered})</h3>
         {bookings.length === 0 ? (
           <div className="empty-state">No bookings yet.</div>
         ) : (
@@ -238,11 +336,16 @@ function FacilitatorDashboard({ onLogout }) {
             </div>
           ))
         )}
+        {bookingsCursor && (
+          <button className="btn btn-secondary btn-sm" onClick={() => fetchBookings(bookingsCursor)}>
+            Load more
+          </button>
+        )}
       </div>
 
       {/* Events Section */}
       <div className="bookings-section" style={{ marginTop: '2rem' }}>
-        <h3>My Sessions ({events.length})</h3>
+        <h3>My Sessions ({events.length}{eventsCursor ? '+' : ''})</h3>
         {loading ? (
           <div className="loading">Loading...</div>
         ) : events.length === 0 ? (
@@ -261,7 +364,10 @@ function FacilitatorDashboard({ onLogout }) {
                   <div>
                     <h4 style={{ margin: '0 0 0.5rem 0' }}>{event.title}</h4>
                     <p style={{ margin: 0, fontSize: '0.9rem', color: 'var(--text-secondary)' }}>
-                      {event.event_type} | ₹{event.price} | Max: {event.max_participants}
+                      {event.event_type} | ₹{event.price} |{' '}
+                      {event.current_participants !== undefined
+                        ? `Booked: ${event.current_participants}/${event.max_participants}`
+                        : `Max: ${event.max_participants}`}
                     </p>
                   </div>
                   <div style={{ display: 'flex', gap: '0.5rem' }}>
@@ -289,6 +395,11 @@ function FacilitatorDashboard({ onLogout }) {
             </div>
           ))
         )}
+        {eventsCursor && !loading && (
+          <button className="btn btn-secondary btn-sm" onClick={() => fetchEvents(eventsCursor)}>
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );
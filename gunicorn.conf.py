@@ -0,0 +1,18 @@
+# Production server settings for both services, e.g.
+#   gunicorn -c gunicorn.conf.py -b 0.0.0.0:5000 'app:create_app()'
+#   gunicorn -c gunicorn.conf.py -b 0.0.0.0:5001 'crm_app:create_app()'
+# Run `flask --app app init-db` / `flask --app crm_app init-db` before each deployment;
+# it creates the schema or upgrades an existing database.
+import multiprocessing
+import os
+
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+keepalive = 5
+
+# Workers import the app themselves; creating it does no database work
+preload_app = False
+
+accesslog = '-'
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+from flask_jwt_extended import get_jwt
+
+import metrics
+from config import Config
+
+# Claims login() embeds in access tokens alongside the user id ('sub')
+IDENTITY_CLAIMS = ('username', 'email', 'created_at')
+
+
+class IdentityCache:
+    """LRU of serialized users by id, each entry valid for `ttl` seconds"""
+
+    def __init__(self, max_entries=1024, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[user_id]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+        metrics.inc('identity_cache_hits_total' if entry else 'identity_cache_misses_total')
+        return entry[1] if entry else None
+
+    def put(self, user_id, identity):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic(), identity)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+identity_cache = IdentityCache(Config.IDENTITY_CACHE_SIZE, Config.IDENTITY_CACHE_TTL)
+
+
+def identity_claims(user):
+    """Additional access-token claims describing `user`"""
+    return {name: value for name, value in user.to_dict().items() if name in IDENTITY_CLAIMS}
+
+
+def current_identity():
+    """The requesting user as User.to_dict() would serialize them, or None.
+
+    Read from the verified token's claims. Tokens issued before claims were
+    embedded fall back to identity_cache, then to the users table.
+    """
+    claims = get_jwt()
+    user_id = int(claims['sub'])
+    if all(name in claims for name in IDENTITY_CLAIMS):
+        metrics.inc('identity_token_claims_total')
+        return {'id': user_id, **{name: claims[name] for name in IDENTITY_CLAIMS}}
+
+    identity = identity_cache.get(user_id)
+    if identity is None:
+        from models import db, User
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        identity = user.to_dict()
+        identity_cache.put(user_id, identity)
+    return identity
+
+
+def identities(user_ids):
+    """Serialized users by id for `user_ids`, from identity_cache then one users query"""
+    found = {}
+    missing = []
+    for user_id in set(user_ids):
+        identity = identity_cache.get(user_id)
+        if identity is None:
+            missing.append(user_id)
+        else:
+            found[user_id] = identity
+    if missing:
+        from models import User
+        for user in User.query.filter(User.id.in_(missing)):
+            found[user.id] = user.to_dict()
+            identity_cache.put(user.id, found[user.id])
+    return found
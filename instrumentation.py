@@ -0,0 +1,171 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from flask import Response, current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+import metrics
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def instrument_app(app, db, config):
+    """Record per-route latency and SQL cost for every request to `app`.
+
+    Each request observes http_request_duration_seconds, plus the number and
+    total time of the SQL statements it ran, labelled by method and route
+    rule. With config.PROFILE_SLOW_REQUEST_SECONDS set, requests slower than
+    that also leave a sampled stack profile in config.PROFILE_DIR.
+    """
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+
+    if config.PROFILE_SLOW_REQUEST_SECONDS > 0:
+        app.extensions['slow_request_profiler'] = SlowRequestProfiler(
+            config.PROFILE_SLOW_REQUEST_SECONDS, config.PROFILE_SAMPLE_INTERVAL, config.PROFILE_DIR)
+
+
+def instrument_engine(engine):
+    """Count and time every statement `engine` runs, per process and per request"""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['statement_started'].pop()
+        metrics.inc('db_statements_total')
+        metrics.inc('db_statement_seconds_total', elapsed)
+        if has_request_context() and 'request_started' in g:
+            g.sql_statements += 1
+            g.sql_seconds += elapsed
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule else '<unmatched>'
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+    profiler = current_app.extensions.get('slow_request_profiler')
+    if profiler:
+        profiler.begin()
+
+
+def _record_status(response):
+    g.response_status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    """Runs after streamed responses finish, so their body time is included"""
+    if 'request_started' not in g:
+        return
+    elapsed = time.perf_counter() - g.request_started
+    labels = {'method': request.method, 'route': _route()}
+    status = g.get('response_status', 500)
+
+    metrics.observe('http_request_duration_seconds', elapsed, labels)
+    metrics.observe('http_request_sql_statements', g.sql_statements, labels, buckets=metrics.COUNT_BUCKETS)
+    metrics.observe('http_request_sql_seconds', g.sql_seconds, labels)
+    metrics.inc('http_requests_total', labels=dict(labels, status=status))
+
+    profiler = current_app.extensions.get('slow_request_profiler')
+    if profiler:
+        path = profiler.end(elapsed, f"{request.method} {labels['route']}")
+        if path:
+            current_app.logger.warning('Slow request %s %s took %.0f ms; profile written to %s',
+                                       request.method, request.path, elapsed * 1000, path)
+
+
+def metrics_response():
+    """GET /metrics: Prometheus text, or the JSON snapshot for Accept: application/json"""
+    if request.accept_mimetypes.best_match(['text/plain', 'application/json']) == 'application/json':
+        return jsonify(metrics.snapshot()), 200
+    return Response(metrics.exposition(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+class SlowRequestProfiler:
+    """Sampling profiler that keeps the stacks of slow requests only.
+
+    While any request is in flight, a daemon thread samples the stack of
+    each request thread every `interval` seconds. When a request finishes
+    in at least `threshold` seconds its samples are written to `directory`
+    as collapsed stacks ("outer;inner;leaf count" per line), the input
+    format of flamegraph.pl and speedscope; otherwise they are dropped.
+    """
+
+    def __init__(self, threshold, interval, directory):
+        self.threshold = threshold
+        self.interval = interval
+        self.directory = directory
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def begin(self):
+        """Start sampling the calling thread"""
+        with self._lock:
+            self._samples[threading.get_ident()] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='slow-request-profiler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def end(self, elapsed, label):
+        """Stop sampling the calling thread; returns the profile path if it was slow"""
+        with self._lock:
+            samples = self._samples.pop(threading.get_ident(), None)
+        if not samples or elapsed < self.threshold:
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        name = re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')
+        path = os.path.join(self.directory,
+                            f'{datetime.utcnow():%Y%m%dT%H%M%S%f}-{name}-{elapsed * 1000:.0f}ms.folded')
+        with open(path, 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+        metrics.inc('slow_request_profiles_total')
+        return path
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                idle = not self._samples
+                if idle:
+                    self._wake.clear()
+            if idle:
+                self._wake.wait()
+                continue
+
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._samples.items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != me:
+                        samples[collapse(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+def collapse(frame):
+    """A stack as 'outermost;...;innermost', one 'file:function' per frame"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
@@ -0,0 +1,174 @@
+"""Server-sent events hub for live seat availability.
+
+Flask workers publish compact JSON deltas as UDP datagrams (see
+live_updates.py); the hub pushes each one to every subscriber of
+GET /stream. Subscribers are plain asyncio transports on one event loop,
+so thousands of idle connections cost a few kilobytes each and no threads.
+
+Usage:
+    python live_seats.py --port 5002 --publish-port 5003
+
+Browsers connect with EventSource('http://localhost:5002/stream?ticket=<ticket>'),
+with a single-use ticket from POST /api/events/stream-ticket (booking API,
+JWT) or POST /api/stream-ticket (CRM, bearer token); see stream_tickets.py.
+"""
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit, parse_qs
+
+from config import Config
+from stream_tickets import check_ticket
+
+MAX_REQUEST_BYTES = 8192
+# A subscriber this far behind is dropped rather than buffered without bound
+MAX_PENDING_BYTES = 256 * 1024
+KEEPALIVE_SECONDS = 15
+
+SSE_HEADERS = (
+    b'HTTP/1.1 200 OK\r\n'
+    b'Content-Type: text/event-stream\r\n'
+    b'Cache-Control: no-cache\r\n'
+    b'Connection: keep-alive\r\n'
+    b'Access-Control-Allow-Origin: *\r\n'
+    b'\r\n'
+    b'retry: 3000\n\n'
+)
+
+
+def error_response(status):
+    body = json.dumps({'error': status}).encode()
+    return (
+        f'HTTP/1.1 {status}\r\n'
+        'Content-Type: application/json\r\n'
+        'Access-Control-Allow-Origin: *\r\n'
+        f'Content-Length: {len(body)}\r\n'
+        'Connection: close\r\n\r\n'
+    ).encode() + body
+
+
+class Hub:
+    def __init__(self, ticket_secret):
+        self.ticket_secret = ticket_secret
+        self.subscribers = set()
+        self.seq = 0
+        # Nonces of tickets already used, until they would have expired anyway
+        self.used_tickets = {}
+
+    def admit(self, ticket):
+        """True for a valid ticket not presented before"""
+        checked = check_ticket(self.ticket_secret, ticket) if ticket else None
+        if checked is None or checked[0] in self.used_tickets:
+            return False
+        nonce, expires = checked
+        self.used_tickets[nonce] = expires
+        return True
+
+    def forget_expired_tickets(self):
+        now = time.time()
+        self.used_tickets = {nonce: expires for nonce, expires in self.used_tickets.items() if expires >= now}
+
+    def broadcast(self, payload):
+        self.seq += 1
+        self.write_all(b'id: %d\ndata: %s\n\n' % (self.seq, payload))
+
+    def write_all(self, frame):
+        for transport in list(self.subscribers):
+            if transport.get_write_buffer_size() > MAX_PENDING_BYTES:
+                self.subscribers.discard(transport)
+                transport.abort()
+            else:
+                transport.write(frame)
+
+    async def keepalive(self):
+        while True:
+            await asyncio.sleep(KEEPALIVE_SECONDS)
+            self.write_all(b': keepalive\n\n')
+            self.forget_expired_tickets()
+
+
+class SubscriberProtocol(asyncio.Protocol):
+    """One SSE client: read the request head, then only ever write"""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.transport = None
+        self.request = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        if self.transport in self.hub.subscribers:
+            return  # clients have nothing more to say
+        self.request += data
+        if b'\r\n\r\n' not in self.request:
+            if len(self.request) > MAX_REQUEST_BYTES:
+                self.reject('431 Request Header Fields Too Large')
+            return
+
+        try:
+            method, target, _ = self.request.split(b'\r\n', 1)[0].decode('latin-1').split(' ', 2)
+        except ValueError:
+            return self.reject('400 Bad Request')
+        url = urlsplit(target)
+        self.request = b''
+
+        if method != 'GET' or url.path != '/stream':
+            return self.reject('404 Not Found')
+        if not self.hub.admit(parse_qs(url.query).get('ticket', [''])[0]):
+            return self.reject('401 Unauthorized')
+
+        self.transport.write(SSE_HEADERS)
+        self.hub.subscribers.add(self.transport)
+
+    def reject(self, status):
+        self.transport.write(error_response(status))
+        self.transport.close()
+
+    def connection_lost(self, exc):
+        self.hub.subscribers.discard(self.transport)
+
+
+class PublishProtocol(asyncio.DatagramProtocol):
+    """Receives deltas from the Flask workers"""
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def datagram_received(self, data, addr):
+        try:
+            json.loads(data)
+        except ValueError:
+            return
+        self.hub.broadcast(data)
+
+
+async def serve(host, port, publish_host, publish_port):
+    loop = asyncio.get_running_loop()
+    hub = Hub(Config.LIVE_STREAM_SECRET)
+    server = await loop.create_server(lambda: SubscriberProtocol(hub), host, port, backlog=4096)
+    await loop.create_datagram_endpoint(lambda: PublishProtocol(hub), local_addr=(publish_host, publish_port))
+    asyncio.create_task(hub.keepalive())
+    print(f'Live seat stream on http://{host}:{port}/stream, deltas on udp://{publish_host}:{publish_port}',
+          flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Server-sent events hub for live seat availability')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5002)
+    parser.add_argument('--publish-host', default='127.0.0.1')
+    parser.add_argument('--publish-port', type=int, default=5003)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.publish_host, args.publish_port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
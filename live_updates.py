@@ -0,0 +1,53 @@
+import json
+import socket
+
+_socket = None
+
+
+def parse_address(value):
+    """'host:port' -> (host, port); an empty value disables publishing"""
+    if not value:
+        return None
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def publish(message, address):
+    """Send a delta to the live_seats hub as one UDP datagram.
+
+    Fire-and-forget: publishing never blocks or fails the request that
+    committed the change. Clients fall back to the listings if a delta is lost.
+    """
+    global _socket
+    if address is None:
+        return
+    try:
+        if _socket is None:
+            _socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            _socket.setblocking(False)
+        _socket.sendto(json.dumps(message, separators=(',', ':')).encode(), address)
+    except OSError:
+        pass
+
+
+def seat_delta(event):
+    """Seat availability of a booking-side Event"""
+    return {
+        'type': 'seats',
+        'event_id': event.id,
+        'current_participants': event.current_participants,
+        'max_participants': event.max_participants
+    }
+
+
+def event_status_delta(crm_event):
+    """Status and editable details of a CRMEvent after a facilitator change"""
+    return {
+        'type': 'event',
+        'event_id': crm_event.original_event_id,
+        'crm_event_id': crm_event.id,
+        'title': crm_event.title,
+        'price': crm_event.price,
+        'max_participants': crm_event.max_participants,
+        'is_active': crm_event.is_active
+    }
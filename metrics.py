@@ -0,0 +1,120 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds: request and query latencies in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# ... and per-request SQL statement counts
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+
+
+def _series(name, labels):
+    return (name, tuple(sorted(labels.items())) if labels else ())
+
+
+def inc(name, value=1, labels=None):
+    """Increment a process-wide counter"""
+    key = _series(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_value(name, value, labels=None):
+    """Record the latest value of a process-wide measurement"""
+    with _lock:
+        _counters[_series(name, labels)] = value
+
+
+def register_gauge(name, fn):
+    """Register a callable evaluated each time metrics are read"""
+    _gauges[name] = fn
+
+
+def observe(name, value, labels=None, buckets=LATENCY_BUCKETS):
+    """Add a sample to a histogram; `buckets` is fixed by the first sample"""
+    key = _series(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': buckets, 'counts': [0] * len(buckets),
+                                            'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(histogram['buckets']):
+            if value <= bound:
+                histogram['counts'][i] += 1
+                break
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+
+@contextmanager
+def timed(name, labels=None):
+    """Observe the duration of the block, in seconds, even if it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, labels)
+
+
+def histogram_totals(name):
+    """[(labels, count, sum)] for every series of histogram `name`"""
+    with _lock:
+        return [(dict(labels), h['count'], h['sum'])
+                for (series, labels), h in _histograms.items() if series == name]
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def snapshot():
+    """Current counters plus freshly evaluated gauges"""
+    with _lock:
+        values = {name + _label_text(labels): value for (name, labels), value in _counters.items()}
+    for name, fn in _gauges.items():
+        values[name] = fn()
+    return values
+
+
+def exposition():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, dict(h, counts=list(h['counts']))) for key, h in _histograms.items())
+    gauges = [((name, ()), fn()) for name, fn in sorted(_gauges.items())]
+
+    lines = []
+    typed = set()
+
+    def declare(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f'# TYPE {name} {kind}')
+
+    for (name, labels), value in counters + gauges:
+        if value is None:
+            continue
+        declare(name, 'counter' if name.endswith('_total') else 'gauge')
+        lines.append(f'{name}{_label_text(labels)} {value}')
+
+    for (name, labels), histogram in histograms:
+        declare(name, 'histogram')
+        cumulative = 0
+        for bound, count in zip(histogram['buckets'], histogram['counts']):
+            cumulative += count
+            lines.append(f'{name}_bucket{_label_text(labels + (("le", bound),))} {cumulative}')
+        lines.append(f'{name}_bucket{_label_text(labels + (("le", "+Inf"),))} {histogram["count"]}')
+        lines.append(f'{name}_sum{_label_text(labels)} {histogram["sum"]}')
+        lines.append(f'{name}_count{_label_text(labels)} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
@@ -1,8 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event as sa_event, inspect
+from sqlalchemy.orm import Session
+from config import Config
+from passwords import PasswordHasher
+from sequences import next_values
+from serialization import Serializer, isoformat
 
 db = SQLAlchemy()
+password_hasher = PasswordHasher(Config.PASSWORD_HASH_METHOD, Config.PASSWORD_HASH_WORKERS)
 
 
 class User(db.Model):
@@ -19,18 +25,16 @@ class User(db.Model):
     bookings = db.relationship('Booking', backref='user', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'created_at': self.created_at.isoformat()
-        }
+        return user_serializer(self)
 
 
 class Facilitator(db.Model):
@@ -46,12 +50,7 @@ class Facilitator(db.Model):
     events = db.relationship('Event', backref='facilitator', lazy=True)
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'email': self.email,
-            'specialization': self.specialization
-        }
+        return facilitator_serializer(self)
 
 
 class Event(db.Model):
@@ -65,27 +64,32 @@ class Event(db.Model):
     start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime, nullable=False)
     max_participants = db.Column(db.Integer, default=20)
+    current_participants = db.Column(db.Integer, nullable=False, default=0)  # confirmed seats, see reservations.py
     price = db.Column(db.Float, default=0.0)
     facilitator_id = db.Column(db.Integer, db.ForeignKey('facilitators.id'), nullable=False)
     is_active = db.Column(db.Boolean, default=True)
+    change_seq = db.Column(db.Integer, nullable=False, default=0, index=True)  # see stamp_event_changes
+    waitlist_tail = db.Column(db.Integer, nullable=False, default=0)  # last waitlist position handed out
+    schedule_node = db.Column(db.Integer)  # interval tree node of (start_time, end_time), see schedule.py
     
     # Relationship
     bookings = db.relationship('Booking', backref='event', lazy=True)
     
+    __table_args__ = (
+        # Keyset pagination of the active catalogue by (start_time, id)
+        db.Index('ix_events_active_start', 'is_active', 'start_time', 'id'),
+        # Covers search filters and facet counts without reading event rows
+        db.Index('ix_events_search_facets', 'is_active', 'event_type', 'price', 'start_time'),
+        # A facilitator's schedule as an interval tree
+        db.Index('ix_events_facilitator_schedule', 'facilitator_id', 'schedule_node'),
+    )
+    
     def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'event_type': self.event_type,
-            'start_time': self.start_time.isoformat(),
-            'end_time': self.end_time.isoformat(),
-            'max_participants': self.max_participants,
-            'current_participants': len([b for b in self.bookings if b.status == 'confirmed']),
-            'price': self.price,
-            'facilitator': self.facilitator.to_dict() if self.facilitator else None,
-            'is_active': self.is_active
-        }
+        return event_serializer(self)
+    
+    def to_sync_dict(self):
+        """Catalogue fields shipped to the CRM by the change feed"""
+        return event_sync_serializer(self)
 
 
 class Booking(db.Model):
@@ -97,12 +101,117 @@ class Booking(db.Model):
     event_id = db.Column(db.Integer, db.ForeignKey('events.id'), nullable=False)
     booked_at = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='confirmed')  # confirmed, cancelled
+    seats = db.Column(db.Integer, nullable=False, default=1)  # >1 for group bookings
+    schedule_node = db.Column(db.Integer)  # the event's schedule_node, see schedule.py
+    
+    __table_args__ = (
+        # At most one confirmed booking per user and event
+        db.Index(
+            'uq_bookings_user_event_confirmed', 'user_id', 'event_id',
+            unique=True,
+            sqlite_where=db.text("status = 'confirmed'"),
+            postgresql_where=db.text("status = 'confirmed'")
+        ),
+        # A user's bookings, optionally narrowed to one event and status
+        db.Index('ix_bookings_user_event_status', 'user_id', 'event_id', 'status'),
+        # Confirmed bookings of an event (seat counter rebuilds)
+        db.Index('ix_bookings_event_status', 'event_id', 'status'),
+        # A user's schedule as an interval tree
+        db.Index('ix_bookings_user_schedule', 'user_id', 'schedule_node'),
+    )
+    
+    def to_dict(self, include_user=True, user=None):
+        """`user` is an already serialized user to embed instead of loading the relationship"""
+        data = booking_serializer(self)
+        if include_user:
+            if user is None and self.user:
+                user = self.user.to_dict()
+            data['user'] = user
+        return data
+
+
+class WaitlistEntry(db.Model):
+    """A user queued for a seat at a full event, promoted in position order"""
+    __tablename__ = 'waitlist_entries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # from Event.waitlist_tail; gaps are normal
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # FIFO order within an event; the head is one index seek
+        db.Index('uq_waitlist_event_position', 'event_id', 'position', unique=True),
+        # One place in line per user and event
+        db.Index('uq_waitlist_event_user', 'event_id', 'user_id', unique=True),
+        # A user's waitlist entries
+        db.Index('ix_waitlist_user', 'user_id'),
+    )
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'user': self.user.to_dict() if self.user else None,
-            'event': self.event.to_dict() if self.event else None,
-            'booked_at': self.booked_at.isoformat(),
-            'status': self.status
-        }
+        return waitlist_entry_serializer(self)
+
+
+class OutboxMessage(db.Model):
+    """CRM notification waiting for delivery, written in the same transaction as its booking"""
+    __tablename__ = 'crm_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON body for the CRM
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32), index=True)
+    delivered_at = db.Column(db.DateTime)
+    last_error = db.Column(db.String(500))
+    
+    __table_args__ = (
+        db.Index('ix_crm_outbox_pending', 'delivered_at', 'next_attempt_at'),
+    )
+
+
+class SyncCounter(db.Model):
+    """Named monotonically increasing counters, e.g. the event change sequence"""
+    __tablename__ = 'sync_counters'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+# JSON shapes of the models above, see serialization.py
+user_serializer = Serializer('id', 'username', 'email', ('created_at', isoformat))
+facilitator_serializer = Serializer('id', 'name', 'email', 'specialization')
+event_serializer = Serializer(
+    'id', 'title', 'description', 'event_type', ('start_time', isoformat), ('end_time', isoformat),
+    'max_participants', 'current_participants', 'price', ('facilitator', facilitator_serializer), 'is_active'
+)
+event_sync_serializer = Serializer(
+    'id', 'title', 'description', 'event_type', ('start_time', isoformat), ('end_time', isoformat),
+    'max_participants', 'price', 'facilitator_id', 'is_active', 'change_seq'
+)
+booking_serializer = Serializer('id', ('event', event_serializer), ('booked_at', isoformat), 'status', 'seats')
+waitlist_entry_serializer = Serializer('id', 'event_id', 'position', ('created_at', isoformat))
+
+
+# Changes to these columns are shipped to the CRM by catalogue_sync
+SYNCED_EVENT_COLUMNS = (
+    'title', 'description', 'event_type', 'start_time', 'end_time',
+    'max_participants', 'price', 'facilitator_id', 'is_active'
+)
+
+
+@sa_event.listens_for(Session, 'before_flush')
+def stamp_event_changes(session, flush_context, instances):
+    """Give every new or edited Event the next value of the 'events' sequence"""
+    changed = [obj for obj in session.new if isinstance(obj, Event)]
+    for obj in session.dirty:
+        if isinstance(obj, Event):
+            state = inspect(obj)
+            if any(state.attrs[column].history.has_changes() for column in SYNCED_EVENT_COLUMNS):
+                changed.append(obj)
+    
+    if changed:
+        for obj, seq in zip(changed, next_values(session, SyncCounter, 'events', len(changed))):
+            obj.change_seq = seq
@@ -0,0 +1,83 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import literal, tuple_
+
+
+class PaginationError(ValueError):
+    """Raised for malformed limit, cursor or fields parameters"""
+
+
+def encode_cursor(sort_value, row_id):
+    """Opaque cursor for the row after which the next page starts"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor for datetime-ordered listings"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+
+
+def page_size(default, maximum):
+    """The requested ?limit=, defaulted and capped"""
+    value = request.args.get('limit')
+    if value is None:
+        return min(default, maximum)
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, maximum)
+
+
+def requested_fields(allowed):
+    """The ?fields= projection as a set, or None for all fields"""
+    value = request.args.get('fields')
+    if not value:
+        return None
+    fields = {f.strip() for f in value.split(',') if f.strip()}
+    unknown = fields - set(allowed)
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def keyset_page(query, sort_column, id_column, default, maximum):
+    """Fetch one page of `query` ordered by (sort_column, id_column).
+
+    Reads ?cursor= and ?limit= from the request. Returns the rows of the
+    page and the cursor of the next page (None on the last page).
+    """
+    limit = page_size(default, maximum)
+    cursor = request.args.get('cursor')
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(sort_column, id_column) > tuple_(
+            literal(sort_value, sort_column.type), literal(row_id, id_column.type)
+        ))
+
+    # One extra row tells us whether another page exists
+    rows = query.order_by(sort_column, id_column).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+
+def parse_datetime_arg(name):
+    """Read an optional ISO-8601 query parameter; raises ValueError if malformed"""
+    value = request.args.get(name)
+    return datetime.fromisoformat(value) if value else None
@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+@lru_cache(maxsize=None)
+def method_prefix(method):
+    """The parameter prefix Werkzeug stores for `method`, e.g. 'scrypt:32768:8:1'"""
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords on a small bounded thread pool.
+
+    The KDFs release the GIL, so running them on a pool of `workers` threads
+    caps how many cores logins can occupy per process while the request
+    threads stay free to serve other traffic.
+    """
+
+    def __init__(self, method, workers):
+        self.method = method
+        self.workers = workers
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='kdf')
+        return self._executor
+
+    def hash(self, password):
+        return self.executor.submit(generate_password_hash, password, self.method).result()
+
+    def verify(self, pwhash, password):
+        return self.executor.submit(check_password_hash, pwhash, password).result()
+
+    def needs_rehash(self, pwhash):
+        """True if `pwhash` was made with parameters other than the configured ones"""
+        return pwhash.split('$', 1)[0] != method_prefix(self.method)
@@ -0,0 +1,316 @@
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+from models import db, Booking, Event, WaitlistEntry
+from schedule import fork_node, user_conflict
+
+
+class ReservationError(Exception):
+    """Base class for seat reservations that cannot be made"""
+    status_code = 400
+    message = 'Reservation failed'
+
+    def __init__(self, event_id=None):
+        super().__init__(self.message)
+        self.event_id = event_id
+
+
+class EventNotFound(ReservationError):
+    status_code = 404
+    message = 'Event not found'
+
+
+class EventUnavailable(ReservationError):
+    status_code = 400
+    message = 'Event is no longer available'
+
+
+class AlreadyBooked(ReservationError):
+    status_code = 409
+    message = 'You have already booked this event'
+
+
+class EventFull(ReservationError):
+    status_code = 400
+    message = 'Event is fully booked'
+
+
+class SeatsAvailable(ReservationError):
+    status_code = 409
+    message = 'Event has free seats; book it directly'
+
+
+class AlreadyWaitlisted(ReservationError):
+    status_code = 409
+    message = 'You are already on the waitlist for this event'
+
+
+class ScheduleConflict(ReservationError):
+    status_code = 409
+    message = 'You already have a booking at that time'
+
+
+class AlreadyCancelled(ReservationError):
+    status_code = 400
+    message = 'Booking is already cancelled'
+
+
+def claim_seat(event_id, seats=1):
+    """Take `seats` seats of an active event if that many are free.
+
+    The capacity check and the increment are a single conditional UPDATE,
+    so concurrent workers can never push the counter past max_participants.
+    Returns the event's (start_time, end_time) when the seats were claimed,
+    None otherwise.
+    """
+    return db.session.execute(
+        update(Event)
+        .where(
+            Event.id == event_id,
+            Event.is_active.is_(True),
+            Event.current_participants + seats <= Event.max_participants
+        )
+        .values(current_participants=Event.current_participants + seats)
+        .returning(Event.start_time, Event.end_time)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+
+def release_seat(event_id, seats=1):
+    """Give `seats` seats of an event back in the current transaction"""
+    db.session.execute(
+        update(Event)
+        .where(Event.id == event_id, Event.current_participants >= seats)
+        .values(current_participants=Event.current_participants - seats)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def cancel_reservation(booking):
+    """Cancel a confirmed booking and give its seats back in the current transaction.
+
+    The status flip is a conditional UPDATE, so of concurrent cancellations
+    of one booking exactly one releases the seats; the others roll back and
+    raise AlreadyCancelled.
+    """
+    cancelled = db.session.execute(
+        update(Booking)
+        .where(Booking.id == booking.id, Booking.user_id == booking.user_id, Booking.status == 'confirmed')
+        .values(status='cancelled')
+        .execution_options(synchronize_session=False)
+    )
+    if cancelled.rowcount != 1:
+        db.session.rollback()
+        raise AlreadyCancelled(booking.event_id)
+    set_committed_value(booking, 'status', 'cancelled')
+    release_seat(booking.event_id, booking.seats)
+
+
+def unavailable(event_id):
+    """The ReservationError explaining why seats of `event_id` could not be claimed"""
+    event = db.session.get(Event, event_id)
+    if event is None:
+        return EventNotFound(event_id)
+    if not event.is_active:
+        return EventUnavailable(event_id)
+    return EventFull(event_id)
+
+
+def reserve_seat(user_id, event_id):
+    """Add a confirmed booking and claim its seat in the current transaction.
+
+    The booking row is inserted first so the partial unique index on
+    (user_id, event_id) rejects duplicates before the event row is touched.
+    Events overlapping one the user is already booked into are refused.
+    The caller commits; on failure the transaction is rolled back and a
+    ReservationError subclass is raised.
+    """
+    booking = Booking(user_id=user_id, event_id=event_id, status='confirmed')
+    db.session.add(booking)
+
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        raise AlreadyBooked()
+
+    times = claim_seat(event_id)
+    if times is None:
+        db.session.rollback()
+        raise unavailable(event_id)
+
+    if user_conflict(user_id, *times) is not None:
+        db.session.rollback()
+        raise ScheduleConflict(event_id)
+    booking.schedule_node = fork_node(*times)
+
+    leave_waitlists(user_id, [event_id])
+    return booking
+
+
+def reserve_group(user_id, seats_by_event):
+    """Book seats at several events for one user, all or nothing.
+
+    `seats_by_event` maps event ids to seat counts. All bookings are
+    inserted in one flush, then seats are claimed event by event in id
+    order (a consistent lock order for concurrent groups). If any event
+    lacks capacity, or overlaps another event of the group or one the user
+    is already booked into, the whole transaction is rolled back and the
+    ReservationError names that event. The caller commits.
+    """
+    already_booked = db.session.query(Booking.event_id).filter(
+        Booking.user_id == user_id,
+        Booking.event_id.in_(list(seats_by_event)),
+        Booking.status == 'confirmed'
+    ).first()
+    if already_booked:
+        raise AlreadyBooked(already_booked.event_id)
+
+    bookings = [
+        Booking(user_id=user_id, event_id=event_id, seats=seats, status='confirmed')
+        for event_id, seats in sorted(seats_by_event.items())
+    ]
+    db.session.add_all(bookings)
+
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        raise AlreadyBooked()
+
+    spans = []
+    for booking in bookings:
+        times = claim_seat(booking.event_id, booking.seats)
+        if times is None:
+            db.session.rollback()
+            raise unavailable(booking.event_id)
+        booking.schedule_node = fork_node(*times)
+        spans.append((times.start_time, times.end_time, booking.event_id))
+
+    spans.sort()
+    for (_, previous_end, _), (start, _, event_id) in zip(spans, spans[1:]):
+        if start < previous_end:
+            db.session.rollback()
+            raise ScheduleConflict(event_id)
+    for start, end, event_id in spans:
+        if user_conflict(user_id, start, end, exclude_event_ids=seats_by_event) is not None:
+            db.session.rollback()
+            raise ScheduleConflict(event_id)
+
+    leave_waitlists(user_id, list(seats_by_event))
+    return bookings
+
+
+def leave_waitlists(user_id, event_ids):
+    """Drop a user's waitlist entries for events they have just booked"""
+    db.session.execute(
+        delete(WaitlistEntry)
+        .where(WaitlistEntry.user_id == user_id, WaitlistEntry.event_id.in_(event_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def join_waitlist(user_id, event_id):
+    """Append a user to a full event's waitlist; returns the WaitlistEntry.
+
+    The position is handed out by a conditional UPDATE of Event.waitlist_tail,
+    so concurrent joins get distinct, increasing positions. Only active
+    events with no free seats, and none overlapping the user's bookings,
+    take a waitlist. The caller commits.
+    """
+    booked = db.session.query(Booking.id).filter_by(
+        user_id=user_id, event_id=event_id, status='confirmed'
+    ).first()
+    if booked:
+        raise AlreadyBooked(event_id)
+
+    claimed = db.session.execute(
+        update(Event)
+        .where(
+            Event.id == event_id,
+            Event.is_active.is_(True),
+            Event.current_participants >= Event.max_participants
+        )
+        .values(waitlist_tail=Event.waitlist_tail + 1)
+        .returning(Event.waitlist_tail, Event.start_time, Event.end_time)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if claimed is None:
+        db.session.rollback()
+        error = unavailable(event_id)
+        raise SeatsAvailable(event_id) if isinstance(error, EventFull) else error
+
+    if user_conflict(user_id, claimed.start_time, claimed.end_time) is not None:
+        db.session.rollback()
+        raise ScheduleConflict(event_id)
+
+    entry = WaitlistEntry(event_id=event_id, user_id=user_id, position=claimed.waitlist_tail)
+    db.session.add(entry)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        raise AlreadyWaitlisted(event_id)
+    return entry
+
+
+def promote_waitlist(event_id, seats=1):
+    """Give up to `seats` freed seats to the head of an event's waitlist.
+
+    Each promotion reads the head with one seek on (event_id, position),
+    claims the seat and swaps the entry for a confirmed booking, so the
+    cost does not depend on how long the waitlist is. Entries of users who
+    already hold a confirmed booking, or have since booked something at the
+    same time, are dropped on the way. Returns the new bookings; the caller
+    queues their notifications and commits.
+    """
+    event = db.session.get(Event, event_id)
+    if event is None:
+        return []
+
+    promoted = []
+    while len(promoted) < seats:
+        entry = (
+            WaitlistEntry.query
+            .filter_by(event_id=event_id)
+            .order_by(WaitlistEntry.position)
+            .first()
+        )
+        if entry is None:
+            break
+
+        booked = db.session.query(Booking.id).filter_by(
+            user_id=entry.user_id, event_id=event_id, status='confirmed'
+        ).first()
+        if booked is None and user_conflict(entry.user_id, event.start_time, event.end_time) is None:
+            if not claim_seat(event_id):
+                break  # inactive, or capacity was lowered; the entry keeps its place
+            booking = Booking(user_id=entry.user_id, event_id=event_id, status='confirmed',
+                              schedule_node=fork_node(event.start_time, event.end_time))
+            db.session.add(booking)
+            promoted.append(booking)
+        db.session.delete(entry)
+        db.session.flush()
+    return promoted
+
+
+def rebuild_seat_counts():
+    """Recompute every event's confirmed-seat counter from the bookings table"""
+    confirmed = (
+        select(func.coalesce(func.sum(Booking.seats), 0))
+        .where(Booking.event_id == Event.id, Booking.status == 'confirmed')
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        update(Event).values(current_participants=confirmed)
+    )
+    db.session.commit()
+
+    print(f'Seat counters rebuilt for {result.rowcount} events')
+    return result.rowcount
+
+
+if __name__ == '__main__':
+    from app import create_app
+    with create_app().app_context():
+        rebuild_seat_counts()
@@ -0,0 +1,103 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response, Response
+
+import metrics
+from serialization import compress_cached
+
+
+class CachedResponse:
+    """A serialized 200 response, the strong ETag of its uncompressed body and its compressed bodies by encoding"""
+    __slots__ = ('version', 'body', 'mimetype', 'etag', 'stored_at', 'variants')
+
+    def __init__(self, version, body, mimetype):
+        self.version = version
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.stored_at = time.monotonic()
+        self.variants = {}
+
+
+class ResponseCache:
+    """LRU cache of serialized responses, invalidated by bumping a version.
+
+    Writers call bump() after committing a change that affects the cached
+    listings. The version is per process, so max_age bounds how long a
+    worker can serve a response made stale by a write in another worker.
+    """
+
+    def __init__(self, name, max_entries=256, max_age=5.0):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.version = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bump(self):
+        """Invalidate every cached response"""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                entry.version != self.version
+                or time.monotonic() - entry.stored_at > self.max_age
+            ):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        metrics.inc(f'{self.name}_cache_hits_total' if entry else f'{self.name}_cache_misses_total')
+        return entry
+
+    def put(self, key, version, body, mimetype):
+        """Store a response built while `version` was current"""
+        entry = CachedResponse(version, body, mimetype)
+        with self._lock:
+            # A write landed while the response was being built; don't keep it
+            if version == self.version:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+
+def cached_response(cache):
+    """Serve a view's 200 responses from `cache`, answering If-None-Match with 304"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            key = request.full_path
+            entry = cache.get(key)
+
+            if entry is None:
+                version = cache.version
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                entry = cache.put(key, version, response.get_data(), response.mimetype)
+
+            response = compress_cached(Response(entry.body, mimetype=entry.mimetype), entry.variants)
+            # Each content coding is a different representation, with its own ETag
+            encoding = response.headers.get('Content-Encoding')
+            etag = f'{entry.etag}-{encoding}' if encoding else entry.etag
+            if request.if_none_match.contains(etag):
+                metrics.inc(f'{cache.name}_not_modified_total')
+                not_modified = Response(status=304)
+                not_modified.vary.update(response.vary)
+                response = not_modified
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+        return decorated
+    return decorator
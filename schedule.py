@@ -0,0 +1,204 @@
+import math
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event as sa_event, inspect, select, union_all, update
+from sqlalchemy.orm import Session
+from config import Config
+from models import db, Booking, Event
+from pagination import parse_datetime_arg
+
+# Relational interval tree (Kriegel, Poetke and Seidl, VLDB 2000). Minutes
+# since EPOCH are the nodes of a virtual balanced binary tree of HEIGHT
+# levels, and every interval is stored at its fork node: the first node on
+# the way down from the root that falls inside it. Intervals overlapping
+# [start, end) can only sit on the root-to-leaf paths of its two ends or
+# between them, so an overlap test is a few dozen seeks on
+# (owner, schedule_node) however long the owner's schedule is. Schedules
+# without overlaps hold at most one interval per node and owner.
+EPOCH = datetime(2000, 1, 1)
+HEIGHT = 27  # 2**27 minutes, about 255 years
+ROOT = 1 << (HEIGHT - 1)
+
+# Event columns whose changes move an event in its facilitator's schedule
+SCHEDULE_COLUMNS = ('start_time', 'end_time', 'facilitator_id', 'is_active')
+
+
+class FacilitatorConflict(Exception):
+    """An active event overlapping another active event of the same facilitator"""
+
+    def __init__(self, event_id, other_event_id):
+        super().__init__(f'Event {event_id} overlaps event {other_event_id} of the same facilitator')
+        self.event_id = event_id
+        self.other_event_id = other_event_id
+
+
+def minute_range(start, end):
+    """The tree nodes [lower, upper] covering [start, end), one per started minute"""
+    top = 2 * ROOT - 1
+    lower = min(max(math.floor((start - EPOCH) / timedelta(minutes=1)) + 1, 1), top)
+    upper = min(max(math.ceil((end - EPOCH) / timedelta(minutes=1)), lower), top)
+    return lower, upper
+
+
+def fork_node(start, end):
+    """The node an interval is stored at"""
+    lower, upper = minute_range(start, end)
+    node, step = ROOT, ROOT // 2
+    while not lower <= node <= upper:
+        node += step if node < lower else -step
+        step //= 2
+    return node
+
+
+def path(target):
+    """Nodes from the root down to `target`, exclusive"""
+    node, step = ROOT, ROOT // 2
+    while node != target:
+        yield node
+        node += step if node < target else -step
+        step //= 2
+
+
+def candidates(stmt, owner, node_column, start, end):
+    """`stmt` narrowed to the intervals of `owner` that can overlap [start, end).
+
+    One branch per kind of node, each a plain seek on (owner, schedule_node);
+    with other predicates beside them SQLite tends to pick a time index and
+    walk the owner's whole schedule instead. Callers apply the exact test.
+    """
+    lower, upper = minute_range(start, end)
+    outer = {node for node in path(lower) if node < lower} | {node for node in path(upper) if node > upper}
+    return union_all(
+        stmt.where(owner, node_column.in_(sorted(outer))),
+        stmt.where(owner, node_column.between(lower, upper))
+    )
+
+
+def facilitator_events(facilitator_id, start, end, session=None):
+    """[(id, start_time, end_time)] of the facilitator's active events overlapping [start, end)"""
+    rows = (session or db.session).execute(candidates(
+        select(Event.id, Event.start_time, Event.end_time, Event.is_active),
+        Event.facilitator_id == facilitator_id, Event.schedule_node, start, end
+    ))
+    return sorted(((event_id, event_start, event_end) for event_id, event_start, event_end, is_active in rows
+                   if is_active and event_start < end and event_end > start), key=lambda row: row[1])
+
+
+def user_events(user_id, start, end):
+    """[(id, start_time, end_time)] of the events the user holds confirmed bookings for in [start, end)"""
+    rows = db.session.execute(candidates(
+        select(Event.id, Event.start_time, Event.end_time, Booking.status)
+        .select_from(Booking)
+        .join(Event, Event.id == Booking.event_id),
+        Booking.user_id == user_id, Booking.schedule_node, start, end
+    ))
+    return sorted(((event_id, event_start, event_end) for event_id, event_start, event_end, status in rows
+                   if status == 'confirmed' and event_start < end and event_end > start), key=lambda row: row[1])
+
+
+def facilitator_conflict(facilitator_id, start, end, exclude_id=None, session=None):
+    """Id of an active event of the facilitator overlapping [start, end), or None"""
+    return next((event_id for event_id, _, _ in facilitator_events(facilitator_id, start, end, session)
+                 if event_id != exclude_id), None)
+
+
+def user_conflict(user_id, start, end, exclude_event_ids=()):
+    """Id of an event the user is booked into overlapping [start, end), or None"""
+    return next((event_id for event_id, _, _ in user_events(user_id, start, end)
+                 if event_id not in exclude_event_ids), None)
+
+
+def free_busy(events, start, end):
+    """{'busy': [...], 'free': [...]} within [start, end) from (id, start_time, end_time) rows by start"""
+    busy = []
+    free = []
+    cursor = start
+    for event_id, event_start, event_end in events:
+        busy.append({'event_id': event_id, 'start_time': event_start.isoformat(),
+                     'end_time': event_end.isoformat()})
+        if event_start > cursor:
+            free.append({'start_time': cursor.isoformat(), 'end_time': event_start.isoformat()})
+        cursor = max(cursor, event_end)
+    if cursor < end:
+        free.append({'start_time': cursor.isoformat(), 'end_time': end.isoformat()})
+    return {'busy': busy, 'free': free}
+
+
+def schedule_window():
+    """The required ?from= and ?to= of a free/busy query, as naive UTC; raises ValueError"""
+    try:
+        start = parse_datetime_arg('from')
+        end = parse_datetime_arg('to')
+    except ValueError:
+        raise ValueError('from and to must be ISO-8601 datetimes')
+    if start is None or end is None:
+        raise ValueError('from and to are required')
+    start, end = (moment.astimezone(timezone.utc).replace(tzinfo=None) if moment.tzinfo else moment
+                  for moment in (start, end))
+    if not start < end <= start + timedelta(days=Config.MAX_SCHEDULE_WINDOW_DAYS):
+        raise ValueError(f'to must be after from and at most {Config.MAX_SCHEDULE_WINDOW_DAYS} days later')
+    return start, end
+
+
+@sa_event.listens_for(Session, 'before_flush')
+def place_events(session, flush_context, instances):
+    """Give new and rescheduled events their fork node"""
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Event) and obj.start_time and obj.end_time:
+            node = fork_node(obj.start_time, obj.end_time)
+            if obj.schedule_node != node:
+                obj.schedule_node = node
+
+
+@sa_event.listens_for(Session, 'after_flush')
+def check_event_schedules(session, flush_context):
+    """Reject facilitator double-booking, and move rescheduled events' bookings along.
+
+    Runs after the rows are written, so events added in the same flush are
+    checked against each other too. Raising rolls the flush back.
+    """
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Event):
+            continue
+        state = inspect(obj)
+        if obj not in session.new and not any(
+                state.attrs[name].history.has_changes() for name in SCHEDULE_COLUMNS):
+            continue
+        if obj.is_active:
+            other = facilitator_conflict(obj.facilitator_id, obj.start_time, obj.end_time,
+                                         exclude_id=obj.id, session=session)
+            if other is not None:
+                raise FacilitatorConflict(obj.id, other)
+        if obj not in session.new and state.attrs.schedule_node.history.has_changes():
+            session.execute(
+                update(Booking)
+                .where(Booking.event_id == obj.id)
+                .values(schedule_node=obj.schedule_node)
+                .execution_options(synchronize_session=False)
+            )
+
+
+def rebuild_schedule_index(batch_size=10000):
+    """Recompute every event's and booking's fork node; returns the events updated"""
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Event.id, Event.start_time, Event.end_time)
+            .where(Event.id > last_id)
+            .order_by(Event.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(update(Event), [
+            {'id': event_id, 'schedule_node': fork_node(start, end)} for event_id, start, end in rows
+        ])
+        last_id = rows[-1].id
+        updated += len(rows)
+
+    node = select(Event.schedule_node).where(Event.id == Booking.event_id).scalar_subquery()
+    db.session.execute(update(Booking).values(schedule_node=node))
+    db.session.commit()
+
+    print(f'Schedule index rebuilt for {updated} events')
+    return updated
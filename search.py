@@ -0,0 +1,226 @@
+import re
+from flask import request
+from sqlalchemy import (
+    DDL, String, case, cast, column, delete, func, insert, literal, literal_column, or_, select, table, text,
+    true, union_all
+)
+from sqlalchemy import event as sa_event, inspect
+from sqlalchemy.orm import Session, joinedload
+from models import db, Event, Facilitator
+from pagination import parse_datetime_arg
+
+# SQLite FTS5 index over event text, keyed by event id (rowid). Other
+# databases fall back to LIKE matching and need no index.
+events_fts = table('events_fts', column('rowid'), column('title'), column('description'),
+                   column('specialization'), column('rank'))
+
+CREATE_SEARCH_INDEX = DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS events_fts "
+    "USING fts5(title, description, specialization, tokenize='porter unicode61')"
+).execute_if(dialect='sqlite')
+sa_event.listen(Event.__table__, 'after_create', CREATE_SEARCH_INDEX)
+
+# Event columns whose changes reach the index
+INDEXED_EVENT_COLUMNS = ('title', 'description', 'facilitator_id')
+
+# Upper bounds of the price facet buckets; the last bucket is open-ended
+PRICE_BUCKETS = (500, 1000, 2500, 5000, 10000)
+
+
+class SearchError(ValueError):
+    """A malformed search parameter"""
+
+
+def uses_fts(session):
+    return session.get_bind().dialect.name == 'sqlite'
+
+
+def reindex_events(session, condition):
+    """Rewrite the index entries of the events matching `condition`"""
+    session.execute(delete(events_fts).where(events_fts.c.rowid.in_(select(Event.id).where(condition))))
+    session.execute(insert(events_fts).from_select(
+        ['rowid', 'title', 'description', 'specialization'],
+        select(Event.id, Event.title, func.coalesce(Event.description, ''),
+               func.coalesce(Facilitator.specialization, ''))
+        .outerjoin(Facilitator, Facilitator.id == Event.facilitator_id)
+        .where(condition)
+    ))
+
+
+@sa_event.listens_for(Session, 'after_flush')
+def index_event_changes(session, flush_context):
+    """Keep events_fts in step with new and edited events, in the same transaction"""
+    event_ids = set()
+    facilitator_ids = set()
+    for obj in session.new:
+        if isinstance(obj, Event):
+            event_ids.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Event):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in INDEXED_EVENT_COLUMNS):
+                event_ids.add(obj.id)
+        elif isinstance(obj, Facilitator) and inspect(obj).attrs.specialization.history.has_changes():
+            facilitator_ids.add(obj.id)
+
+    if (event_ids or facilitator_ids) and uses_fts(session):
+        reindex_events(session, or_(Event.id.in_(event_ids), Event.facilitator_id.in_(facilitator_ids)))
+
+
+def create_search_index():
+    """Create events_fts in a database whose events table predates it"""
+    with db.engine.begin() as conn:
+        CREATE_SEARCH_INDEX(Event.__table__, conn)
+
+
+def rebuild_search_index():
+    """Index every event from scratch (after bulk loads that bypass the ORM); returns the count"""
+    if not uses_fts(db.session):
+        return 0
+    create_search_index()
+    db.session.execute(delete(events_fts))
+    reindex_events(db.session, true())
+    db.session.execute(text("INSERT INTO events_fts(events_fts) VALUES ('optimize')"))
+    db.session.commit()
+    return db.session.query(func.count(Event.id)).scalar()
+
+
+def match_expression(q):
+    """User text as an FTS5 query: every word must match, as a prefix"""
+    return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', q.lower()))
+
+
+def price_bucket(price):
+    whens = [(price < bound, f'{low}-{bound}')
+             for low, bound in zip((0,) + PRICE_BUCKETS, PRICE_BUCKETS)]
+    return case(*whens, else_=f'{PRICE_BUCKETS[-1]}+')
+
+
+class EventSearch:
+    """Active events matching text and filters, with facet counts.
+
+    Facets are counted with every filter except their own, so a client can
+    offer the other event types or price ranges next to the current ones.
+    """
+
+    def __init__(self, q=None, event_types=None, min_price=None, max_price=None,
+                 start_from=None, start_to=None):
+        self.event_types = event_types
+        self.min_price = min_price
+        self.max_price = max_price
+        self.start_from = start_from
+        self.start_to = start_to
+        self.matched = [Event.is_active.is_(True)]
+        self.ranked = None
+        if q and match_expression(q):
+            if uses_fts(db.session):
+                self.ranked = (
+                    select(events_fts.c.rowid, events_fts.c.rank)
+                    .where(literal_column('events_fts').op('MATCH')(match_expression(q)))
+                    .subquery()
+                )
+                # Facets only need the matching ids, not their bm25 rank
+                self.matched.append(Event.id.in_(
+                    select(events_fts.c.rowid)
+                    .where(literal_column('events_fts').op('MATCH')(match_expression(q)))
+                ))
+            else:
+                self.matched.extend(
+                    or_(Event.title.ilike(f'%{term}%'), Event.description.ilike(f'%{term}%'),
+                        Event.facilitator.has(Facilitator.specialization.ilike(f'%{term}%')))
+                    for term in re.findall(r'\w+', q)
+                )
+
+    def filters(self, columns, without=None):
+        """The facet filters as conditions on `columns` (Event or a subquery's .c)"""
+        conditions = []
+        if self.event_types and without != 'event_type':
+            conditions.append(columns.event_type.in_(self.event_types))
+        if without != 'price':
+            if self.min_price is not None:
+                conditions.append(columns.price >= self.min_price)
+            if self.max_price is not None:
+                conditions.append(columns.price <= self.max_price)
+        if without != 'start_month':
+            if self.start_from:
+                conditions.append(columns.start_time >= self.start_from)
+            if self.start_to:
+                conditions.append(columns.start_time < self.start_to)
+        return conditions
+
+    def facets(self):
+        """Counts per event_type, price bucket and start month, in one statement.
+
+        A text match is evaluated once, into a materialized CTE; each facet
+        then groups that with the other facets' filters. Without one, every
+        facet reads ix_events_search_facets directly.
+        """
+        matched = (
+            select(Event.event_type, Event.price, Event.start_time)
+            .where(*self.matched)
+            .cte('matched')
+            .prefix_with('MATERIALIZED' if len(self.matched) > 1 else 'NOT MATERIALIZED')
+        )
+        keys = {
+            'event_type': matched.c.event_type,
+            'price': price_bucket(matched.c.price),
+            'start_month': func.substr(cast(matched.c.start_time, String), 1, 7)
+        }
+        counts = union_all(*(
+            select(literal(name).label('facet'), cast(key, String).label('value'), func.count().label('count'))
+            .where(*self.filters(matched.c, without=name))
+            .group_by(key)
+            for name, key in keys.items()
+        ))
+        facets = {name: {} for name in keys}
+        for facet, value, count in db.session.execute(counts):
+            if value is not None:
+                facets[facet][value] = count
+        return facets
+
+    def results(self, limit, offset):
+        """A page of events, best text match first, then by start time"""
+        order = [Event.start_time, Event.id]
+        stmt = select(Event)
+        if self.ranked is not None:
+            order.insert(0, self.ranked.c.rank)
+            stmt = stmt.join(self.ranked, self.ranked.c.rowid == Event.id)
+            conditions = self.matched[:1]
+        else:
+            conditions = self.matched
+        stmt = (
+            stmt.where(*conditions, *self.filters(Event))
+            .options(joinedload(Event.facilitator))
+            .order_by(*order)
+            .limit(limit)
+            .offset(offset)
+        )
+        return db.session.scalars(stmt).all()
+
+
+def parse_search_args():
+    """EventSearch keyword arguments from the query string; raises SearchError"""
+    def number(name):
+        value = request.args.get(name)
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            raise SearchError(f'{name} must be a number')
+
+    def moment(name):
+        try:
+            return parse_datetime_arg(name)
+        except ValueError:
+            raise SearchError(f'{name} must be an ISO-8601 datetime')
+
+    event_types = [t for t in request.args.get('event_type', '').split(',') if t]
+    return {
+        'q': request.args.get('q', '').strip() or None,
+        'event_types': event_types or None,
+        'min_price': number('min_price'),
+        'max_price': number('max_price'),
+        'start_from': moment('from'),
+        'start_to': moment('to')
+    }
@@ -3,7 +3,10 @@ from models import db, User, Facilitator, Event
 
 
 def seed_database():
-    """Seed the database with sample data"""
+    """Seed the database with sample data.
+
+    For production-sized datasets use synthetic_data.py instead.
+    """
     
     # Create sample facilitators (Indian names)
     facilitators = [
@@ -24,17 +27,17 @@ def seed_database():
         )
     ]
     
-    for f in facilitators:
-        existing = Facilitator.query.filter_by(email=f.email).first()
-        if not existing:
-            db.session.add(f)
-    
+    existing = {email for email, in db.session.query(Facilitator.email).filter(
+        Facilitator.email.in_([f.email for f in facilitators]))}
+    db.session.add_all([f for f in facilitators if f.email not in existing])
     db.session.commit()
     
     # Get facilitators
-    priya = Facilitator.query.filter_by(email='priya@wellness.in').first()
-    arjun = Facilitator.query.filter_by(email='arjun@wellness.in').first()
-    kavya = Facilitator.query.filter_by(email='kavya@wellness.in').first()
+    by_email = {f.email: f for f in Facilitator.query.filter(
+        Facilitator.email.in_(['priya@wellness.in', 'arjun@wellness.in', 'kavya@wellness.in']))}
+    priya = by_email['priya@wellness.in']
+    arjun = by_email['arjun@wellness.in']
+    kavya = by_email['kavya@wellness.in']
     
     # Create sample events (Indian context)
     now = datetime.utcnow()
@@ -92,11 +95,9 @@ def seed_database():
         )
     ]
     
-    for e in events:
-        existing = Event.query.filter_by(title=e.title).first()
-        if not existing:
-            db.session.add(e)
-    
+    existing = {title for title, in db.session.query(Event.title).filter(
+        Event.title.in_([e.title for e in events]))}
+    db.session.add_all([e for e in events if e.title not in existing])
     db.session.commit()
     
     print('Database seeded successfully!')
@@ -105,6 +106,6 @@ def seed_database():
 
 
 if __name__ == '__main__':
-    from app import app
-    with app.app_context():
+    from app import create_app
+    with create_app().app_context():
         seed_database()
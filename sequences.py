@@ -0,0 +1,22 @@
+from sqlalchemy import select, update
+
+
+def next_values(session, counter_model, name, count=1):
+    """Reserve `count` consecutive values of a named counter in the current transaction.
+
+    `counter_model` is a model with `name` and `value` columns. The counter
+    row is updated before it is read, so the row lock (SQLite's write lock)
+    is held until commit and values are handed out in commit order.
+    """
+    result = session.execute(
+        update(counter_model)
+        .where(counter_model.name == name)
+        .values(value=counter_model.value + count)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        session.execute(counter_model.__table__.insert().values(name=name, value=count))
+    last = session.execute(
+        select(counter_model.value).where(counter_model.name == name)
+    ).scalar_one()
+    return range(last - count + 1, last + 1)
@@ -0,0 +1,245 @@
+import gzip
+import json
+import zlib
+from datetime import datetime
+from operator import itemgetter
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+# Converter for DateTime columns
+isoformat = datetime.isoformat
+
+# Response types worth compressing; images and the like are already compressed
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/x-ndjson', 'text/csv', 'text/html', 'text/plain'
+}
+
+
+class _Attributes:
+    """Item access to an instance's attributes, loading unloaded ones as usual"""
+    __slots__ = ('obj',)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __getitem__(self, name):
+        return getattr(self.obj, name)
+
+
+class Serializer:
+    """A model's JSON shape, read with one itemgetter per field set.
+
+    Fields are attribute names or (key, source) pairs. A source is a
+    converter applied to the attribute of that name unless it is None, a
+    Serializer for a related object, or a {key: attribute} dict building
+    a nested object from the row's own columns. Loaded attributes are read
+    straight from the instance __dict__, skipping the ORM's descriptors;
+    if any is missing (expired, deferred, lazy) the instance is read
+    through getattr instead.
+    """
+
+    def __init__(self, *fields):
+        self.fields = tuple((field, None) if isinstance(field, str) else field for field in fields)
+        self._projections = {}
+        self._serialize, self.from_mapping = self._compile()
+
+    def __call__(self, obj):
+        return self._serialize(obj)
+
+    def only(self, keys):
+        """The serializer of a ?fields= projection; None keeps every field"""
+        if keys is None:
+            return self
+        keys = frozenset(keys)
+        serializer = self._projections.get(keys)
+        if serializer is None:
+            serializer = self._projections[keys] = Serializer(*(
+                field for field in self.fields if field[0] in keys
+            ))
+        return serializer
+
+    def _compile(self):
+        keys = tuple(key for key, _ in self.fields)
+        names = []  # attributes read, in order; a nested object's are consecutive
+        converters = []  # (index in names, converter)
+        groups = []  # (index in names, keys of a nested object)
+        for key, source in self.fields:
+            if isinstance(source, dict):
+                groups.append((len(names), tuple(source)))
+                names.extend(source.values())
+                continue
+            if source is not None:
+                converters.append((len(names), source._serialize if isinstance(source, Serializer) else source))
+            names.append(key)
+        # Later groups first, so folding one leaves the earlier indexes valid
+        groups.reverse()
+        read = itemgetter(*names) if len(names) > 1 else lambda d: tuple(d[name] for name in names)
+
+        if converters or groups:
+            def build(values):
+                values = list(values)
+                for i, convert in converters:
+                    if values[i] is not None:
+                        values[i] = convert(values[i])
+                for i, group_keys in groups:
+                    end = i + len(group_keys)
+                    values[i:end] = [dict(zip(group_keys, values[i:end]))]
+                return dict(zip(keys, values))
+        else:
+            def build(values):
+                return dict(zip(keys, values))
+
+        def from_mapping(d):
+            return build(read(d))
+
+        def serialize(obj):
+            if obj is None:
+                return None
+            try:
+                values = read(obj.__dict__)
+            except KeyError:
+                values = read(_Attributes(obj))
+            return build(values)
+
+        return serialize, from_mapping
+
+
+def dumps(obj):
+    """Compact JSON of `obj` as bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+loads = orjson.loads if orjson is not None else json.loads
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider on orjson, when it is installed.
+
+    Values orjson has no native form for, and dates and datetimes (which
+    Flask renders as HTTP dates), still go through `default`, so output
+    matches the stdlib provider apart from whitespace and non-ASCII text
+    being sent as UTF-8 rather than escaped.
+    """
+
+    # Keys keep the order the serializers declare them in
+    sort_keys = False
+
+    def _orjson_option(self):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        return option | orjson.OPT_SORT_KEYS if self.sort_keys else option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_option()).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        option = self._orjson_option()
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        body = orjson.dumps(self._prepare_response_obj(args, kwargs), default=self.default, option=option)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+class ResponseCompression:
+    """gzip or brotli encoding of response bodies, negotiated per request.
+
+    Bodies shorter than min_bytes go out as they are: below a packet or
+    two the saving is lost to the CPU time. Streamed bodies are compressed
+    chunk by chunk whatever their length.
+    """
+
+    def __init__(self, min_bytes, gzip_level=6, brotli_quality=4):
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, self.gzip_level, mtime=0)
+
+    def compress_stream(self, chunks, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            process, finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)  # 31: gzip container
+            process, finish = compressor.compress, compressor.flush
+        for chunk in chunks:
+            data = process(chunk.encode() if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield finish()
+
+    def encode(self, response, variants=None):
+        """Compress `response` in place if the client accepts an encoding.
+
+        `variants` caches compressed bodies by encoding, for responses
+        served repeatedly from one stored body.
+        """
+        if (not 200 <= response.status_code < 300 or response.status_code in (204, 206)
+                or response.direct_passthrough or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        if not response.is_streamed and response.calculate_content_length() < self.min_bytes:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self.compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            body = variants.get(encoding) if variants is not None else None
+            if body is None:
+                body = self.compress(response.get_data(), encoding)
+                if variants is not None:
+                    variants[encoding] = body
+            response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def init_serialization(app, config):
+    """Serve `app`'s JSON through JSONProvider and compress its responses.
+
+    Compression is off when config.COMPRESS_MIN_BYTES is 0.
+    """
+    app.json = JSONProvider(app)
+    if config.COMPRESS_MIN_BYTES > 0:
+        compression = ResponseCompression(
+            config.COMPRESS_MIN_BYTES, config.COMPRESS_GZIP_LEVEL, config.COMPRESS_BROTLI_QUALITY)
+        app.extensions['response_compression'] = compression
+        app.after_request(compression.encode)
+
+
+def compress_cached(response, variants):
+    """Compress a response built from a cached body, reusing `variants` across hits"""
+    compression = current_app.extensions.get('response_compression')
+    if compression is None:
+        return response
+    return compression.encode(response, variants)
@@ -0,0 +1,133 @@
+from sqlalchemy import event, inspect, literal, text
+from sqlalchemy.engine import make_url
+
+
+def is_memory_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(uri, config):
+    """SQLALCHEMY_ENGINE_OPTIONS for `uri` from the DATABASE_POOL_* settings.
+
+    In-memory SQLite keeps Flask-SQLAlchemy's single shared connection, so
+    it gets no pool settings.
+    """
+    if is_memory_sqlite(uri):
+        return {}
+    options = {
+        'pool_size': config.DATABASE_POOL_SIZE,
+        'max_overflow': config.DATABASE_MAX_OVERFLOW,
+        'pool_timeout': config.DATABASE_POOL_TIMEOUT,
+        'pool_recycle': config.DATABASE_POOL_RECYCLE
+    }
+    if make_url(uri).get_backend_name() != 'sqlite':
+        # Server connections can be dropped while idle in the pool
+        options['pool_pre_ping'] = True
+    return options
+
+
+def sqlite_pragmas(config):
+    """PRAGMAs run on every new SQLite connection, from the SQLITE_* settings"""
+    pragmas = {
+        'journal_mode': config.SQLITE_JOURNAL_MODE,
+        'busy_timeout': config.SQLITE_BUSY_TIMEOUT,
+        'synchronous': config.SQLITE_SYNCHRONOUS,
+        'mmap_size': config.SQLITE_MMAP_SIZE
+    }
+    return {name: value for name, value in pragmas.items() if value not in (None, '')}
+
+
+def apply_pragmas(engine, pragmas):
+    """Run `pragmas` on each connection `engine` opens; a no-op off SQLite"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    statements = [f'PRAGMA {name}={value}' for name, value in pragmas.items()]
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+def init_storage(app, db, config):
+    """Bind `db` to `app` with pool and SQLite settings from `config`.
+
+    SQLALCHEMY_ENGINE_OPTIONS and SQLITE_PRAGMAS already in app.config
+    (e.g. from config_overrides) win over the environment. No connection
+    is opened here.
+    """
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          engine_options(app.config['SQLALCHEMY_DATABASE_URI'], config))
+    app.config.setdefault('SQLITE_PRAGMAS', sqlite_pragmas(config))
+    db.init_app(app)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_pragmas(engine, app.config['SQLITE_PRAGMAS'])
+
+
+def column_ddl(column, dialect):
+    """`name TYPE [NOT NULL DEFAULT value]` for ALTER TABLE ... ADD COLUMN.
+
+    Rows already in the table take the column's scalar default. Without
+    one the column is added as nullable, since existing rows need a value.
+    """
+    ddl = f'{dialect.identifier_preparer.format_column(column)} {column.type.compile(dialect=dialect)}'
+    if column.default is not None and column.default.is_scalar:
+        value = literal(column.default.arg, column.type).compile(
+            dialect=dialect, compile_kwargs={'literal_binds': True})
+        ddl += f' DEFAULT {value}'
+        if not column.nullable:
+            ddl += ' NOT NULL'
+    return ddl
+
+
+def upgrade_schema(db):
+    """Bring an existing database up to the models; safe to run on every start.
+
+    db.create_all() only creates missing tables. This also adds the columns,
+    indexes and single-column unique indexes that databases made by older
+    versions lack. Returns the names of the tables and "table.column"s
+    added, so callers can backfill derived data.
+    """
+    engine = db.engine
+    preparer = engine.dialect.identifier_preparer
+    existing = set(inspect(engine).get_table_names())
+    db.create_all()
+    added = {table.name for table in db.metadata.sorted_tables if table.name not in existing}
+
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name in added:
+                continue
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    conn.execute(text(
+                        f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_ddl(column, engine.dialect)}'
+                    ))
+                    added.add(f'{table.name}.{column.name}')
+
+            indexes = inspector.get_indexes(table.name)
+            names = {index['name'] for index in indexes}
+            for index in table.indexes:
+                if index.name not in names:
+                    index.create(conn)
+
+            unique = {tuple(index['column_names']) for index in indexes if index['unique']}
+            unique |= {tuple(constraint['column_names'])
+                       for constraint in inspector.get_unique_constraints(table.name)}
+            for column in table.columns:
+                if column.unique and (column.name,) not in unique:
+                    conn.execute(text(
+                        f'CREATE UNIQUE INDEX uq_{table.name}_{column.name} '
+                        f'ON {preparer.format_table(table)} ({preparer.format_column(column)})'
+                    ))
+    return added
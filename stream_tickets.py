@@ -0,0 +1,38 @@
+"""Short-lived, single-use tickets for the live seat stream (live_seats.py).
+
+EventSource cannot send an Authorization header, so the stream URL carries
+a ticket rather than the caller's JWT or CRM bearer token. The booking API
+and the CRM issue tickets to callers they have already authenticated; the
+hub checks the signature and expiry and admits one connection per ticket.
+A ticket copied out of an access log or proxy has expired or been used,
+and opens nothing but the stream.
+"""
+import hashlib
+import hmac
+import secrets
+import time
+
+
+def _signature(secret, payload):
+    return hmac.new(secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+
+def issue_ticket(secret, ttl):
+    """A ticket good for `ttl` seconds: '<expires>.<nonce>.<signature>'"""
+    payload = f'{int(time.time()) + ttl}.{secrets.token_urlsafe(16)}'
+    return f'{payload}.{_signature(secret, payload)}'
+
+
+def check_ticket(secret, ticket):
+    """(nonce, expires) of a correctly signed, unexpired ticket, or None.
+
+    Single use is up to the caller, which remembers nonces until they expire.
+    """
+    expires, _, rest = ticket.partition('.')
+    nonce, _, signature = rest.partition('.')
+    expected = _signature(secret, f'{expires}.{nonce}')
+    if not hmac.compare_digest(signature.encode(), expected.encode()):
+        return None
+    if not expires.isdigit() or int(expires) < time.time():
+        return None
+    return nonce, int(expires)
@@ -0,0 +1,283 @@
+"""Deterministic synthetic datasets for benchmarks and query-plan checks.
+
+Fills an empty booking database and an empty CRM database with the same
+seed-derived users, facilitators, events and bookings, plus a CRM
+notification, CRM event and rollup for everything, as if every booking had
+been delivered and every event synced, and the event search index. Rows go
+in with bulk inserts in large transactions, with the secondary indexes built
+once at the end.
+
+The same seed and sizes always produce the same rows (salted password
+hashes aside). Every generated user
+and facilitator has the password "password123"; usernames are user<id> and
+facilitator<id>.
+
+Usage:
+    python -m synthetic_data --seed 1 --users 100000 --events 50000 --bookings 10000000 \\
+        --booking-db sqlite:////tmp/booking.db --crm-db sqlite:////tmp/crm.db
+"""
+import argparse
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import accumulate
+from random import Random
+
+from sqlalchemy import bindparam, insert, update
+
+PASSWORD = 'password123'
+SPECIALIZATIONS = [
+    'Mindfulness & Meditation', 'Yoga & Pranayama', 'Sound Healing & Therapy',
+    'Ayurveda', 'Breathwork', 'Vipassana'
+]
+TITLES = {
+    'session': ['Morning Meditation', 'Sound Bath', 'Pranayama Workshop', 'Hatha Yoga', 'Yoga Nidra'],
+    'retreat': ['Yoga Retreat', 'Silent Meditation Retreat', 'Ayurveda Retreat', 'Wellness Weekend']
+}
+PLACES = ['Rishikesh', 'Coorg', 'Dharamsala', 'Goa', 'Kerala', 'Pune', 'Bengaluru', 'Mysuru']
+CANCELLED_SHARE = 0.08
+FULL_EVENT_SHARE = 0.05
+
+
+def split_total(rng, total, parts, spread=0.5):
+    """`parts` counts summing to `total`, each moved up to `spread` of its size"""
+    counts = [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+    for i in range(0, parts - 1, 2):
+        shift = rng.randint(0, int(counts[i] * spread))
+        counts[i] -= shift
+        counts[i + 1] += shift
+    return counts
+
+
+def pick_events(rng, count, event_ids, cum_weights):
+    """`count` distinct events, popular ones more often, in id order"""
+    picked = set()
+    for _ in range(3):
+        picked.update(rng.choices(event_ids, cum_weights=cum_weights, k=count - len(picked)))
+        if len(picked) == count:
+            return sorted(picked)
+    remaining = [event_id for event_id in rng.sample(event_ids, count) if event_id not in picked]
+    picked.update(remaining[:count - len(picked)])
+    return sorted(picked)
+
+
+class Loader:
+    """Bulk inserts into one engine, committing every `chunk_rows` rows"""
+
+    def __init__(self, engine, chunk_rows):
+        self.engine = engine
+        self.chunk_rows = chunk_rows
+        self.rows = {}
+
+    @contextmanager
+    def table(self, table):
+        """Collect rows for `table`; yields an add(row) function"""
+        pending = []
+        started = time.perf_counter()
+        self.rows[table.name] = 0
+
+        def flush():
+            if pending:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(table), pending)
+                self.rows[table.name] += len(pending)
+                pending.clear()
+
+        def add(row):
+            pending.append(row)
+            if len(pending) >= self.chunk_rows:
+                flush()
+
+        yield add
+        flush()
+        elapsed = time.perf_counter() - started
+        print(f'  {table.name:<18} {self.rows[table.name]:>12,} rows  {elapsed:7.1f}s  '
+              f'{self.rows[table.name] / max(elapsed, 1e-9) * 60:>14,.0f} rows/min')
+
+
+@contextmanager
+def deferred_indexes(engine, tables):
+    """Drop the secondary indexes of `tables` for the load and rebuild them after"""
+    indexes = [index for table in tables for index in table.indexes]
+    with engine.begin() as conn:
+        for index in indexes:
+            index.drop(conn)
+    yield
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        for index in indexes:
+            index.create(conn)
+    print(f'  {len(indexes)} indexes built in {time.perf_counter() - started:.1f}s')
+
+
+def generate(booking_app, crm_app, seed, users, facilitators, events, bookings, epoch, chunk_rows):
+    """Write the dataset into both apps' (empty) databases"""
+    from models import db, User, Facilitator, Event, Booking, SyncCounter, password_hasher
+    from crm_models import db as crm_db, CRMFacilitator, CRMEvent, Notification, SyncCounter as CRMSyncCounter
+    from crm_rollups import rebuild_rollups
+    from schedule import fork_node
+    from search import rebuild_search_index
+
+    with booking_app.app_context():
+        db.create_all()
+        if db.session.query(User.id).first() or db.session.query(Event.id).first():
+            raise SystemExit('The booking database already has data; point --booking-db at a new database')
+        engine = db.engine
+    with crm_app.app_context():
+        crm_db.create_all()
+        if crm_db.session.query(Notification.id).first() or crm_db.session.query(CRMEvent.id).first():
+            raise SystemExit('The CRM database already has data; point --crm-db at a new database')
+        crm_engine = crm_db.engine
+
+    rng = Random(seed)
+    password_hash = password_hasher.hash(PASSWORD)
+    booking_rows = Loader(engine, chunk_rows)
+    crm_rows = Loader(crm_engine, chunk_rows)
+
+    with booking_rows.table(Facilitator.__table__) as add, crm_rows.table(CRMFacilitator.__table__) as add_crm:
+        for i in range(1, facilitators + 1):
+            row = {'id': i, 'name': f'Facilitator {i}', 'email': f'facilitator{i}@example.com',
+                   'specialization': SPECIALIZATIONS[i % len(SPECIALIZATIONS)]}
+            add(row)
+            add_crm(dict(row, username=f'facilitator{i}', password_hash=password_hash))
+
+    with booking_rows.table(User.__table__) as add:
+        for i in range(1, users + 1):
+            add({'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com',
+                 'password_hash': password_hash,
+                 'created_at': epoch - timedelta(days=730) + timedelta(seconds=rng.randrange(730 * 86400))})
+
+    # Events spread a year either side of the epoch; popularity is heavy-tailed.
+    # Times are random, so facilitators and users can be double-booked here,
+    # which schedule.py only refuses for new writes.
+    catalogue = []
+    schedule_nodes = []
+    with booking_rows.table(Event.__table__) as add, crm_rows.table(CRMEvent.__table__) as add_crm:
+        for i in range(1, events + 1):
+            event_type = 'retreat' if rng.random() < 0.2 else 'session'
+            start = epoch + timedelta(minutes=15 * rng.randrange(-365 * 96, 365 * 96))
+            if event_type == 'retreat':
+                end = start + timedelta(days=rng.randint(2, 5))
+                capacity, price = rng.randint(8, 30), float(rng.randrange(5000, 20001, 500))
+            else:
+                end = start + timedelta(minutes=rng.choice((60, 90, 120)))
+                capacity, price = rng.randint(10, 50), float(rng.randrange(300, 2001, 100))
+            row = {
+                'id': i,
+                'title': f'{rng.choice(TITLES[event_type])} - {rng.choice(PLACES)} #{i}',
+                'description': f'Generated {event_type} {i}',
+                'event_type': event_type,
+                'start_time': start,
+                'end_time': end,
+                'max_participants': capacity,
+                'price': price,
+                'facilitator_id': rng.randint(1, facilitators),
+                'is_active': rng.random() > 0.02
+            }
+            schedule_nodes.append(fork_node(start, end))
+            add(dict(row, current_participants=0, change_seq=i, waitlist_tail=0, schedule_node=schedule_nodes[-1]))
+            add_crm({k: v for k, v in row.items() if k != 'id'} | {
+                'id': i, 'original_event_id': i, 'upstream_seq': i, 'change_seq': 0, 'sync_conflict': False})
+            catalogue.append((row['title'], event_type, start, end, row['facilitator_id'], price, capacity,
+                              rng.paretovariate(1.2)))
+
+    event_ids = list(range(1, events + 1))
+    cum_weights = list(accumulate(entry[-1] for entry in catalogue))
+    seats_taken = [0] * (events + 1)
+
+    with deferred_indexes(engine, [Booking.__table__]), deferred_indexes(crm_engine, [Notification.__table__]):
+        with booking_rows.table(Booking.__table__) as add, crm_rows.table(Notification.__table__) as add_crm:
+            booking_id = 0
+            for user_id, count in enumerate(split_total(rng, bookings, users), start=1):
+                for event_id in pick_events(rng, count, event_ids, cum_weights):
+                    booking_id += 1
+                    title, event_type, start, end, facilitator_id, price, _, _ = catalogue[event_id - 1]
+                    booked_at = start - timedelta(seconds=rng.randrange(60, 60 * 86400))
+                    seats = 1 if rng.random() < 0.95 else rng.randint(2, 6)
+                    cancelled = rng.random() < CANCELLED_SHARE
+                    if not cancelled:
+                        seats_taken[event_id] += seats
+                    status = 'cancelled' if cancelled else 'confirmed'
+                    add({'id': booking_id, 'user_id': user_id, 'event_id': event_id,
+                         'booked_at': booked_at, 'status': status, 'seats': seats,
+                         'schedule_node': schedule_nodes[event_id - 1]})
+                    add_crm({
+                        'id': booking_id, 'booking_id': booking_id, 'user_id': user_id,
+                        'user_username': f'user{user_id}', 'user_email': f'user{user_id}@example.com',
+                        'event_id': event_id, 'event_title': title, 'event_type': event_type,
+                        'event_start_time': start.isoformat(), 'event_end_time': end.isoformat(),
+                        'facilitator_id': facilitator_id, 'booked_at': booked_at.isoformat(),
+                        'received_at': booked_at + timedelta(seconds=2), 'price': price, 'seats': seats,
+                        'status': status,
+                        'cancelled_at': booked_at + timedelta(hours=rng.randint(1, 72)) if cancelled else None
+                    })
+
+    # Capacities cover the confirmed seats; a few events are left exactly full
+    started = time.perf_counter()
+    counters = []
+    for event_id, (*_, capacity, _) in enumerate(catalogue, start=1):
+        taken = seats_taken[event_id]
+        headroom = 0 if rng.random() < FULL_EVENT_SHARE else rng.randint(0, max(capacity // 2, 1))
+        counters.append({'b_id': event_id, 'taken': taken, 'capacity': max(capacity, taken + headroom)})
+    for target, table in ((engine, Event.__table__), (crm_engine, CRMEvent.__table__)):
+        values = {'max_participants': bindparam('capacity')}
+        if table is Event.__table__:
+            values['current_participants'] = bindparam('taken')
+        with target.begin() as conn:
+            conn.execute(update(table).where(table.c.id == bindparam('b_id')).values(values), counters)
+    print(f'  seat counters and capacities set in {time.perf_counter() - started:.1f}s')
+
+    with booking_app.app_context():
+        db.session.add(SyncCounter(name='events', value=events))
+        db.session.commit()
+        started = time.perf_counter()
+        indexed = rebuild_search_index()
+        print(f'Search index: {indexed:,} events in {time.perf_counter() - started:.1f}s')
+    with crm_app.app_context():
+        crm_db.session.add(CRMSyncCounter(name='catalogue_pull', value=events))
+        crm_db.session.commit()
+        started = time.perf_counter()
+        buckets = rebuild_rollups()
+        print(f'CRM booking rollups: {buckets:,} buckets in {time.perf_counter() - started:.1f}s')
+
+    return booking_rows.rows, crm_rows.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--facilitators', type=int, default=100)
+    parser.add_argument('--events', type=int, default=5_000)
+    parser.add_argument('--bookings', type=int, default=100_000)
+    parser.add_argument('--epoch', type=datetime.fromisoformat, default=datetime(2025, 1, 1),
+                        help='events are spread a year either side of this date')
+    parser.add_argument('--booking-db', help='SQLAlchemy URL (default: DATABASE_URL / Config)')
+    parser.add_argument('--crm-db', help='SQLAlchemy URL (default: CRM_DATABASE_URL / CRMConfig)')
+    parser.add_argument('--chunk-rows', type=int, default=100_000, help='rows per transaction')
+    args = parser.parse_args(argv)
+
+    if min(args.users, args.facilitators, args.events) < 1 or args.bookings < 0:
+        parser.error('--users, --facilitators and --events must be at least 1')
+    if args.bookings > args.users * args.events // 2:
+        parser.error('--bookings must be at most half of --users times --events')
+
+    import app as booking_service
+    import crm_app as crm_service
+    booking_app = booking_service.create_app(
+        {'SQLALCHEMY_DATABASE_URI': args.booking_db} if args.booking_db else None)
+    crm_app = crm_service.create_app({'SQLALCHEMY_DATABASE_URI': args.crm_db} if args.crm_db else None)
+
+    started = time.perf_counter()
+    booking_rows, crm_rows = generate(
+        booking_app, crm_app, args.seed, args.users, args.facilitators, args.events, args.bookings,
+        args.epoch, args.chunk_rows)
+    elapsed = time.perf_counter() - started
+    total = sum(booking_rows.values()) + sum(crm_rows.values())
+    print(f'{total:,} rows in {elapsed:.1f}s ({total / elapsed * 60:,.0f} rows/min)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())